@@ -0,0 +1,111 @@
+"""partition paper_review by month on create_time
+
+Revision ID: 3f2a9c1d7b54
+Revises: b8949439e623
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f2a9c1d7b54'
+down_revision: Union[str, None] = 'b8949439e623'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Creates monthly partitions from `from_month` (default: the current month) up to
+# `months_ahead` months in the future. Each partition is created standalone and
+# then attached, after moving any rows the DEFAULT partition caught for that
+# month, so a late run never fails on the default partition's contents.
+CREATE_PARTITIONS_FUNCTION = """
+CREATE OR REPLACE FUNCTION paper_review_create_partitions(
+    months_ahead integer DEFAULT 3,
+    from_month date DEFAULT NULL
+) RETURNS integer AS $$
+DECLARE
+    month_start date := date_trunc('month', COALESCE(from_month, now()::date))::date;
+    last_month date := (date_trunc('month', now()) + make_interval(months => months_ahead))::date;
+    month_end date;
+    partition_name text;
+    created integer := 0;
+BEGIN
+    WHILE month_start <= last_month LOOP
+        month_end := (month_start + interval '1 month')::date;
+        partition_name := format('paper_review_%s', to_char(month_start, 'YYYY_MM'));
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I (LIKE paper_review INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                partition_name
+            );
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM paper_review_default WHERE create_time >= %L AND create_time < %L RETURNING *) '
+                'INSERT INTO %I SELECT * FROM moved',
+                month_start, month_end, partition_name
+            );
+            EXECUTE format(
+                'ALTER TABLE paper_review ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month_start, month_end
+            );
+            created := created + 1;
+        END IF;
+        month_start := month_end;
+    END LOOP;
+    RETURN created;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+COLUMNS = "id, aixiv_id, version, review_results, agent_type, doc_type, create_time, like_count, userid, ip"
+
+
+def upgrade() -> None:
+    # Keep the old table around until its rows are copied
+    op.execute("ALTER TABLE paper_review RENAME TO paper_review_legacy")
+    op.execute("ALTER TABLE paper_review_legacy RENAME CONSTRAINT paper_review_pkey TO paper_review_legacy_pkey")
+    op.execute(
+        "ALTER INDEX idx_paper_review_aixiv_id_create_time "
+        "RENAME TO idx_paper_review_legacy_aixiv_id_create_time"
+    )
+
+    # The partition key has to be part of the primary key
+    op.execute("""
+        CREATE TABLE paper_review (
+            id BIGINT NOT NULL DEFAULT nextval('paper_review_id_seq'),
+            aixiv_id VARCHAR(128) NOT NULL,
+            version VARCHAR(45) NOT NULL,
+            review_results JSONB NOT NULL,
+            agent_type SMALLINT NOT NULL DEFAULT 1,
+            doc_type SMALLINT NOT NULL DEFAULT 1,
+            create_time TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now(),
+            like_count INTEGER NOT NULL DEFAULT 0,
+            userid VARCHAR(128),
+            ip VARCHAR(45),
+            CONSTRAINT paper_review_pkey PRIMARY KEY (id, create_time)
+        ) PARTITION BY RANGE (create_time)
+    """)
+    # Move sequence ownership first, otherwise dropping the legacy table drops it
+    op.execute("ALTER SEQUENCE paper_review_id_seq OWNED BY paper_review.id")
+    op.execute("CREATE INDEX idx_paper_review_aixiv_id_create_time ON paper_review (aixiv_id, create_time)")
+    op.execute("CREATE TABLE paper_review_default PARTITION OF paper_review DEFAULT")
+
+    op.execute(CREATE_PARTITIONS_FUNCTION)
+    op.execute("SELECT paper_review_create_partitions(3, (SELECT min(create_time)::date FROM paper_review_legacy))")
+
+    op.execute(f"INSERT INTO paper_review ({COLUMNS}) SELECT {COLUMNS} FROM paper_review_legacy")
+    op.execute("DROP TABLE paper_review_legacy")
+
+
+def downgrade() -> None:
+    # Partitions already detached and archived by the retention job are not restored
+    op.execute("CREATE TABLE paper_review_unpartitioned (LIKE paper_review INCLUDING DEFAULTS)")
+    op.execute(f"INSERT INTO paper_review_unpartitioned ({COLUMNS}) SELECT {COLUMNS} FROM paper_review")
+    op.execute("ALTER SEQUENCE paper_review_id_seq OWNED BY paper_review_unpartitioned.id")
+    op.execute("DROP TABLE paper_review CASCADE")
+    op.execute("DROP FUNCTION IF EXISTS paper_review_create_partitions(integer, date)")
+    op.execute("ALTER TABLE paper_review_unpartitioned RENAME TO paper_review")
+    op.execute("ALTER TABLE paper_review ADD CONSTRAINT paper_review_pkey PRIMARY KEY (id)")
+    op.execute("CREATE INDEX idx_paper_review_aixiv_id_create_time ON paper_review (aixiv_id, create_time)")
@@ -0,0 +1,68 @@
+"""add composite indexes for hot queries
+
+Revision ID: 7c1e4b9a2d36
+Revises: 3f2a9c1d7b54
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1e4b9a2d36'
+down_revision: Union[str, None] = '3f2a9c1d7b54'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+REVIEW_RATE_LIMIT_INDEX = 'idx_paper_review_aixiv_id_version_doc_type_ip_create_time'
+REVIEW_RATE_LIMIT_COLUMNS = 'aixiv_id, version, doc_type, ip, create_time'
+
+
+def _review_partitions() -> list:
+    return [row[0] for row in op.get_bind().execute(sa.text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'paper_review'::regclass ORDER BY c.relname"
+    ))]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    with op.get_context().autocommit_block():
+        # get_submissions_by_user
+        op.create_index('ix_submissions_uploaded_by', 'submissions', ['uploaded_by'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        # check_if_exist; INCLUDE id allows an index-only scan
+        op.create_index('ix_submissions_aixiv_id_version_doc_type', 'submissions',
+                        ['aixiv_id', 'version', 'doc_type'], postgresql_include=['id'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        # latest version lookup in create_submission_version
+        op.create_index('ix_submissions_aixiv_id_created_at', 'submissions', ['aixiv_id', 'created_at'],
+                        postgresql_concurrently=True, if_not_exists=True)
+
+        # Partitioned tables don't support CONCURRENTLY: create the parent index
+        # ON ONLY (invalid until complete), build each partition's index
+        # concurrently and attach it. Partitions created later get the index
+        # automatically when paper_review_create_partitions() attaches them.
+        op.execute(f"CREATE INDEX IF NOT EXISTS {REVIEW_RATE_LIMIT_INDEX} "
+                   f"ON ONLY paper_review ({REVIEW_RATE_LIMIT_COLUMNS})")
+        for partition in _review_partitions():
+            index_name = f"{partition}_aixiv_id_version_doc_type_ip_idx"
+            op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{index_name}" '
+                       f'ON "{partition}" ({REVIEW_RATE_LIMIT_COLUMNS})')
+            op.execute(f'ALTER INDEX {REVIEW_RATE_LIMIT_INDEX} ATTACH PARTITION "{index_name}"')
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        # Dropping the parent index drops the attached partition indexes with it
+        op.execute(f"DROP INDEX IF EXISTS {REVIEW_RATE_LIMIT_INDEX}")
+        op.drop_index('ix_submissions_aixiv_id_created_at', table_name='submissions',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_submissions_aixiv_id_version_doc_type', table_name='submissions',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_submissions_uploaded_by', table_name='submissions',
+                      postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,58 @@
+"""add submission jobs and file metadata
+
+Revision ID: a4d8e2f1c9b7
+Revises: 7c1e4b9a2d36
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d8e2f1c9b7'
+down_revision: Union[str, None] = '7c1e4b9a2d36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('submissions', sa.Column('file_size', sa.BigInteger(), nullable=True))
+    op.add_column('submissions', sa.Column('file_sha256', sa.String(length=64), nullable=True))
+    op.add_column('submissions', sa.Column('page_count', sa.Integer(), nullable=True))
+    op.add_column('submissions', sa.Column('thumbnail_url', sa.Text(), nullable=True))
+    op.add_column('submissions', sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True))
+
+    op.create_table(
+        'submission_jobs',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('submission_id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=32), nullable=False),
+        sa.Column('status', sa.String(length=16), server_default=sa.text("'pending'"), nullable=False),
+        sa.Column('attempts', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('run_after', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('locked_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['submission_id'], ['submissions.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('submission_id', 'kind', name='_submission_job_kind_uc'),
+    )
+    op.create_index('ix_submission_jobs_claimable', 'submission_jobs', ['kind', 'run_after'],
+                    postgresql_where=sa.text("status IN ('pending', 'running')"))
+
+    # Existing submissions get processed once too
+    op.execute("INSERT INTO submission_jobs (submission_id, kind) SELECT id, 'process_upload' FROM submissions")
+
+
+def downgrade() -> None:
+    op.drop_index('ix_submission_jobs_claimable', table_name='submission_jobs')
+    op.drop_table('submission_jobs')
+    op.drop_column('submissions', 'processed_at')
+    op.drop_column('submissions', 'thumbnail_url')
+    op.drop_column('submissions', 'page_count')
+    op.drop_column('submissions', 'file_sha256')
+    op.drop_column('submissions', 'file_size')
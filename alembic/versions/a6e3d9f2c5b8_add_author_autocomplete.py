@@ -0,0 +1,62 @@
+"""add author autocomplete
+
+Revision ID: a6e3d9f2c5b8
+Revises: f2a7c4e9b1d3
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6e3d9f2c5b8'
+down_revision: Union[str, None] = 'f2a7c4e9b1d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRIGRAM_INDEXES = [
+    ('ix_user_profiles_name_trgm', 'user_profiles', 'name'),
+    ('ix_user_profiles_affiliation_trgm', 'user_profiles', 'affiliation'),
+    ('ix_author_names_name_trgm', 'author_names', 'name'),
+]
+
+
+def upgrade() -> None:
+    op.create_table(
+        'author_names',
+        sa.Column('name', sa.Text(), nullable=False),
+        sa.Column('submission_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+    op.execute("""
+        INSERT INTO author_names (name, submission_count)
+        SELECT name, count(DISTINCT id)
+        FROM (SELECT id, btrim(unnest(agent_authors)) AS name FROM submissions) AS authors
+        WHERE name <> ''
+        GROUP BY name
+    """)
+
+    # pg_trgm ships with PostgreSQL (contrib) and is available on RDS; builds
+    # without contrib still get the table, and autocomplete falls back to
+    # scanning it
+    bind = op.get_bind()
+    if not bind.execute(sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")).scalar():
+        logging.getLogger('alembic').warning("pg_trgm is not available: autocomplete indexes not created")
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, column in TRIGRAM_INDEXES:
+            op.create_index(name, table, [column], postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'},
+                            postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(TRIGRAM_INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+    op.drop_table('author_names')
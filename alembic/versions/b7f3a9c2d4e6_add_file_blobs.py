@@ -0,0 +1,47 @@
+"""add file blobs
+
+Revision ID: b7f3a9c2d4e6
+Revises: e5b1c7d3a8f2
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7f3a9c2d4e6'
+down_revision: Union[str, None] = 'e5b1c7d3a8f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'file_blobs',
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('s3_url', sa.Text(), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), server_default=sa.text('1'), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('sha256'),
+        sa.UniqueConstraint('s3_url'),
+    )
+
+    # Files the pipeline already hashed; duplicates keep their own objects
+    op.execute("""
+        INSERT INTO file_blobs (sha256, s3_url, size, ref_count)
+        SELECT DISTINCT ON (file_sha256) file_sha256, s3_url, file_size,
+               count(*) OVER (PARTITION BY file_sha256, s3_url)
+        FROM submissions
+        WHERE file_sha256 IS NOT NULL AND file_size IS NOT NULL
+        ORDER BY file_sha256, created_at
+        ON CONFLICT DO NOTHING
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('file_blobs')
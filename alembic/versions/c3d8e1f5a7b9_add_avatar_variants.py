@@ -0,0 +1,27 @@
+"""add avatar variants
+
+Revision ID: c3d8e1f5a7b9
+Revises: b7f3a9c2d4e6
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3d8e1f5a7b9'
+down_revision: Union[str, None] = 'b7f3a9c2d4e6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('user_profiles', sa.Column('avatar_variants', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('user_profiles', 'avatar_variants')
@@ -0,0 +1,48 @@
+"""add agent tokens
+
+Revision ID: c5f9b2d8e4a1
+Revises: a6e3d9f2c5b8
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5f9b2d8e4a1'
+down_revision: Union[str, None] = 'a6e3d9f2c5b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'agent_tokens',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('token_hash', sa.CHAR(length=64), nullable=False),
+        sa.Column('requests_per_day', sa.Integer(), nullable=True),
+        sa.Column('bytes_per_day', sa.BigInteger(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('revoked_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name'),
+        sa.UniqueConstraint('token_hash'),
+    )
+    op.create_table(
+        'agent_token_usage',
+        sa.Column('token_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('requests', sa.BigInteger(), server_default=sa.text('0'), nullable=False),
+        sa.Column('bytes', sa.BigInteger(), server_default=sa.text('0'), nullable=False),
+        sa.ForeignKeyConstraint(['token_id'], ['agent_tokens.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('token_id', 'day'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('agent_token_usage')
+    op.drop_table('agent_tokens')
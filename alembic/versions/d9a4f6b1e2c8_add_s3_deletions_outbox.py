@@ -0,0 +1,39 @@
+"""add s3 deletions outbox
+
+Revision ID: d9a4f6b1e2c8
+Revises: c3d8e1f5a7b9
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9a4f6b1e2c8'
+down_revision: Union[str, None] = 'c3d8e1f5a7b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        's3_deletions',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('s3_key', sa.Text(), nullable=False),
+        sa.Column('reason', sa.String(length=50), nullable=False),
+        sa.Column('attempts', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('run_after', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('s3_key'),
+    )
+    op.create_index('ix_s3_deletions_run_after', 's3_deletions', ['run_after'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_s3_deletions_run_after', table_name='s3_deletions')
+    op.drop_table('s3_deletions')
@@ -0,0 +1,45 @@
+"""add submission texts for search
+
+Revision ID: e5b1c7d3a8f2
+Revises: a4d8e2f1c9b7
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b1c7d3a8f2'
+down_revision: Union[str, None] = 'a4d8e2f1c9b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'submission_texts',
+        sa.Column('submission_id', sa.Integer(), nullable=False),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('truncated', sa.Boolean(), server_default=sa.text('false'), nullable=False),
+        sa.Column('pages_indexed', sa.Integer(), nullable=True),
+        sa.Column('search_vector', postgresql.TSVECTOR(), nullable=False),
+        sa.Column('indexed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['submission_id'], ['submissions.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('submission_id'),
+    )
+    op.create_index('ix_submission_texts_search_vector', 'submission_texts', ['search_vector'],
+                    postgresql_using='gin')
+
+    # Index existing submissions too
+    op.execute("INSERT INTO submission_jobs (submission_id, kind) SELECT id, 'index_text' FROM submissions "
+               "ON CONFLICT (submission_id, kind) DO NOTHING")
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM submission_jobs WHERE kind = 'index_text'")
+    op.drop_index('ix_submission_texts_search_vector', table_name='submission_texts')
+    op.drop_table('submission_texts')
@@ -0,0 +1,63 @@
+"""add submissions.s3_key
+
+Revision ID: e8b3f6a1d7c2
+Revises: c5f9b2d8e4a1
+Create Date: 2026-10-19 23:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.config import settings
+from app.services.s3_service import key_from_url
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8b3f6a1d7c2'
+down_revision: Union[str, None] = 'c5f9b2d8e4a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def _backfill(bind) -> None:
+    # One short transaction per batch, so rows are never locked for long
+    last_id = 0
+    while True:
+        rows = bind.execute(sa.text(
+            "SELECT id, s3_url FROM submissions WHERE id > :last_id ORDER BY id LIMIT :limit"
+        ), {"last_id": last_id, "limit": BACKFILL_BATCH_SIZE}).all()
+        if not rows:
+            return
+        keys = {row.id: key_from_url(row.s3_url, settings.aws_s3_bucket) for row in rows}
+        keys = {submission_id: key for submission_id, key in keys.items() if key}
+        if keys:
+            bind.execute(sa.text("""
+                UPDATE submissions s SET s3_key = batch.key
+                FROM unnest(CAST(:ids AS integer[]), CAST(:keys AS text[])) AS batch(id, key)
+                WHERE s.id = batch.id
+            """), {"ids": list(keys), "keys": list(keys.values())})
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    op.add_column('submissions', sa.Column('s3_key', sa.Text(), nullable=True))
+    with op.get_context().autocommit_block():
+        _backfill(op.get_bind())
+        op.create_index('ix_submissions_s3_key', 'submissions', ['s3_key'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        # Reference checks match on s3_key now
+        op.drop_index('ix_submissions_s3_url', table_name='submissions',
+                      postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_submissions_s3_url', 'submissions', ['s3_url'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index('ix_submissions_s3_key', table_name='submissions',
+                      postgresql_concurrently=True, if_exists=True)
+    op.drop_column('submissions', 's3_key')
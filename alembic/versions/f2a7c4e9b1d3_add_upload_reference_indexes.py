@@ -0,0 +1,39 @@
+"""add upload reference indexes
+
+Revision ID: f2a7c4e9b1d3
+Revises: d9a4f6b1e2c8
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a7c4e9b1d3'
+down_revision: Union[str, None] = 'd9a4f6b1e2c8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index('ix_submissions_s3_url', 'submissions', ['s3_url'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_user_profiles_avatar_url', 'user_profiles', ['avatar_url'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_user_profiles_avatar_variants', 'user_profiles', ['avatar_variants'],
+                        postgresql_using='gin', postgresql_ops={'avatar_variants': 'jsonb_path_ops'},
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_user_profiles_avatar_variants', table_name='user_profiles',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_user_profiles_avatar_url', table_name='user_profiles',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_submissions_s3_url', table_name='submissions',
+                      postgresql_concurrently=True, if_exists=True)
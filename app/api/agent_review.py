@@ -2,20 +2,26 @@ import traceback
 from datetime import datetime
 from typing import Optional, List
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, Security
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
-from app.crud import create_paper_review, get_reviews, check_if_exist
+from app.crud import create_paper_review, get_reviews, count_reviews, check_if_exist
 from app.database import get_db
-from app.schemas import SubmitReviewIn, Review, SubmitReviewOut, GetReviewOut, GetReviewIn
+from app.schemas import SubmitReviewIn, Review, SubmitReviewOut, GetReviewOut, GetReviewIn, AgentUsageOut
+from app.services.agent_tokens import AgentTokensUnavailable, QuotaExceeded, agent_tokens
+from app.tracing import TracedRoute
 from app.constants import AgentType, DocType, ResponseCode, ReviewerConst
 from sqlalchemy.orm import Session
 from app.config import settings
 import logging
+import secrets
 from datetime import datetime, timedelta, timezone
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/api", tags=["agent_review"])
+router = APIRouter(prefix="/api", tags=["agent_review"], route_class=TracedRoute)
+
+bearer = HTTPBearer(auto_error=False)
 
 
 @router.post("/submit-review", response_model=SubmitReviewOut)
@@ -61,12 +67,13 @@ async def submit_review(
             reviewer=review.reviewer,
             doc_type=review.doc_type,
             token=review.token,
+            nbytes=len(await request.body()),
         )
 
         if settings.ip_limit_window_size > 0:
                 start_time = datetime.now(timezone.utc) - timedelta(hours=settings.ip_limit_window_size)
-                rec = get_reviews(db, review.aixiv_id, start_time, datetime.now(timezone.utc), review.version, client_ip, doc_type_val)
-                if len(rec) > settings.ip_limit_frequency:
+                recent = count_reviews(db, review.aixiv_id, start_time, datetime.now(timezone.utc), review.version, client_ip, doc_type_val)
+                if recent > settings.ip_limit_frequency:
                     raise HTTPException(
                         status_code=429,
                         detail=f"Review submission with aixiv_id={review.aixiv_id} and version={review.version} and doc_type={review.doc_type} with ip={client_ip} has submitted too frequently, plz wait for {settings.ip_limit_window_size} hour to retry."
@@ -143,8 +150,8 @@ async def get_review(
             code=ResponseCode.SUCCESS
         )
     except Exception as e:
-        logger.info({
-            "event": "get-review:request",
+        logger.error({
+            "event": "get-review:error",
             "aixiv_id": query.aixiv_id,
             "version": query.version,
             "start_date": query.start_date.isoformat() if query.start_date else None,
@@ -158,6 +165,25 @@ async def get_review(
             detail=f"query failed: {str(e)}"
         )
 
+@router.get("/agent-tokens/usage", response_model=AgentUsageOut)
+def get_agent_usage(credentials: Optional[HTTPAuthorizationCredentials] = Security(bearer)):
+    """
+    Today's (UTC) request and byte usage against the daily quotas: of the
+    agent token sent as the bearer token, or of every token for
+    AGENT_USAGE_ADMIN_TOKEN. Counts not yet flushed by other workers are
+    missing until their next flush and this worker's next refresh.
+    """
+    if credentials is None:
+        raise HTTPException(status_code=ResponseCode.UNAUTHORIZED, detail="Token required",
+                            headers={"WWW-Authenticate": "Bearer"})
+    admin_token = settings.agent_usage_admin_token
+    if admin_token and secrets.compare_digest(credentials.credentials.encode(), admin_token.encode()):
+        usage = agent_tokens.usage()
+    else:
+        usage = agent_tokens.usage(_authenticate_agent(credentials.credentials).id)
+    return AgentUsageOut(code=ResponseCode.SUCCESS, day=datetime.now(timezone.utc).date(), usage=usage)
+
+
 def _get_client_ip(req: Request) -> str:
     xff = req.headers.get("x-forwarded-for")
     if xff:
@@ -193,10 +219,28 @@ def _normalize_doc_type(doc_type: str) -> str:
     raise HTTPException(status_code=ResponseCode.BAD_REQUEST, detail="Invalid doc_type; must be 'paper' or 'proposal'")
 
 
-def _resolve_agent_and_doc(*, reviewer: str, doc_type: str, token: str | None) -> tuple[int, int]:
+def _authenticate_agent(token: str):
+    try:
+        agent = agent_tokens.authenticate(token)
+    except AgentTokensUnavailable as e:
+        logger.error(f"Cannot load agent tokens: {e}")
+        raise HTTPException(status_code=503, detail="Token check temporarily unavailable")
+    if agent is None:
+        raise HTTPException(status_code=ResponseCode.UNAUTHORIZED, detail="Invalid token")
+    return agent
+
+
+def _resolve_agent_and_doc(*, reviewer: str, doc_type: str, token: str | None, nbytes: int = 0) -> tuple[int, int]:
     if token:
-        if token != settings.auth_token:
-            raise HTTPException(status_code=ResponseCode.UNAUTHORIZED, detail="Invalid token")
+        agent = _authenticate_agent(token)
+        try:
+            agent_tokens.consume(agent, nbytes)
+        except QuotaExceeded as e:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Daily {e.resource} quota of this token exceeded, retry after {e.retry_after} seconds",
+                headers={"Retry-After": str(e.retry_after)},
+            )
         agent_type_val = AgentType.official.value
     else:
         agent_type_val = _map_reviewer_to_agent_type(reviewer)
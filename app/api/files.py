@@ -0,0 +1,149 @@
+import logging
+import os
+import re
+from concurrent.futures import Future
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional, Tuple
+
+import anyio
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from starlette.types import Receive, Scope, Send
+
+from app.config import settings
+from app.executors import ExecutorSaturated, s3_executor
+from app.services.file_cache import CachedFile, file_cache, file_cache_bytes_saved_total
+from app.services.s3_service import key_kind, s3_service
+from app.tracing import TracedRoute
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api", tags=["files"], route_class=TracedRoute)
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    The inclusive (start, end) of a single `bytes=` range, or None to send the
+    whole file (no header, a multi-range or an unparseable one, which RFC 9110
+    allows ignoring). Raises RangeNotSatisfiable for ranges past the end.
+    """
+    match = _RANGE.match(header.replace(" ", "")) if header else None
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        if int(last) == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        return max(size - int(last), 0), size - 1
+    start, end = int(first), int(last) if last else size - 1
+    if start >= size or end < start:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+def _not_modified_since(header: Optional[str], last_modified: float) -> bool:
+    try:
+        since = parsedate_to_datetime(header).timestamp() if header else None
+    except (TypeError, ValueError):
+        return False
+    # HTTP dates have one-second resolution
+    return since is not None and int(last_modified) <= since
+
+
+class CachedFileResponse(FileResponse):
+    """
+    FileResponse for an already opened cache entry, with single byte ranges.
+    The body is sent with the ASGI zero-copy extension when the server offers
+    it (sendfile), and read in chunks on a worker thread otherwise.
+    """
+
+    def __init__(self, cached: CachedFile, byte_range: Optional[Tuple[int, int]], **kwargs):
+        super().__init__(cached.file.name, stat_result=os.fstat(cached.file.fileno()), **kwargs)
+        self.cached = cached
+        self.start, self.end = byte_range or (0, cached.size - 1)
+        self.headers["accept-ranges"] = "bytes"
+        if byte_range is not None:
+            self.status_code = 206
+            self.headers["content-range"] = f"bytes {self.start}-{self.end}/{cached.size}"
+            self.headers["content-length"] = str(self.end - self.start + 1)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            if self.send_header_only:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+                return
+            fd, offset, remaining = self.cached.file.fileno(), self.start, self.end - self.start + 1
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({"type": "http.response.zerocopysend", "file": fd, "offset": offset,
+                            "count": remaining, "more_body": False})
+                return
+            while True:
+                chunk = await anyio.to_thread.run_sync(os.pread, fd, min(self.chunk_size, remaining), offset)
+                offset += len(chunk)
+                remaining -= len(chunk)
+                more_body = remaining > 0 and bool(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+                if not more_body:
+                    break
+        finally:
+            self.cached.file.close()
+
+
+def cached_file_response(request: Request, key: str, cached: CachedFile) -> Response:
+    """304, 416, 206 or 200 for a cache entry, depending on the conditional and Range headers"""
+    headers = {
+        "last-modified": formatdate(cached.last_modified, usegmt=True),
+        # Keys are never overwritten with different content
+        "cache-control": "public, max-age=86400, immutable",
+    }
+    if _not_modified_since(request.headers.get("if-modified-since"), cached.last_modified):
+        cached.file.close()
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range is not None and if_range != headers["last-modified"]:
+        # The client's partial copy is of another version: send it all
+        range_header = None
+    try:
+        byte_range = parse_range(range_header, cached.size)
+    except RangeNotSatisfiable:
+        cached.file.close()
+        return Response(status_code=416, headers={"content-range": f"bytes */{cached.size}"})
+
+    if cached.from_cache and request.method == "GET":
+        file_cache_bytes_saved_total.inc(byte_range[1] - byte_range[0] + 1 if byte_range else cached.size)
+    extension = key.rsplit(".", 1)[-1].lower() if "." in key else ""
+    return CachedFileResponse(cached, byte_range, headers=headers, method=request.method,
+                              media_type=s3_service._get_content_type(extension))
+
+
+@router.api_route("/files/{key:path}", methods=["GET", "HEAD"])
+async def get_file(key: str, request: Request):
+    """
+    Serve a paper, thumbnail or avatar from the local disk cache, fetching it
+    from S3 on a miss. Supports Range (PDF viewers) and If-Modified-Since.
+    """
+    if not settings.file_cache_enabled or key_kind(key) is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    try:
+        cached = await s3_executor.run(file_cache.open, key, False)
+        if isinstance(cached, Future):
+            # Another request is downloading it; wait here rather than on an executor slot
+            cached = await file_cache.joined(cached)
+    except ExecutorSaturated:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to fetch {key} into the file cache: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch file")
+    if cached is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return cached_file_response(request, key, cached)
@@ -1,23 +1,34 @@
-from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Form
+from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Form, Query
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
-from PIL import Image
+import asyncio
 import uuid
-import io
 import os
 import logging
 
+from PIL import Image, UnidentifiedImageError
+
 from app.database import get_db
 from app.models import UserProfile
-from app.schemas import ProfileUpdateRequest, ProfileResponse
-from app.crud import get_profile_by_user_id, create_or_update_profile
+from app.schemas import ProfileUpdateRequest, ProfileResponse, ProfileSummary, AuthorSuggestion, build_avatar_srcset
+from app.crud import (
+    get_profile_by_user_id, get_profile_for_update, create_or_update_profile, enqueue_s3_deletions,
+    get_profile_summaries, autocomplete_authors
+)
 from app.auth import get_current_user, get_optional_current_user
 from app.services.s3_service import s3_service
+from app.services.profile_cache import profile_cache
+from app.tracing import TracedRoute
+from app.services.images import AVATAR_SIZES, ImageTooLarge, process_avatar_variants
+from app.config import settings
+from app.executors import ExecutorSaturated, image_executor, s3_executor
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
+
+PROFILE_BATCH_MAX = 100  # user ids per /profiles/batch request
 
 
 @router.put("/profile/update", response_model=ProfileResponse)
@@ -97,6 +108,39 @@ async def get_current_user_profile(
     return profile
 
 
+@router.get("/profiles/batch", response_model=List[ProfileSummary])
+def get_profiles_batch(
+    ids: List[str] = Query(..., description="User ids, comma-separated and/or repeated"),
+    db: Session = Depends(get_db)
+):
+    """
+    Name, affiliation and avatar for every author on a card or page in one
+    request. Profiles come back in the order asked for; unknown ids are
+    left out.
+    """
+    user_ids = list(dict.fromkeys(user_id.strip() for value in ids for user_id in value.split(",") if user_id.strip()))
+    if not user_ids:
+        raise HTTPException(status_code=400, detail="No user ids given")
+    if len(user_ids) > PROFILE_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {PROFILE_BATCH_MAX} profiles can be requested at once")
+    summaries = get_profile_summaries(db, user_ids)
+    return [summaries[user_id] for user_id in user_ids if user_id in summaries]
+
+
+@router.get("/autocomplete/authors", response_model=List[AuthorSuggestion])
+def autocomplete_author_names(
+    q: str = Query(..., min_length=2, max_length=100),
+    limit: int = Query(10, ge=1, le=20),
+    db: Session = Depends(get_db)
+):
+    """
+    Type-ahead over profile names, agent author names and affiliations
+    """
+    if len(q.strip()) < 2:
+        raise HTTPException(status_code=400, detail="Query must have at least 2 characters")
+    return autocomplete_authors(db, q, limit)
+
+
 @router.get("/profile/{user_id}", response_model=ProfileResponse)
 async def get_profile(
     user_id: str,
@@ -131,57 +175,49 @@ async def upload_avatar(
     if avatar.size > 5 * 1024 * 1024:
         raise HTTPException(status_code=400, detail="File size must be less than 5MB")
     
-    # Read and resize image
+    # Decode once and build every size in the image process pool, so the
+    # event loop keeps serving requests
     contents = await avatar.read()
-    image = Image.open(io.BytesIO(contents))
-    
-    # Convert to RGB if necessary (for PNG with transparency)
-    if image.mode in ('RGBA', 'LA'):
-        background = Image.new('RGB', image.size, (255, 255, 255))
-        background.paste(image, mask=image.split()[-1])
-        image = background
-    
-    # Resize image to max 500x500 while maintaining aspect ratio
-    image.thumbnail((500, 500), Image.Resampling.LANCZOS)
-    
-    # Prepare image for upload
-    output = io.BytesIO()
-    file_extension = avatar.filename.split('.')[-1].lower()
-    if file_extension not in ['jpg', 'jpeg', 'png', 'gif', 'webp']:
-        file_extension = 'jpg'
-    image_format = 'JPEG' if file_extension in ['jpg', 'jpeg'] else file_extension.upper()
-    
-    # Save optimized image to bytes
-    if image_format == 'JPEG':
-        image.save(output, format=image_format, quality=85, optimize=True)
-    else:
-        image.save(output, format=image_format, optimize=True)
-    output.seek(0)
-    
     try:
-        # Upload to S3
+        variants = await image_executor.run(process_avatar_variants, contents, settings.avatar_max_pixels)
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (UnidentifiedImageError, Image.DecompressionBombError):
+        raise HTTPException(status_code=400, detail="File is not a readable image")
+    finally:
+        del contents
+
+    try:
+        # Upload all variants side by side
         logger.info(f"Uploading avatar for user {user_id}, filename: {avatar.filename}")
-        avatar_url = s3_service.upload_avatar(
-            file_content=output.read(),
-            filename=avatar.filename,
-            user_id=user_id
-        )
+        avatar_id = str(uuid.uuid4())
+        uploads = [
+            (fmt, size, s3_executor.run(s3_service.upload_avatar_variant, data, user_id, avatar_id, size, fmt))
+            for fmt, sizes in variants.items() for size, data in sizes.items()
+        ]
+        urls = await asyncio.gather(*(upload for _, _, upload in uploads))
+        avatar_variants = {fmt: {} for fmt in variants}
+        for (fmt, size, _), url in zip(uploads, urls):
+            avatar_variants[fmt][str(size)] = url
+        # The largest JPEG stays the plain avatar_url for older clients
+        avatar_url = avatar_variants["jpeg"][str(max(AVATAR_SIZES))]
         logger.info(f"Avatar uploaded to S3: {avatar_url}")
-        
+
         # Update database with new avatar_url
-        profile = get_profile_by_user_id(db, user_id)
+        profile = get_profile_for_update(db, user_id)
         if profile:
-            # Delete old avatar from S3 if it exists and is an S3 URL
-            if profile.avatar_url and "s3" in profile.avatar_url and "amazonaws.com" in profile.avatar_url:
-                try:
-                    s3_service.delete_avatar(profile.avatar_url)
-                except Exception as e:
-                    # Log error but continue - old avatar deletion shouldn't block new upload
-                    logger.warning(f"Error deleting old avatar: {e}")
-            
+            # The old avatar's objects are deleted in the background once this commits
+            enqueue_s3_deletions(
+                db,
+                [s3_service.key_from_url(url) for url in _avatar_urls(profile.avatar_url, profile.avatar_variants)],
+                reason="avatar_replaced"
+            )
+
             # Update avatar URL
             profile.avatar_url = avatar_url
+            profile.avatar_variants = avatar_variants
             db.commit()
+            profile_cache.invalidate(user_id)
             db.refresh(profile)
             logger.info(f"Profile updated with new avatar URL: {avatar_url}")
         else:
@@ -189,16 +225,32 @@ async def upload_avatar(
             profile_data = {
                 "user_id": user_id,
                 "name": user_id,  # Default name
-                "avatar_url": avatar_url
+                "avatar_url": avatar_url,
+                "avatar_variants": avatar_variants
             }
             profile = create_or_update_profile(db, profile_data)
             logger.info(f"New profile created with avatar URL: {avatar_url}")
-        
-        return {"avatar_url": avatar_url, "message": "Avatar uploaded successfully"}
-        
+
+        return {
+            "avatar_url": avatar_url,
+            "avatar_variants": avatar_variants,
+            "avatar_srcset": build_avatar_srcset(avatar_variants),
+            "message": "Avatar uploaded successfully"
+        }
+
+    except ExecutorSaturated:
+        raise
     except Exception as e:
         logger.error(f"Failed to upload avatar for user {user_id}: {str(e)}", exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to upload avatar: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+def _avatar_urls(avatar_url: Optional[str], avatar_variants: Optional[dict]) -> List[str]:
+    """Every object URL of a stored avatar"""
+    urls = {url for sizes in (avatar_variants or {}).values() for url in sizes.values()}
+    if avatar_url:
+        urls.add(avatar_url)
+    return sorted(urls)
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
 from typing import List
 import uuid
@@ -12,13 +13,31 @@ from app.schemas import (
     SubmissionResponse, 
     UploadUrlRequest, 
     UploadUrlResponse,
+    UploadUrlsRequest,
+    UploadUrlsResponse,
     SubmissionDB,
-    SubmissionVersionCreate
+    SubmissionVersionCreate,
+    MultipartUploadRequest,
+    MultipartUploadResponse,
+    MultipartPartUrlsRequest,
+    MultipartPartUrlsResponse,
+    MultipartUploadRef,
+    MultipartCompleteRequest,
+    MultipartCompleteResponse,
+    UploadedPart,
+    SearchResult
+)
+from app.crud import (
+    create_submission, get_submission, get_submissions, create_submission_version, get_submissions_by_user,
+    search_submissions, get_file_blob, get_submission_file_url
 )
-from app.crud import create_submission, get_submission, get_submissions, create_submission_version, get_submissions_by_user
 from app.services.s3_service import s3_service
+from app.config import settings
+from app.executors import ExecutorSaturated, s3_executor
+from app.services.download_counter import download_counter
+from app.tracing import TracedRoute
 
-router = APIRouter(prefix="/api", tags=["submissions"])
+router = APIRouter(prefix="/api", tags=["submissions"], route_class=TracedRoute)
 
 @router.get("/health")
 async def health_check():
@@ -26,12 +45,18 @@ async def health_check():
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
 @router.post("/get-upload-url", response_model=UploadUrlResponse)
-async def get_upload_url(request: UploadUrlRequest):
+async def get_upload_url(request: UploadUrlRequest, db: Session = Depends(get_db)):
     """
-    Generate a pre-signed URL for uploading a file to S3
+    Generate a pre-signed URL for uploading a file to S3. If the request
+    carries the file's SHA-256 and those bytes are already stored, the
+    existing s3_url is returned instead and the upload can be skipped.
     """
     try:
-        result = s3_service.generate_upload_url(request.filename)
+        if request.sha256:
+            blob = get_file_blob(db, request.sha256)
+            if blob is not None:
+                return UploadUrlResponse(**s3_service.existing_upload(request.filename, blob.s3_url))
+        result = await s3_executor.run(s3_service.generate_upload_url, request.filename, request.sha256)
         return UploadUrlResponse(**result)
     except ValueError as e:
         # Validation errors should return 400, not 500
@@ -39,6 +64,8 @@ async def get_upload_url(request: UploadUrlRequest):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
+    except ExecutorSaturated:
+        raise
     except Exception as e:
         # Only unexpected errors should return 500
         raise HTTPException(
@@ -46,6 +73,123 @@ async def get_upload_url(request: UploadUrlRequest):
             detail=f"Error generating upload URL: {str(e)}"
         )
 
+@router.post("/get-upload-urls", response_model=UploadUrlsResponse)
+async def get_upload_urls(request: UploadUrlsRequest):
+    """
+    Generate pre-signed upload URLs for all files of a submission in one call
+    (PDF, LaTeX sources, ...). URLs are returned in the order of the filenames.
+    """
+    try:
+        files = await s3_executor.run(s3_service.generate_upload_urls, request.filenames)
+        return UploadUrlsResponse(files=files)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except ExecutorSaturated:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error generating upload URLs: {str(e)}"
+        )
+
+@router.post("/multipart-upload/initiate", response_model=MultipartUploadResponse)
+async def initiate_multipart_upload(request: MultipartUploadRequest):
+    """
+    Start a multipart upload for a large paper or LaTeX bundle
+    """
+    try:
+        upload = await s3_executor.run(s3_service.create_multipart_upload, request.filename, request.file_size)
+        return MultipartUploadResponse(**upload)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except ExecutorSaturated:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error starting multipart upload: {str(e)}"
+        )
+
+@router.post("/multipart-upload/part-urls", response_model=MultipartPartUrlsResponse)
+async def get_part_upload_urls(request: MultipartPartUrlsRequest):
+    """
+    Pre-sign PUT URLs for a batch of parts; each PUT response carries the part's ETag
+    """
+    try:
+        parts = await s3_executor.run(
+            s3_service.generate_part_upload_urls, request.file_key, request.upload_id, request.part_numbers
+        )
+        return MultipartPartUrlsResponse(
+            file_key=request.file_key,
+            upload_id=request.upload_id,
+            expires_in=settings.multipart_url_expiry,
+            parts=parts
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except ExecutorSaturated:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error signing upload parts: {str(e)}"
+        )
+
+@router.post("/multipart-upload/list-parts", response_model=List[UploadedPart])
+async def list_uploaded_parts(request: MultipartUploadRef):
+    """
+    Parts already stored for an upload, so an interrupted client can resume
+    """
+    try:
+        return await s3_executor.run(s3_service.list_uploaded_parts, request.file_key, request.upload_id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ExecutorSaturated:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error listing upload parts: {str(e)}"
+        )
+
+@router.post("/multipart-upload/complete", response_model=MultipartCompleteResponse)
+async def complete_multipart_upload(request: MultipartCompleteRequest):
+    """
+    Assemble the uploaded parts; the returned s3_url is then used in /submit
+    """
+    try:
+        parts = [part.model_dump() for part in request.parts]
+        result = await s3_executor.run(s3_service.complete_multipart_upload, request.file_key, request.upload_id, parts)
+        return MultipartCompleteResponse(**result)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except ExecutorSaturated:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error completing multipart upload: {str(e)}"
+        )
+
+@router.post("/multipart-upload/abort")
+async def abort_multipart_upload(request: MultipartUploadRef):
+    """
+    Abort an upload and discard its parts
+    """
+    try:
+        aborted = await s3_executor.run(s3_service.abort_multipart_upload, request.file_key, request.upload_id)
+        return {"success": True, "aborted": aborted}
+    except ExecutorSaturated:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error aborting multipart upload: {str(e)}"
+        )
+
 @router.post("/submit", response_model=SubmissionResponse)
 async def submit_paper(
     submission: SubmissionCreate,
@@ -119,6 +263,26 @@ async def list_public_submissions(
             detail=f"Error retrieving submissions: {str(e)}"
         )
 
+@router.get("/search", response_model=List[SearchResult])
+def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """
+    Full-text search over titles, abstracts and paper text. Returns the latest
+    matching version of each paper, best match first, with highlighted snippets.
+    """
+    try:
+        return search_submissions(db, q, skip=skip, limit=limit)
+    except Exception as e:
+        logging.error(f"Search failed for {q!r}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error searching submissions: {str(e)}"
+        )
+
 @router.post("/submissions/{aixiv_id}/versions", response_model=SubmissionDB, status_code=status.HTTP_201_CREATED)
 def create_new_version(
     aixiv_id: str,
@@ -157,4 +321,27 @@ async def get_submission_by_id(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Submission not found"
         )
-    return submission 
\ No newline at end of file
+    return submission 
+
+
+@router.get("/submissions/{submission_id}/download", status_code=status.HTTP_302_FOUND,
+            response_class=RedirectResponse)
+def download_submission(submission_id: int, db: Session = Depends(get_db)):
+    """
+    Redirect to a short-lived pre-signed GET for the submission's file and
+    count the download. Signing is local and the count is written later in
+    a batch, so the only I/O here is the s3_url lookup.
+    """
+    s3_url = get_submission_file_url(db, submission_id)
+    if s3_url is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Submission not found")
+    file_key = s3_service.key_from_url(s3_url)
+    try:
+        # Files outside our bucket are linked as they are
+        url = s3_service.generate_download_url(file_key) if file_key else s3_url
+    except Exception as e:
+        logging.error(f"Failed to sign download URL for submission {submission_id}: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to generate download URL")
+    download_counter.record(submission_id)
+    # Not cached by the client: every download goes through the counter
+    return RedirectResponse(url, status_code=status.HTTP_302_FOUND, headers={"Cache-Control": "no-store"})
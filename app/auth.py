@@ -1,21 +1,214 @@
+"""
+Clerk session token verification.
+
+Tokens are RS256 JWTs signed with keys Clerk publishes as a JWKS. Doing that
+naively would cost a JWKS download and an RSA verification per request, so:
+
+- `JWKSCache` keeps the key set in memory, looked up by the token's `kid`.
+  A background thread refreshes it every JWKS_REFRESH_SECONDS; a token
+  signed with an unknown kid (key rotation) triggers one refresh, at most
+  once per JWKS_MIN_REFRESH_SECONDS. Keys are fetched from CLERK_JWKS_URL,
+  then from CLERK_JWKS_FALLBACK_URL (e.g. a local stand-in, see
+  tests/jwks_standin.py) if the first fails.
+- `VerifiedTokenCache` keeps the claims of verified tokens in a bounded LRU
+  keyed by the token's SHA-256 until the token expires, so the signature of
+  a token is checked once rather than on every request.
+"""
 from fastapi import HTTPException, Security, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from typing import Optional
-import os
-import jwt
+from starlette.concurrency import run_in_threadpool
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import hashlib
 import json
-from jwt import PyJWKClient
+import logging
+import threading
+import time
+import urllib.request
+
+import jwt
+
+from app.config import settings
+from app.metrics import registry
+from app.tracing import traceparent_header
+
+logger = logging.getLogger(__name__)
 
 # Security scheme
 security = HTTPBearer()
 
+JWT_ALGORITHMS = ["RS256"]  # what Clerk signs session tokens with
+
+auth_verifications_total = registry.counter(
+    "aixiv_auth_verifications_total",
+    "Bearer token checks by result (cached, verified, rejected, unavailable)", ("result",)
+)
+jwks_refreshes_total = registry.counter(
+    "aixiv_jwks_refreshes_total", "JWKS downloads by source (primary, fallback) and outcome", ("source", "outcome")
+)
+
+
+class JWKSUnavailable(Exception):
+    """No JWKS could be fetched from any configured URL"""
+
+
+class JWKSCache:
+    """In-memory signing keys by kid, refreshed in the background"""
+
+    def __init__(self, urls: Optional[List[str]] = None, refresh_seconds: Optional[float] = None,
+                 min_refresh_seconds: Optional[float] = None, timeout: Optional[float] = None):
+        self.urls = urls if urls is not None else [
+            url for url in (settings.clerk_jwks_url, settings.clerk_jwks_fallback_url) if url
+        ]
+        self.refresh_seconds = refresh_seconds or settings.jwks_refresh_seconds
+        self.min_refresh_seconds = (
+            min_refresh_seconds if min_refresh_seconds is not None else settings.jwks_min_refresh_seconds
+        )
+        self.timeout = timeout or settings.jwks_fetch_timeout
+        self._keys: Dict[str, jwt.PyJWK] = {}
+        self._last_attempt = float("-inf")
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _fetch(self, url: str) -> Dict[str, jwt.PyJWK]:
+        headers = {"Accept": "application/json", "User-Agent": "aixiv-backend"}
+        traceparent = traceparent_header()
+        if traceparent:
+            headers["traceparent"] = traceparent
+        request = urllib.request.Request(url, headers=headers)
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            jwks = json.load(response)
+        keys = {}
+        for data in jwks.get("keys", []):
+            if data.get("kid") and data.get("use", "sig") == "sig":
+                try:
+                    keys[data["kid"]] = jwt.PyJWK(data)
+                except jwt.PyJWKError as e:
+                    logger.warning(f"Ignoring JWKS key {data['kid']}: {e}")
+        if not keys:
+            raise JWKSUnavailable(f"{url} has no usable signing keys")
+        return keys
+
+    def refresh(self) -> None:
+        """Replace the key set with a fresh download; raises JWKSUnavailable if every URL fails"""
+        self._last_attempt = time.monotonic()
+        errors = []
+        for source, url in zip(("primary", "fallback"), self.urls):
+            try:
+                keys = self._fetch(url)
+            except Exception as e:
+                jwks_refreshes_total.inc(source=source, outcome="error")
+                errors.append(f"{url}: {e}")
+                continue
+            jwks_refreshes_total.inc(source=source, outcome="ok")
+            self._keys = keys
+            return
+        raise JWKSUnavailable("; ".join(errors) or "No JWKS URL configured (CLERK_JWKS_URL)")
+
+    def get_key(self, kid: Optional[str]) -> jwt.PyJWK:
+        """The key for `kid`, refreshing once if it is unknown"""
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+        with self._refresh_lock:
+            key = self._keys.get(kid)
+            # Tokens with made-up kids must not turn into a stream of downloads
+            if key is None and (not self._keys or time.monotonic() - self._last_attempt >= self.min_refresh_seconds):
+                self.refresh()
+                key = self._keys.get(kid)
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unknown signing key {kid!r}")
+        return key
+
+    def run(self) -> None:
+        """Refresh until stop(); after a failure, retry sooner and keep the old keys"""
+        wait = 0.0
+        while not self._stop.wait(wait):
+            try:
+                self.refresh()
+                wait = self.refresh_seconds
+            except JWKSUnavailable as e:
+                logger.error(f"JWKS refresh failed: {e}")
+                wait = min(self.refresh_seconds, max(self.min_refresh_seconds, 1.0))
+
+    def start(self) -> threading.Thread:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="jwks-refresh", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout: float = 5) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+class VerifiedTokenCache:
+    """Claims of verified tokens by SHA-256 of the token, until they expire"""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or settings.verified_token_cache_size
+        self._entries: "OrderedDict[bytes, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest: bytes) -> Optional[dict]:
+        with self._lock:
+            claims = self._entries.get(digest)
+            if claims is None:
+                return None
+            if claims["exp"] <= time.time():
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return claims
+
+    def put(self, digest: bytes, claims: dict) -> None:
+        with self._lock:
+            self._entries[digest] = claims
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+jwks_cache = JWKSCache()
+verified_tokens = VerifiedTokenCache()
+
+
+def verify_token(token: str) -> dict:
+    """
+    Verify a Clerk session token's signature and claims and return the
+    claims. Blocking when the key set has to be downloaded.
+    """
+    header = jwt.get_unverified_header(token)
+    if header.get("alg") not in JWT_ALGORITHMS:
+        raise jwt.InvalidAlgorithmError(f"Unsupported algorithm {header.get('alg')!r}")
+    key = jwks_cache.get_key(header.get("kid"))
+    claims = jwt.decode(
+        token,
+        key.key,
+        algorithms=JWT_ALGORITHMS,
+        issuer=settings.clerk_issuer or None,
+        leeway=settings.jwt_leeway_seconds,
+        options={"require": ["exp", "sub"], "verify_aud": False},
+    )
+    if not isinstance(claims["sub"], str) or not claims["sub"]:
+        raise jwt.InvalidTokenError("Token has no subject")
+    # Clerk puts the requesting origin in azp instead of using aud
+    parties = [party.strip() for party in settings.clerk_authorized_parties.split(",") if party.strip()]
+    if parties and claims.get("azp") not in parties:
+        raise jwt.InvalidTokenError("Token was issued for another origin")
+    return claims
+
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Security(security)) -> dict:
     """
     Verify the JWT token from Clerk and return the current user.
-    
-    Extracts the user_id from Clerk JWT token without full verification.
-    In production, you should verify the signature using Clerk's public key.
     """
     if not credentials:
         raise HTTPException(
@@ -23,44 +216,37 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Security(
             detail="Authentication required",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
+
     token = credentials.credentials
-    
-    try:
-        # Decode without verification for development
-        # In production, use PyJWKClient with Clerk's JWKS endpoint
-        decoded = jwt.decode(token, options={"verify_signature": False})
-        
-        # Clerk tokens have 'sub' field with user ID
-        user_id = decoded.get("sub")
-        
-        if not user_id:
-            # Fallback to default-user for development
-            user_id = "default-user"
-        
-        return {
-            "user_id": user_id,
-            "token": token,
-            "email": decoded.get("email"),
-            "name": decoded.get("name") or decoded.get("username")
-        }
-        
-    except jwt.DecodeError:
-        # For development, return default user when token can't be decoded
-        return {
-            "user_id": "default-user",
-            "token": token,
-            "email": None,
-            "name": None
-        }
-    except Exception as e:
-        # For development, return default user on any error
-        return {
-            "user_id": "default-user",
-            "token": token,
-            "email": None,
-            "name": None
-        }
+    digest = hashlib.sha256(token.encode()).digest()
+    claims = verified_tokens.get(digest)
+    if claims is not None:
+        auth_verifications_total.inc(result="cached")
+    else:
+        try:
+            # Off the event loop: a key rotation means a JWKS download
+            claims = await run_in_threadpool(verify_token, token)
+        except JWKSUnavailable as e:
+            auth_verifications_total.inc(result="unavailable")
+            logger.error(f"Cannot verify tokens: {e}")
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Authentication is temporarily unavailable")
+        except jwt.InvalidTokenError as e:
+            auth_verifications_total.inc(result="rejected")
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=f"Invalid token: {e}",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        auth_verifications_total.inc(result="verified")
+        verified_tokens.put(digest, claims)
+
+    return {
+        "user_id": claims["sub"],
+        "token": token,
+        "email": claims.get("email"),
+        "name": claims.get("name") or claims.get("username")
+    }
 
 
 async def get_optional_current_user(
@@ -71,8 +257,8 @@ async def get_optional_current_user(
     """
     if not credentials:
         return None
-    
+
     try:
         return await get_current_user(credentials)
     except HTTPException:
-        return None
\ No newline at end of file
+        return None
@@ -23,11 +23,123 @@ class Settings(BaseSettings):
     # Application
     secret_key: str = os.getenv("SECRET_KEY", "your-secret-key-here")
     debug: bool = os.getenv("DEBUG", "True").lower() == "true"
-    auth_token: str = os.getenv("AUTH_TOKEN", "your-auth-token-here")
+
+    # Clerk session tokens (app/auth.py)
+    clerk_jwks_url: str = os.getenv("CLERK_JWKS_URL", "")  # https://<instance>.clerk.accounts.dev/.well-known/jwks.json
+    clerk_jwks_fallback_url: str = os.getenv("CLERK_JWKS_FALLBACK_URL", "")  # tried when CLERK_JWKS_URL fails
+    clerk_issuer: str = os.getenv("CLERK_ISSUER", "")  # iss is checked when set
+    clerk_authorized_parties: str = os.getenv("CLERK_AUTHORIZED_PARTIES", "")  # comma-separated azp origins; empty: any
+    jwks_refresh_seconds: float = os.getenv("JWKS_REFRESH_SECONDS", 3600)
+    jwks_min_refresh_seconds: float = os.getenv("JWKS_MIN_REFRESH_SECONDS", 30)  # unknown kids refresh at most this often
+    jwks_fetch_timeout: float = os.getenv("JWKS_FETCH_TIMEOUT", 3)  # seconds
+    jwt_leeway_seconds: float = os.getenv("JWT_LEEWAY_SECONDS", 5)  # clock skew allowed on exp/nbf
+    verified_token_cache_size: int = os.getenv("VERIFIED_TOKEN_CACHE_SIZE", 10000)
+
+    # Agent API tokens for /api/submit-review (app/services/agent_tokens.py)
+    agent_token_refresh_seconds: float = os.getenv("AGENT_TOKEN_REFRESH_SECONDS", 60)  # new and revoked tokens apply within this
+    agent_usage_flush_seconds: float = os.getenv("AGENT_USAGE_FLUSH_SECONDS", 10)
+    agent_usage_admin_token: str = os.getenv("AGENT_USAGE_ADMIN_TOKEN", "")  # sees every token's usage; empty: disabled
     paper_exist_check: bool = os.getenv("PAPER_EXIST_CHECK", False)
     ip_limit_window_size: int = os.getenv("IP_LIMIT_WINDOWSiZE", 0)
     ip_limit_frequency: int = os.getenv("IP_LIMIT_FREQUENCY", 3)
 
+    # S3 client (botocore Config)
+    s3_max_pool_connections: int = os.getenv("S3_MAX_POOL_CONNECTIONS", 32)  # keep >= S3_EXECUTOR_WORKERS
+    s3_connect_timeout: float = os.getenv("S3_CONNECT_TIMEOUT", 3)  # seconds
+    s3_read_timeout: float = os.getenv("S3_READ_TIMEOUT", 20)  # seconds
+    s3_retry_mode: str = os.getenv("S3_RETRY_MODE", "adaptive")  # legacy | standard | adaptive
+    s3_max_attempts: int = os.getenv("S3_MAX_ATTEMPTS", 5)  # including the first attempt
+    s3_tcp_keepalive: bool = os.getenv("S3_TCP_KEEPALIVE", "True").lower() == "true"
+
+    # Multipart uploads
+    multipart_part_size_mb: int = os.getenv("MULTIPART_PART_SIZE_MB", 16)  # raised automatically past 10000 parts
+    multipart_max_presign_parts: int = os.getenv("MULTIPART_MAX_PRESIGN_PARTS", 100)  # part URLs per request
+    multipart_url_expiry: int = os.getenv("MULTIPART_URL_EXPIRY", 3600)  # seconds
+    multipart_abort_after_days: int = os.getenv("MULTIPART_ABORT_AFTER_DAYS", 1)
+    orphan_grace_days: float = os.getenv("ORPHAN_GRACE_DAYS", 7)  # unreferenced objects younger than this are kept
+
+    # Local disk cache behind /api/files/{key} (app/services/file_cache.py)
+    file_cache_enabled: bool = os.getenv("FILE_CACHE_ENABLED", "False").lower() == "true"
+    file_cache_dir: str = os.getenv("FILE_CACHE_DIR", "/tmp/aixiv-file-cache")
+    file_cache_max_bytes: int = os.getenv("FILE_CACHE_MAX_BYTES", 5 * 1024 ** 3)  # per worker process
+
+    # Download redirects (/api/submissions/{id}/download)
+    download_url_expiry: int = os.getenv("DOWNLOAD_URL_EXPIRY", 300)  # seconds a signed GET stays valid
+    download_count_flush_seconds: float = os.getenv("DOWNLOAD_COUNT_FLUSH_SECONDS", 10)
+
+    # Profile summary cache (app/services/profile_cache.py)
+    profile_cache_ttl_seconds: float = os.getenv("PROFILE_CACHE_TTL_SECONDS", 60)  # bounds staleness across workers
+    profile_cache_max_entries: int = os.getenv("PROFILE_CACHE_MAX_ENTRIES", 50000)
+    autocomplete_cache_ttl_seconds: float = os.getenv("AUTOCOMPLETE_CACHE_TTL_SECONDS", 30)
+    autocomplete_cache_max_entries: int = os.getenv("AUTOCOMPLETE_CACHE_MAX_ENTRIES", 10000)
+
+    # Executors for blocking work (app/executors.py)
+    s3_executor_workers: int = os.getenv("S3_EXECUTOR_WORKERS", 16)
+    s3_executor_queue: int = os.getenv("S3_EXECUTOR_QUEUE", 64)  # waiting tasks before requests get 503
+    image_executor_workers: int = os.getenv("IMAGE_EXECUTOR_WORKERS", 2)  # processes
+    image_executor_queue: int = os.getenv("IMAGE_EXECUTOR_QUEUE", 8)
+    avatar_max_pixels: int = os.getenv("AVATAR_MAX_PIXELS", 25_000_000)  # larger images are rejected before decoding
+
+    # Post-upload pipeline (app/services/upload_pipeline.py)
+    pipeline_in_process: bool = os.getenv("PIPELINE_IN_PROCESS", "True").lower() == "true"
+    pipeline_concurrency: int = os.getenv("PIPELINE_CONCURRENCY", 4)  # jobs processed at once per worker
+    pipeline_max_attempts: int = os.getenv("PIPELINE_MAX_ATTEMPTS", 5)
+    pipeline_retry_base_seconds: float = os.getenv("PIPELINE_RETRY_BASE_SECONDS", 30)  # doubles per attempt
+    pipeline_poll_seconds: float = os.getenv("PIPELINE_POLL_SECONDS", 5)
+    pipeline_lease_seconds: int = os.getenv("PIPELINE_LEASE_SECONDS", 600)  # running jobs older than this are reclaimed
+    pipeline_thumbnail_width: int = os.getenv("PIPELINE_THUMBNAIL_WIDTH", 320)
+    pipeline_pdf_processes: int = os.getenv("PIPELINE_PDF_PROCESSES", 2)  # processes reading page counts and thumbnails
+    pipeline_pdf_timeout: float = os.getenv("PIPELINE_PDF_TIMEOUT", 60)  # seconds per file
+
+    # Background S3 deletions (app/services/deletion_queue.py)
+    deletion_sweeper_in_process: bool = os.getenv("DELETION_SWEEPER_IN_PROCESS", "True").lower() == "true"
+    deletion_batch_size: int = os.getenv("DELETION_BATCH_SIZE", 1000)  # keys per DeleteObjects request, max 1000
+    deletion_max_attempts: int = os.getenv("DELETION_MAX_ATTEMPTS", 8)
+    deletion_retry_base_seconds: float = os.getenv("DELETION_RETRY_BASE_SECONDS", 60)  # doubles per attempt
+    deletion_poll_seconds: float = os.getenv("DELETION_POLL_SECONDS", 30)
+
+    # Full-text search (app/services/text_index.py)
+    search_index_processes: int = os.getenv("SEARCH_INDEX_PROCESSES", 2)  # PDF text extraction processes
+    search_extract_timeout: float = os.getenv("SEARCH_EXTRACT_TIMEOUT", 120)  # seconds per file
+    search_max_text_chars: int = os.getenv("SEARCH_MAX_TEXT_CHARS", 200000)  # keeps tsvectors well under 1MB
+
+    # Database pool and startup
+    db_pool_size: int = os.getenv("DB_POOL_SIZE", 5)
+    db_max_overflow: int = os.getenv("DB_MAX_OVERFLOW", 10)
+    db_pool_warmup: int = os.getenv("DB_POOL_WARMUP", 2)  # connections pre-opened at startup
+    schema_check: str = os.getenv("SCHEMA_CHECK", "warn")  # off | warn | strict
+
+    # paper_review partitioning and retention
+    review_partitions_ahead: int = os.getenv("REVIEW_PARTITIONS_AHEAD", 3)  # months created in advance
+    review_retention_months: int = os.getenv("REVIEW_RETENTION_MONTHS", 12)  # older partitions are archived
+    review_archive_prefix: str = os.getenv("REVIEW_ARCHIVE_PREFIX", "archive/paper_review")
+
+    # HTTP request metrics (app/http_metrics.py)
+    http_metrics: bool = os.getenv("HTTP_METRICS", "True").lower() == "true"
+
+    # Logging (app/logging_config.py)
+    log_level: str = os.getenv("LOG_LEVEL", "INFO")
+    log_dir: str = os.getenv("LOG_DIR", "logs")  # app.log and its rotations
+    log_format: str = os.getenv("LOG_FORMAT", "json")  # json | text
+    log_max_bytes: int = os.getenv("LOG_MAX_BYTES", 50 * 1024 ** 2)  # app.log is rotated at this size
+    log_backup_count: int = os.getenv("LOG_BACKUP_COUNT", 5)  # rotated files kept
+    log_queue_size: int = os.getenv("LOG_QUEUE_SIZE", 10000)  # records waiting to be written; more are dropped
+    log_sample_rates: str = os.getenv(
+        "LOG_SAMPLE_RATES", "submit-review:request=0.1,get-review:request=0.1"
+    )  # event=share of INFO records kept, comma-separated
+
+    # Request tracing (app/tracing.py)
+    tracing: bool = os.getenv("TRACING", "True").lower() == "true"  # trace IDs, spans and Server-Timing
+    trace_sample_rate: float = os.getenv("TRACE_SAMPLE_RATE", 0.01)  # share of requests without a traceparent exported
+    # json | none | package.module:Class; none under TESTING, so test runs don't write traces
+    trace_exporter: str = os.getenv("TRACE_EXPORTER", "none" if os.getenv("TESTING") else "json")
+    trace_file: str = os.getenv("TRACE_FILE", "logs/traces.jsonl")  # json exporter output
+
+    # SQL instrumentation
+    sql_instrumentation: bool = os.getenv("SQL_INSTRUMENTATION", "True").lower() == "true"
+    slow_query_ms: float = os.getenv("SLOW_QUERY_MS", 200)
+    repeated_statement_threshold: int = os.getenv("REPEATED_STATEMENT_THRESHOLD", 5)
+
     
     # CORS Configuration - handle both env var and default
     @property
@@ -10,12 +10,24 @@ from app.models import Submission, UserProfile
 from app.schemas import SubmissionCreate
 from typing import List, Optional, Dict
 from app.constants import AgentType, DocType, ReviewerConst
-from sqlalchemy import func
-from app.models import Submission, UserProfile, PaperReview
-from app.schemas import SubmissionCreate, SubmissionVersionCreate, SubmitReviewIn, Review
-from typing import List, Optional, Any, Dict
+from sqlalchemy import func, select, bindparam, lambda_stmt, text, update, delete, case, null
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import Row
+from app.models import Submission, UserProfile, PaperReview, SubmissionJob, FileBlob, S3Deletion, AuthorName
+from app.services.s3_service import s3_service
+from app.services.profile_cache import profile_cache
+from app.services.autocomplete_cache import autocomplete_cache
+from app.schemas import SubmissionCreate, SubmissionVersionCreate, SubmitReviewIn, Review, ProfileSummary, build_avatar_srcset, AuthorSuggestion
+from typing import List, Optional, Any, Dict, Iterable, Iterator
 from datetime import datetime
+import itertools
 import logging
+from app.tracing import trace_module_functions
+
+# Jobs queued for every new submission, processed by app/services/upload_pipeline.py
+JOB_PROCESS_UPLOAD = "process_upload"
+JOB_INDEX_TEXT = "index_text"  # app/services/text_index.py
+SUBMISSION_JOB_KINDS = [JOB_PROCESS_UPLOAD, JOB_INDEX_TEXT]
 
 def generate_aixiv_id(db: Session) -> str:
     """
@@ -54,6 +66,7 @@ def create_submission(db: Session, submission: SubmissionCreate) -> Submission:
         license=submission.license,
         abstract=submission.abstract,
         s3_url=submission.s3_url,
+        s3_key=s3_service.key_from_url(submission.s3_url),
         uploaded_by=submission.uploaded_by,
         doi=submission.doi,
         doc_type=submission.doc_type,
@@ -61,6 +74,10 @@ def create_submission(db: Session, submission: SubmissionCreate) -> Submission:
         # Status is now handled by the database default='Under Review'
     )
     db.add(db_submission)
+    db.flush()
+    enqueue_submission_jobs(db, db_submission.id)
+    attach_file_blob(db, db_submission.s3_url)
+    count_author_names(db, db_submission.agent_authors, 1)
     db.commit()
     db.refresh(db_submission)
     return db_submission
@@ -94,21 +111,130 @@ def create_submission_version(db: Session, submission: SubmissionVersionCreate,
 
     db_submission = Submission(
         **submission.dict(),
+        s3_key=s3_service.key_from_url(submission.s3_url),
         aixiv_id=aixiv_id,
         version=new_version_str,
         status="Under Review",  # Reset status for new version
     )
     db.add(db_submission)
+    db.flush()
+    enqueue_submission_jobs(db, db_submission.id)
+    attach_file_blob(db, db_submission.s3_url)
+    count_author_names(db, db_submission.agent_authors, 1)
     db.commit()
     db.refresh(db_submission)
     return db_submission
 
 
-def get_submission(db: Session, submission_id: int) -> Optional[Submission]:
+def enqueue_submission_jobs(db: Session, submission_id: int, kinds: Optional[List[str]] = None) -> None:
+    """
+    Queue background jobs for a submission in the caller's transaction, so a
+    committed submission always has its jobs. Existing jobs are left alone.
+    """
+    kinds = kinds or SUBMISSION_JOB_KINDS
+    db.execute(
+        pg_insert(SubmissionJob)
+        .values([{"submission_id": submission_id, "kind": kind} for kind in kinds])
+        .on_conflict_do_nothing(index_elements=["submission_id", "kind"])
+    )
+
+
+def count_author_names(db: Session, names: List[str], delta: int) -> None:
+    """
+    Add `delta` to the submission counts of author names, in the caller's
+    transaction. Names no submission uses any more are removed.
+    """
+    # Sorted, so concurrent submissions lock the rows in the same order
+    names = sorted({name.strip() for name in names or [] if name and name.strip()})
+    if not names:
+        return
+    if delta > 0:
+        db.execute(
+            pg_insert(AuthorName)
+            .values([{"name": name, "submission_count": delta} for name in names])
+            .on_conflict_do_update(index_elements=["name"],
+                                   set_={"submission_count": AuthorName.submission_count + delta})
+        )
+    else:
+        db.execute(
+            update(AuthorName).where(AuthorName.name.in_(names))
+            .values(submission_count=AuthorName.submission_count + delta)
+        )
+        db.execute(delete(AuthorName).where(AuthorName.name.in_(names), AuthorName.submission_count <= 0))
+
+
+# file_blobs maps a SHA-256 to the object holding those bytes, with the number
+# of submissions using it. Rows are created by the upload pipeline from hashes
+# it computed itself (app/services/upload_pipeline.py); submissions created
+# with the URL of a known blob count as another reference.
+_file_blob_by_sha256 = (
+    select(FileBlob.__table__).where(FileBlob.sha256 == bindparam("sha256"), FileBlob.ref_count > 0)
+)
+
+
+def get_file_blob(db: Session, sha256: str) -> Optional[Row]:
+    """The stored file with this SHA-256 (hex), if any submission still uses it"""
+    return db.connection().execute(_file_blob_by_sha256, {"sha256": sha256.lower()}).first()
+
+
+def attach_file_blob(db: Session, s3_url: str) -> None:
+    """Count one more submission using `s3_url`, in the caller's transaction"""
+    db.execute(
+        update(FileBlob).where(FileBlob.s3_url == s3_url).values(ref_count=FileBlob.ref_count + 1)
+    )
+
+
+def release_file_blob(db: Session, s3_url: str) -> bool:
+    """
+    Drop one reference to `s3_url` in the caller's transaction. Returns True
+    when no submission uses the object any more (including objects that were
+    never indexed), so it may be deleted after commit.
+    """
+    remaining = db.execute(
+        update(FileBlob).where(FileBlob.s3_url == s3_url, FileBlob.ref_count > 0)
+        .values(ref_count=FileBlob.ref_count - 1)
+        .returning(FileBlob.ref_count)
+    ).scalar()
+    if remaining == 0:
+        # Gone from the index so no new upload is deduplicated against it
+        db.execute(delete(FileBlob).where(FileBlob.s3_url == s3_url))
+    return not remaining
+
+
+# Hot read paths select straight from the tables using statements built once at
+# import (or lambda statements where filters are optional), so SQLAlchemy reuses
+# the compiled form. They return plain Row objects: rows support attribute
+# access, so response models with from_attributes=True validate them directly
+# without ORM hydration or identity-map bookkeeping. Writes keep using the ORM.
+_submission_by_id = select(Submission.__table__).where(Submission.id == bindparam("submission_id"))
+
+_profile_by_user_id = select(UserProfile.__table__).where(UserProfile.user_id == bindparam("user_id"))
+
+_submission_exists = (
+    select(Submission.id)
+    .where(
+        Submission.aixiv_id == bindparam("aixiv_id"),
+        Submission.version == bindparam("version"),
+        Submission.doc_type == bindparam("doc_type"),
+    )
+    .limit(1)
+)
+
+
+def get_submission(db: Session, submission_id: int) -> Optional[Row]:
+    """
+    Get a submission by ID (read-only row)
+    """
+    return db.connection().execute(_submission_by_id, {"submission_id": submission_id}).first()
+
+_submission_file_url = select(Submission.s3_url).where(Submission.id == bindparam("submission_id"))
+
+def get_submission_file_url(db: Session, submission_id: int) -> Optional[str]:
     """
-    Get a submission by ID
+    The s3_url of a submission, or None if it does not exist (download
+    redirects only need this column)
     """
-    return db.query(Submission).filter(Submission.id == submission_id).first()
+    return db.connection().execute(_submission_file_url, {"submission_id": submission_id}).scalar()
 
 def get_submissions(db: Session, skip: int = 0, limit: int = 100) -> List[Submission]:
     """
@@ -126,63 +252,176 @@ def update_submission(db: Session, submission_id: int, submission_data: dict) ->
     """
     Update a submission
     """
-    db_submission = get_submission(db, submission_id)
+    db_submission = db.get(Submission, submission_id)
     if db_submission:
         for key, value in submission_data.items():
             if hasattr(db_submission, key):
                 setattr(db_submission, key, value)
+        if "s3_url" in submission_data:
+            db_submission.s3_key = s3_service.key_from_url(db_submission.s3_url)
         db.commit()
         db.refresh(db_submission)
     return db_submission
 
+def _file_shared(db: Session, submission: Submission, file_key: str) -> bool:
+    """Whether another submission points at the same file (e.g. a version that kept it), however its URL is spelled"""
+    return db.execute(
+        select(Submission.id).where(Submission.s3_key == file_key, Submission.id != submission.id).limit(1)
+    ).first() is not None
+
+
+def enqueue_s3_deletions(db: Session, keys: List[Optional[str]], reason: str) -> None:
+    """
+    Queue S3 objects for deletion in the caller's transaction, so they are
+    only deleted once the change that stopped using them is committed. Keys
+    outside our bucket (None) are skipped; queueing a key twice is a no-op.
+    """
+    rows = [{"s3_key": key, "reason": reason} for key in dict.fromkeys(keys) if key]
+    if rows:
+        db.execute(pg_insert(S3Deletion).values(rows).on_conflict_do_nothing(index_elements=["s3_key"]))
+
+
 def delete_submission(db: Session, submission_id: int) -> bool:
     """
     Delete a submission
     """
-    db_submission = get_submission(db, submission_id)
+    db_submission = db.get(Submission, submission_id)
     if db_submission:
+        keys = [f"thumbnails/submissions/{submission_id}.jpg"]
+        file_key = s3_service.key_from_url(db_submission.s3_url)
+        if release_file_blob(db, db_submission.s3_url) and file_key and not _file_shared(db, db_submission, file_key):
+            keys.append(file_key)
+        enqueue_s3_deletions(db, keys, reason="submission_deleted")
+        count_author_names(db, db_submission.agent_authors, -1)
         db.delete(db_submission)
         db.commit()
         return True
     return False
 
 
-def get_profile_by_user_id(db: Session, user_id: str) -> Optional[UserProfile]:
+def get_profile_by_user_id(db: Session, user_id: str) -> Optional[Row]:
     """
-    Get a user profile by user ID
+    Get a user profile by user ID (read-only row)
+    """
+    return db.connection().execute(_profile_by_user_id, {"user_id": user_id}).first()
+
+
+_profile_summaries = select(
+    UserProfile.user_id, UserProfile.name, UserProfile.affiliation, UserProfile.avatar_url, UserProfile.avatar_variants
+).where(UserProfile.user_id.in_(bindparam("user_ids", expanding=True)))
+
+
+def get_profile_summaries(db: Session, user_ids: List[str]) -> Dict[str, ProfileSummary]:
+    """
+    Compact profiles for several users, from the profile cache where
+    possible and with one IN query for the rest. Users without a profile
+    are left out.
+    """
+    summaries, missing = profile_cache.get_many(user_ids)
+    if missing:
+        generation = profile_cache.generation()
+        loaded = dict.fromkeys(missing)
+        for row in db.connection().execute(_profile_summaries, {"user_ids": missing}):
+            loaded[row.user_id] = ProfileSummary(
+                user_id=row.user_id, name=row.name, affiliation=row.affiliation,
+                avatar_url=row.avatar_url, avatar_srcset=build_avatar_srcset(row.avatar_variants),
+            )
+        profile_cache.put_many(loaded, generation)
+        summaries.update(loaded)
+    return {user_id: summary for user_id, summary in summaries.items() if summary is not None}
+
+
+def get_profile_for_update(db: Session, user_id: str) -> Optional[UserProfile]:
+    """
+    Get a user profile by user ID as an ORM object that can be modified
     """
     return db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
 
 
-def create_or_update_profile(db: Session, profile_data: Dict) -> UserProfile:
+# Maintained by the database, never taken from the caller
+_PROFILE_MANAGED_COLUMNS = {"id", "created_at", "updated_at"}
+_PROFILE_COLUMNS = [c for c in UserProfile.__table__.columns.keys() if c not in _PROFILE_MANAGED_COLUMNS]
+
+
+def _profile_row(profile_data: Dict, columns) -> Dict:
+    row = {column: profile_data.get(column) for column in columns}
+    if row.get("avatar_variants") is None and "avatar_variants" in row:
+        # SQL NULL rather than a JSON null, so COALESCE below falls through
+        row["avatar_variants"] = null()
+    return row
+
+
+def _profile_upsert(rows: List[Dict], columns):
+    """
+    INSERT ... ON CONFLICT (user_id) DO UPDATE for rows sharing `columns`.
+    On conflict, None values keep what is stored, and a new avatar_url
+    without variants drops the old avatar's size variants.
+    """
+    table = UserProfile.__table__
+    stmt = pg_insert(table).values(rows)
+    excluded = stmt.excluded
+    updates = {
+        column: func.coalesce(excluded[column], table.c[column])
+        for column in columns if column not in ("user_id", "avatar_variants")
+    }
+    variants = table.c.avatar_variants
+    if "avatar_url" in columns:
+        variants = case(
+            (excluded.avatar_url.is_not(None) & excluded.avatar_url.is_distinct_from(table.c.avatar_url), null()),
+            else_=table.c.avatar_variants,
+        )
+    if "avatar_variants" in columns:
+        variants = func.coalesce(excluded.avatar_variants, variants)
+    updates["avatar_variants"] = variants
+    updates["updated_at"] = func.now()
+    return stmt.on_conflict_do_update(index_elements=["user_id"], set_=updates)
+
+
+def create_or_update_profile(db: Session, profile_data: Dict) -> Row:
     """
-    Create or update a user profile
+    Create or update a user profile in one statement (INSERT ... ON
+    CONFLICT ... RETURNING), so two first-time writes for the same user
+    cannot collide on the unique user_id. Fields passed as None are left
+    unchanged on an existing profile.
     """
     user_id = profile_data.get('user_id')
-    existing_profile = get_profile_by_user_id(db, user_id)
-
-    # Get valid UserProfile columns
-    valid_columns = UserProfile.__table__.columns.keys()
+    columns = [column for column in _PROFILE_COLUMNS if column in profile_data]
+    stmt = _profile_upsert([_profile_row(profile_data, columns)], columns).returning(*UserProfile.__table__.c)
+    profile = db.execute(stmt).first()
+    db.commit()
+    profile_cache.invalidate(user_id)
+    return profile
 
-    # Filter profile_data to only include valid columns
-    filtered_data = {k: v for k, v in profile_data.items() if k in valid_columns}
 
-    if existing_profile:
-        # Update existing profile
-        for key, value in filtered_data.items():
-            if value is not None:
-                setattr(existing_profile, key, value)
-        db.commit()
-        db.refresh(existing_profile)
-        return existing_profile
-    else:
-        # Create new profile with filtered data
-        new_profile = UserProfile(**filtered_data)
-        db.add(new_profile)
+def bulk_upsert_profiles(db: Session, profiles: Iterable[Dict], chunk_size: int = 2000) -> int:
+    """
+    Upsert many profiles, one multi-row statement and commit per chunk of
+    `chunk_size`. Same rules as create_or_update_profile; within a chunk,
+    later rows for a user are merged into earlier ones. Returns the number
+    of rows upserted.
+    """
+    written = 0
+    for chunk in _chunks(profiles, chunk_size):
+        merged: Dict[str, Dict] = {}
+        for profile in chunk:
+            current = merged.setdefault(profile["user_id"], {})
+            current.update({k: v for k, v in profile.items() if v is not None or k not in current})
+        columns = [column for column in _PROFILE_COLUMNS if any(column in p for p in merged.values())]
+        db.execute(_profile_upsert([_profile_row(p, columns) for p in merged.values()], columns))
         db.commit()
-        db.refresh(new_profile)
-        return new_profile
-    return False
+        for user_id in merged:
+            profile_cache.invalidate(user_id)
+        written += len(merged)
+    return written
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
 
 
 def create_paper_review(
@@ -206,6 +445,27 @@ def create_paper_review(
     return rec
 
 
+def _filter_reviews(
+        stmt,
+        start_date: Optional[datetime],
+        end_date: Optional[datetime],
+        version: Optional[str],
+        ip: Optional[str],
+        doc_type: Optional[int]
+):
+    if start_date:
+        stmt += lambda s: s.where(PaperReview.create_time >= start_date)
+    if end_date:
+        stmt += lambda s: s.where(PaperReview.create_time <= end_date)
+    if version:
+        stmt += lambda s: s.where(PaperReview.version == version)
+    if ip:
+        stmt += lambda s: s.where(PaperReview.ip == ip)
+    if doc_type:
+        stmt += lambda s: s.where(PaperReview.doc_type == doc_type)
+    return stmt
+
+
 def get_reviews(
         db: Session,
         aixiv_id: str,
@@ -214,28 +474,135 @@ def get_reviews(
         version: Optional[str] = None,
         ip: Optional[str] = None,
         doc_type: Optional[int] = None
-) -> list[type[PaperReview]]:
-    query = db.query(PaperReview).filter(PaperReview.aixiv_id == aixiv_id)
-    if start_date:
-        query = query.filter(PaperReview.create_time >= start_date)
-    if end_date:
-        query = query.filter(PaperReview.create_time <= end_date)
-    if version:
-        query = query.filter(PaperReview.version == version)
-    if ip:
-        query = query.filter(PaperReview.ip == ip)
-    if doc_type:
-        query = query.filter(PaperReview.doc_type == doc_type)
+) -> List[Row]:
+    stmt = lambda_stmt(
+        lambda: select(
+            PaperReview.id,
+            PaperReview.aixiv_id,
+            PaperReview.version,
+            PaperReview.review_results,
+            PaperReview.agent_type,
+            PaperReview.create_time,
+        ).where(PaperReview.aixiv_id == aixiv_id)
+    )
+    stmt = _filter_reviews(stmt, start_date, end_date, version, ip, doc_type)
+    return db.connection().execute(stmt).all()
 
-    reviews = query.all()
-    return reviews
+
+def count_reviews(
+        db: Session,
+        aixiv_id: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        version: Optional[str] = None,
+        ip: Optional[str] = None,
+        doc_type: Optional[int] = None
+) -> int:
+    """
+    Count reviews matching the same filters as get_reviews, without fetching them
+    """
+    stmt = lambda_stmt(
+        lambda: select(func.count()).select_from(PaperReview).where(PaperReview.aixiv_id == aixiv_id)
+    )
+    stmt = _filter_reviews(stmt, start_date, end_date, version, ip, doc_type)
+    return db.connection().execute(stmt).scalar_one()
 
 # Check if th paper is exitst
-def check_if_exist(db: Session, aixiv_id: str, version: str, doc_type: str) -> Optional[Submission]:
-    record = (
-        db.query(Submission)
-        .filter(Submission.aixiv_id == aixiv_id, Submission.version == version, Submission.doc_type == doc_type)
-        .first()
+def check_if_exist(db: Session, aixiv_id: str, version: str, doc_type: str) -> Optional[int]:
+    """
+    Return the id of the matching submission, or None if it does not exist
+    """
+    return db.connection().execute(
+        _submission_exists, {"aixiv_id": aixiv_id, "version": version, "doc_type": doc_type}
+    ).scalar()
+
+
+# Matches are collapsed to the newest matching version of each paper, then
+# ranked; ts_headline (which re-parses the body) only runs on the page shown.
+_search_submissions = text("""
+    WITH query AS (SELECT websearch_to_tsquery('english', :q) AS q),
+    matches AS (
+        SELECT DISTINCT ON (s.aixiv_id)
+               s.id, s.aixiv_id, s.version, s.title, s.agent_authors, s.created_at, t.body,
+               ts_rank_cd(t.search_vector, query.q) AS rank
+        FROM submission_texts t
+        JOIN submissions s ON s.id = t.submission_id
+        CROSS JOIN query
+        WHERE t.search_vector @@ query.q
+        ORDER BY s.aixiv_id, s.created_at DESC
+    ),
+    page AS (
+        SELECT * FROM matches ORDER BY rank DESC, created_at DESC LIMIT :limit OFFSET :skip
     )
+    SELECT page.id, page.aixiv_id, page.version, page.title, page.agent_authors, page.created_at, page.rank,
+           ts_headline('english', page.body, query.q,
+                       'MaxFragments=2, MaxWords=30, MinWords=10, FragmentDelimiter=" ... "') AS snippet
+    FROM page CROSS JOIN query
+    ORDER BY page.rank DESC, page.created_at DESC
+""")
 
-    return record
+
+def search_submissions(db: Session, q: str, skip: int = 0, limit: int = 20) -> List[Row]:
+    """
+    Full-text search over titles, abstracts and extracted file text.
+    `q` uses web search syntax: quoted phrases, OR, and -excluded terms.
+    """
+    return db.connection().execute(_search_submissions, {"q": q, "skip": skip, "limit": limit}).all()
+
+
+# Each branch is answered from a pg_trgm GIN index (ILIKE '%q%') and ranked:
+# matches at the start of the value, then at the start of a word, then
+# anywhere; more used names first within a rank.
+_autocomplete_authors = text("""
+    (SELECT 'profile' AS kind, name AS label, user_id, affiliation, avatar_url, NULL::integer AS count,
+            CASE WHEN name ILIKE :prefix THEN 0 WHEN name ILIKE :word THEN 1 ELSE 2 END AS tier
+     FROM user_profiles WHERE name ILIKE :contains
+     ORDER BY tier, length(name), name LIMIT :limit)
+    UNION ALL
+    (SELECT 'author', name, NULL, NULL, NULL, submission_count,
+            CASE WHEN name ILIKE :prefix THEN 0 WHEN name ILIKE :word THEN 1 ELSE 2 END AS tier
+     FROM author_names WHERE name ILIKE :contains
+     ORDER BY tier, submission_count DESC, name LIMIT :limit)
+    UNION ALL
+    (SELECT 'affiliation', affiliation, NULL, NULL, NULL, count(*)::integer,
+            CASE WHEN affiliation ILIKE :prefix THEN 0 WHEN affiliation ILIKE :word THEN 1 ELSE 2 END AS tier
+     FROM user_profiles WHERE affiliation ILIKE :contains
+     GROUP BY affiliation
+     ORDER BY tier, count(*) DESC, affiliation LIMIT :limit)
+""")
+
+_AUTOCOMPLETE_KINDS = {"profile": 0, "author": 1, "affiliation": 2}
+
+
+def _like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def autocomplete_authors(db: Session, q: str, limit: int = 10) -> List[AuthorSuggestion]:
+    """
+    Top `limit` profile names, agent author names and affiliations matching
+    `q` (case-insensitive substring), best first. Results are cached per
+    normalized prefix for a short time.
+    """
+    q = " ".join(q.split()).lower()
+    key = (q, limit)
+    cached = autocomplete_cache.get(key)
+    if cached is not None:
+        return cached
+
+    term = _like_escape(q)
+    rows = db.connection().execute(_autocomplete_authors, {
+        "prefix": f"{term}%", "word": f"% {term}%", "contains": f"%{term}%", "limit": limit,
+    }).all()
+    rows.sort(key=lambda row: (row.tier, _AUTOCOMPLETE_KINDS[row.kind], -(row.count or 0), row.label))
+    suggestions = [
+        AuthorSuggestion(kind=row.kind, label=row.label, user_id=row.user_id, affiliation=row.affiliation,
+                         avatar_url=row.avatar_url, count=row.count)
+        for row in rows[:limit]
+    ]
+    autocomplete_cache.put(key, suggestions)
+    return suggestions
+
+
+# Every public function above runs in a crud.<name> span (app/tracing.py)
+trace_module_functions(globals(), __name__, "crud")
@@ -1,9 +1,18 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.config import settings
+from app.db_instrumentation import instrument_engine, register_pool_metrics
+from app.tracing import instrument_engine_tracing
 
 # Create database engine
-engine = create_engine(settings.database_url)
+engine = create_engine(
+    settings.database_url,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+)
+instrument_engine(engine)
+register_pool_metrics(engine)
+instrument_engine_tracing(engine)
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
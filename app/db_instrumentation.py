@@ -0,0 +1,212 @@
+"""
+Per-request SQL instrumentation.
+
+SQLAlchemy cursor events attribute query count and DB time to the route that
+issued them, log slow queries with redacted parameters and flag statements
+repeated within one request (the usual N+1 symptom). Totals are reported in a
+`Server-Timing` response header and on the /metrics endpoint.
+"""
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+from app.config import settings
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("app.slow_query")
+
+BACKGROUND_ROUTE = "background"
+# Requests that matched no route share one label, so arbitrary URLs can't
+# grow the metric label set without bound
+UNMATCHED_ROUTE = "unmatched"
+
+db_queries_total = registry.counter(
+    "aixiv_db_queries_total", "SQL statements executed, by route template", ("route",)
+)
+db_query_seconds_total = registry.counter(
+    "aixiv_db_query_seconds_total", "Time spent executing SQL statements, by route template", ("route",)
+)
+db_slow_queries_total = registry.counter(
+    "aixiv_db_slow_queries_total", "SQL statements slower than SLOW_QUERY_MS, by route template", ("route",)
+)
+db_pool_connections = registry.gauge(
+    "aixiv_db_pool_connections", "Connections of the SQLAlchemy pool by state (checked_out, idle, overflow)", ("state",)
+)
+db_repeated_statements_total = registry.counter(
+    "aixiv_db_repeated_statements_total",
+    "Statements repeated more than REPEATED_STATEMENT_THRESHOLD times in one request",
+    ("route",),
+)
+
+
+def route_template(scope: dict) -> str:
+    """The matched route's path template (/api/submissions/{submission_id}), not the raw path"""
+    # Routing stores the matched route in the scope before the endpoint runs
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+class RequestQueryStats:
+    """Query totals for a single request (or any other tracked unit of work)"""
+
+    __slots__ = ("scope", "count", "total_ms", "statements", "flagged")
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.scope = scope
+        self.count = 0
+        self.total_ms = 0.0
+        self.statements: Counter = Counter()
+        self.flagged: set = set()
+
+    @property
+    def route(self) -> str:
+        if self.scope is None:
+            return BACKGROUND_ROUTE
+        return route_template(self.scope)
+
+    def record(self, statement: str, elapsed_ms: float) -> bool:
+        """
+        Add one execution. Returns True the first time `statement` crosses the
+        repeated-statement threshold in this request.
+        """
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.statements[statement] += 1
+        if self.statements[statement] > settings.repeated_statement_threshold and statement not in self.flagged:
+            self.flagged.add(statement)
+            return True
+        return False
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.total_ms:.1f};desc="{self.count} queries"'
+
+
+_current_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("request_query_stats", default=None)
+
+
+def current_query_stats() -> Optional[RequestQueryStats]:
+    return _current_stats.get()
+
+
+@contextmanager
+def track_queries(scope: Optional[dict] = None) -> Iterator[RequestQueryStats]:
+    """Attribute every statement executed inside the block to a fresh stats object"""
+    stats = RequestQueryStats(scope)
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def _redact_value(value: Any) -> Optional[str]:
+    return None if value is None else f"<{type(value).__name__}>"
+
+
+def redact_parameters(parameters: Any, executemany: bool = False) -> Any:
+    """Replace bound values with their type names so logs never carry user data"""
+    if executemany and isinstance(parameters, (list, tuple)):
+        return f"<{len(parameters)} parameter sets>"
+    if isinstance(parameters, dict):
+        return {key: _redact_value(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_redact_value(value) for value in parameters]
+    return _redact_value(parameters)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get("query_start_time")
+    if not start_times:
+        return
+    elapsed_ms = (time.perf_counter() - start_times.pop()) * 1000
+
+    stats = _current_stats.get()
+    route = stats.route if stats is not None else BACKGROUND_ROUTE
+
+    db_queries_total.inc(route=route)
+    db_query_seconds_total.inc(elapsed_ms / 1000, route=route)
+
+    if elapsed_ms >= settings.slow_query_ms:
+        db_slow_queries_total.inc(route=route)
+        slow_query_logger.warning({
+            "event": "slow-query",
+            "route": route,
+            "duration_ms": round(elapsed_ms, 2),
+            "statement": statement,
+            "parameters": redact_parameters(parameters, executemany),
+        })
+
+    if stats is not None and stats.record(statement, elapsed_ms):
+        db_repeated_statements_total.inc(route=route)
+        logger.warning({
+            "event": "repeated-statement",
+            "route": route,
+            "threshold": settings.repeated_statement_threshold,
+            "statement": statement,
+        })
+
+
+def _handle_error(exception_context):
+    # A failed execute never reaches after_cursor_execute; drop its start time
+    start_times = exception_context.connection.info.get("query_start_time") if exception_context.connection else None
+    if start_times:
+        start_times.pop()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Attach the cursor event hooks to `engine` (idempotent)"""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def register_pool_metrics(engine: Engine) -> None:
+    """Report `engine`'s pool usage on /metrics, read on scrape"""
+    pool = engine.pool
+
+    def update():
+        if not hasattr(pool, "checkedout"):
+            return  # NullPool / StaticPool keep no counts
+        db_pool_connections.set(pool.checkedout(), state="checked_out")
+        db_pool_connections.set(pool.checkedin(), state="idle")
+        db_pool_connections.set(max(pool.overflow(), 0), state="overflow")
+
+    registry.register_hook(update)
+
+
+class QueryStatsMiddleware:
+    """
+    Pure ASGI middleware that opens a stats scope per HTTP request and adds the
+    request's DB totals to the `Server-Timing` header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.sql_instrumentation:
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries(scope) as stats:
+            async def send_with_timing(message):
+                if message["type"] == "http.response.start":
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", stats.server_timing())
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
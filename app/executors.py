@@ -0,0 +1,200 @@
+"""
+Bounded executors for blocking work called from async handlers.
+
+boto3 calls block on network I/O and PIL work holds the GIL, so running either
+directly in an `async def` handler freezes every other request on the worker.
+Handlers hand that work to one of the executors below instead:
+
+    url = await s3_executor.run(s3_service.upload_avatar_variant, data, user_id, avatar_id, size, fmt)
+    variants = await image_executor.run(process_avatar_variants, contents, max_pixels)
+
+- `s3_executor`: a thread pool; boto3 releases the GIL while waiting on S3.
+- `image_executor`: a process pool, so image CPU work runs in parallel with
+  the event loop instead of competing with it for the GIL.
+- `pdf_executor` and `text_executor`: process pools for pdfium, which is not
+  thread-safe. The upload pipeline's worker threads use them via `call()`.
+
+Each executor accepts at most `max_workers + max_queue` tasks at once. Past
+that `run()` raises ExecutorSaturated right away (handlers answer 503) rather
+than letting an unbounded backlog build up; `call()`, for background threads,
+waits for a slot instead. In-flight tasks, queue wait, run time and
+rejections are exported on /metrics.
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import BrokenExecutor, Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from app.config import settings
+from app.metrics import registry
+from app.tracing import span
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_IN_FLIGHT = registry.gauge(
+    "aixiv_executor_in_flight", "Tasks submitted to an executor and not finished (queued or running)", ["executor"]
+)
+EXECUTOR_TASKS = registry.counter(
+    "aixiv_executor_tasks_total", "Executor tasks by outcome (ok, error, rejected)", ["executor", "outcome"]
+)
+EXECUTOR_WAIT_SECONDS = registry.counter(
+    "aixiv_executor_wait_seconds_total", "Time tasks spent queued before a worker picked them up", ["executor"]
+)
+EXECUTOR_RUN_SECONDS = registry.counter(
+    "aixiv_executor_run_seconds_total", "Time tasks spent running on a worker", ["executor"]
+)
+
+
+class ExecutorSaturated(Exception):
+    """Raised when an executor's queue is full"""
+
+
+def _timed_call(fn: Callable, *args, **kwargs):
+    # Runs on the worker; wall-clock time so it is comparable across processes
+    started = time.time()
+    result = fn(*args, **kwargs)
+    return result, started, time.time() - started
+
+
+class BoundedExecutor:
+    def __init__(self, name: str, max_workers: int, max_queue: int, processes: bool = False):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.processes = processes
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> Executor:
+        """The underlying pool, created on first use"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.processes:
+                        # spawn: forking a process that already runs threads
+                        # (boto3, the DB pool) can deadlock the child
+                        self._executor = ProcessPoolExecutor(
+                            max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                        )
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.max_workers, thread_name_prefix=f"{self.name}-executor"
+                        )
+        return self._executor
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) on the pool and await its result. Raises
+        ExecutorSaturated without waiting if the queue is full. With a process
+        pool, fn and its arguments must be picklable.
+        """
+        if not self._slots.acquire(blocking=False):
+            EXECUTOR_TASKS.inc(executor=self.name, outcome="rejected")
+            raise ExecutorSaturated(f"{self.name} executor is busy, try again shortly")
+
+        EXECUTOR_IN_FLIGHT.inc(executor=self.name)
+        submitted = time.time()
+        try:
+            loop = asyncio.get_running_loop()
+            call = functools.partial(_timed_call, fn, *args, **kwargs)
+            with span(f"executor.{self.name}", self.name):
+                if not self.processes:
+                    # Threads see the caller's context, so their S3 and SQL spans join its trace
+                    call = functools.partial(contextvars.copy_context().run, call)
+                result, started, run_seconds = await loop.run_in_executor(self.executor, call)
+        except Exception:
+            EXECUTOR_TASKS.inc(executor=self.name, outcome="error")
+            raise
+        finally:
+            EXECUTOR_IN_FLIGHT.dec(executor=self.name)
+            self._slots.release()
+
+        EXECUTOR_TASKS.inc(executor=self.name, outcome="ok")
+        EXECUTOR_WAIT_SECONDS.inc(max(started - submitted, 0), executor=self.name)
+        EXECUTOR_RUN_SECONDS.inc(run_seconds, executor=self.name)
+        return result
+
+    def call(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs):
+        """
+        Blocking counterpart of run() for background threads: waits for a
+        free slot instead of raising ExecutorSaturated. With a process pool,
+        a call that takes longer than `timeout` seconds (TimeoutError) or
+        kills its process (BrokenExecutor) recycles the pool, so a hung or
+        crashed task doesn't take the pool down with it. Other tasks running
+        on the pool at that moment fail with BrokenExecutor.
+        """
+        self._slots.acquire()
+        EXECUTOR_IN_FLIGHT.inc(executor=self.name)
+        submitted = time.time()
+        try:
+            call = functools.partial(_timed_call, fn, *args, **kwargs)
+            with span(f"executor.{self.name}", self.name):
+                if not self.processes:
+                    call = functools.partial(contextvars.copy_context().run, call)
+                executor = self.executor
+                future = executor.submit(call)
+                try:
+                    result, started, run_seconds = future.result(timeout=timeout)
+                except (TimeoutError, BrokenExecutor):
+                    if self.processes:
+                        self._recycle(executor)
+                    raise
+        except Exception:
+            EXECUTOR_TASKS.inc(executor=self.name, outcome="error")
+            raise
+        finally:
+            EXECUTOR_IN_FLIGHT.dec(executor=self.name)
+            self._slots.release()
+
+        EXECUTOR_TASKS.inc(executor=self.name, outcome="ok")
+        EXECUTOR_WAIT_SECONDS.inc(max(started - submitted, 0), executor=self.name)
+        EXECUTOR_RUN_SECONDS.inc(run_seconds, executor=self.name)
+        return result
+
+    def _recycle(self, executor: Executor) -> None:
+        """Kill the processes of `executor`; the next task starts a new pool"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+            else:
+                # Already replaced by another thread's timeout or crash
+                return
+        logger.warning(f"Recycling the {self.name} executor's processes")
+        # ProcessPoolExecutor has no public way to stop a running task
+        for process in list((getattr(executor, "_processes", None) or {}).values()):
+            process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+
+s3_executor = BoundedExecutor(
+    "s3", max_workers=settings.s3_executor_workers, max_queue=settings.s3_executor_queue
+)
+image_executor = BoundedExecutor(
+    "image", max_workers=settings.image_executor_workers, max_queue=settings.image_executor_queue, processes=True
+)
+# Page counts and thumbnails of uploaded PDFs, called from pipeline worker threads
+pdf_executor = BoundedExecutor(
+    "pdf", max_workers=settings.pipeline_pdf_processes, max_queue=0, processes=True
+)
+# PDF text extraction for the search index, called from pipeline worker threads
+text_executor = BoundedExecutor(
+    "text", max_workers=settings.search_index_processes, max_queue=0, processes=True
+)
+
+
+def shutdown_executors(wait: bool = True) -> None:
+    for executor in (s3_executor, image_executor, pdf_executor, text_executor):
+        executor.shutdown(wait=wait)
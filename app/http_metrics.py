@@ -0,0 +1,65 @@
+"""
+Per-request HTTP metrics.
+
+`HTTPMetricsMiddleware` counts requests by method, route template and status
+code, tracks how many requests are in flight and records latency histograms
+per route template. Labels use the template (/api/submissions/{submission_id})
+rather than the raw path, and unknown methods share one label, so the label
+set stays bounded whatever clients send. Everything is exported on /metrics.
+"""
+import time
+
+from app.config import settings
+from app.db_instrumentation import route_template
+from app.metrics import registry
+
+# Finer at the low end than DEFAULT_BUCKETS: most requests finish in milliseconds
+HTTP_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+HTTP_METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+
+http_requests_total = registry.counter(
+    "aixiv_http_requests_total", "HTTP requests by method, route template and status code",
+    ("method", "route", "status")
+)
+http_requests_in_flight = registry.gauge(
+    "aixiv_http_requests_in_flight", "HTTP requests currently being handled"
+)
+http_request_seconds = registry.histogram(
+    "aixiv_http_request_seconds", "HTTP request duration until the response is sent, by method and route template",
+    ("method", "route"), HTTP_BUCKETS
+)
+
+
+class HTTPMetricsMiddleware:
+    """
+    Pure ASGI middleware recording request counts, in-flight requests and
+    latency. A request whose handler raised is counted as a 500.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.http_metrics:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.dec()
+            method = scope["method"] if scope["method"] in HTTP_METHODS else "other"
+            route = route_template(scope)
+            http_requests_total.inc(method=method, route=route, status=status)
+            http_request_seconds.observe(elapsed, method=method, route=route)
@@ -0,0 +1,179 @@
+"""
+Logging setup, run once from the application lifespan rather than at import.
+
+Handlers that write to a terminal or a file block, and the request handlers
+log from the event loop. So the root logger only gets a `QueueHandler`,
+which puts records on a bounded queue. A `QueueListener` thread formats
+them and writes them to stderr and to LOG_DIR/app.log, rotating the file at
+LOG_MAX_BYTES. When the queue is full, records are dropped and counted
+rather than blocking the request.
+
+Records are written as one JSON object per line (LOG_FORMAT=json, the
+default) or as plain text. Handlers often log a dict
+(`logger.info({"event": "submit-review:request", ...})`). Its keys become
+fields of the JSON object. The current trace ID (app/tracing.py) is added
+to every record.
+
+High-volume request events are sampled before they reach the queue.
+LOG_SAMPLE_RATES maps an event name to the share of its records kept, for
+example `submit-review:request=0.1,get-review:request=0.1`. Kept records
+carry `sample_rate` so counts can be scaled back up. Warnings and errors
+are never sampled.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import time
+from typing import Dict, Optional
+
+from app.config import settings
+from app.metrics import registry
+from app.tracing import current_trace
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+log_records_total = registry.counter(
+    "aixiv_log_records_total", "Log records by outcome (queued, sampled_out, dropped)", ("outcome",)
+)
+
+# The attributes every LogRecord has; anything else was passed with extra=
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "trace_id"}
+
+
+def parse_sample_rates(value: str) -> Dict[str, float]:
+    """"event=rate,event=rate" -> {event: rate}; malformed entries are ignored"""
+    rates = {}
+    for entry in value.split(","):
+        event, _, rate = entry.strip().rpartition("=")
+        try:
+            rates[event.strip()] = min(max(float(rate), 0.0), 1.0)
+        except ValueError:
+            continue
+    rates.pop("", None)
+    return rates
+
+
+class EventSampler(logging.Filter):
+    """Keep a share of the INFO and DEBUG records of each configured event"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not isinstance(record.msg, dict):
+            return True
+        rate = self.rates.get(record.msg.get("event"))
+        if rate is None:
+            return True
+        if random.random() >= rate:
+            log_records_total.inc(outcome="sampled_out")
+            return False
+        record.sample_rate = rate
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never blocks: a record that does not fit is dropped.
+    Records are prepared on the calling thread. Dict messages are kept as
+    dicts and the trace ID is attached, because the listener thread has
+    neither the arguments nor the request's context.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(record.__dict__)
+        if not isinstance(record.msg, dict):
+            record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        trace = current_trace()
+        record.trace_id = trace.trace_id if trace is not None else None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_records_total.inc(outcome="dropped")
+            return
+        log_records_total.inc(outcome="queued")
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message or dict fields, trace ID"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+        }
+        if isinstance(record.msg, dict):
+            entry.update(record.msg)
+        else:
+            entry["message"] = record.getMessage()
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if getattr(record, "trace_id", None):
+            entry["trace_id"] = record.trace_id
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[DroppingQueueHandler] = None
+
+
+def setup_logging(directory: Optional[str] = None, stream: bool = True) -> logging.handlers.QueueListener:
+    """
+    Route the root logger through a queue to stderr and a rotating
+    `directory`/app.log (LOG_DIR by default). Calling it again replaces the
+    previous setup.
+    """
+    global _listener, _queue_handler
+    stop_logging()
+    directory = directory or settings.log_dir
+    os.makedirs(directory, exist_ok=True)
+
+    formatter = JSONFormatter() if settings.log_format == "json" else logging.Formatter(LOG_FORMAT)
+    handlers = [logging.handlers.RotatingFileHandler(
+        os.path.join(directory, "app.log"), maxBytes=settings.log_max_bytes,
+        backupCount=settings.log_backup_count, encoding="utf-8",
+    )]
+    if stream:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    _queue_handler = DroppingQueueHandler(queue.Queue(settings.log_queue_size))
+    _queue_handler.addFilter(EventSampler(parse_sample_rates(settings.log_sample_rates)))
+    root = logging.getLogger()
+    root.setLevel(settings.log_level.upper())
+    root.addHandler(_queue_handler)
+
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_logging() -> None:
+    """Detach the queue handler, write what is queued and close the files"""
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
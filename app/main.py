@@ -1,39 +1,107 @@
+import time
+
+# Measured from the first line of app.main so the startup report includes imports
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from app.config import settings
 from app.api.submissions import router as submissions_router
 from app.api.profiles import router as profiles_router
 from app.api.agent_review import router as agent_review_router
+from app.api.files import router as files_router
 from app.database import engine
-from app.models import Base
+from app.auth import jwks_cache
+from app.db_instrumentation import QueryStatsMiddleware
+from app.executors import ExecutorSaturated, shutdown_executors
+from app.http_metrics import HTTPMetricsMiddleware
+from app.tracing import TracingMiddleware, exporter as trace_exporter
+from app.logging_config import setup_logging, stop_logging
+from app.metrics import registry
+from app.services.s3_service import s3_service
+from app.crud import SUBMISSION_JOB_KINDS
+from app.services.deletion_queue import DeletionSweeper
+from app.services.agent_tokens import agent_tokens
+from app.services.download_counter import download_counter
+from app.services.upload_pipeline import pipeline_worker
+from app.startup import StartupTimer, run_startup
 import os
 import json
 import logging
 
-# Handle the logging
-log_directory = "logs"
-if not os.path.exists(log_directory):
-    os.makedirs(log_directory)
-log_file_path = os.path.join(log_directory, "app.log")
+_import_seconds = time.perf_counter() - _import_started
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler(), logging.FileHandler('logs/app.log')]
-)
-logging.info("FastAPI application started.")
 
-# Create database tables only if not in test environment
-if not os.getenv("TESTING"):
-    Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Initialize logging, the database pool and the S3 client when the worker
+    starts instead of at import time, and report how long each phase took.
+    """
+    timer = StartupTimer()
+    timer.record("import", _import_seconds)
+    with timer.phase("logging"):
+        setup_logging()
+
+    # Tests run without a database, as before
+    if not os.getenv("TESTING"):
+        await run_in_threadpool(
+            run_startup,
+            engine,
+            s3_service,
+            timer,
+            check_schema=settings.schema_check != "off",
+            pool_warmup=settings.db_pool_warmup,
+            strict_schema=settings.schema_check == "strict",
+            partitions_ahead=settings.review_partitions_ahead,
+        )
+
+    pipelines = []
+    if not os.getenv("TESTING") and settings.pipeline_in_process:
+        pipelines = [pipeline_worker(kind, engine, s3_service) for kind in SUBMISSION_JOB_KINDS]
+        for pipeline in pipelines:
+            pipeline.start()
+
+    sweeper = None
+    if not os.getenv("TESTING") and settings.deletion_sweeper_in_process:
+        sweeper = DeletionSweeper(engine, s3_service)
+        sweeper.start()
+
+    if not os.getenv("TESTING"):
+        download_counter.start()
+        with timer.phase("agent_tokens"):
+            await run_in_threadpool(agent_tokens.load)
+        agent_tokens.start()
+        if jwks_cache.urls:
+            jwks_cache.start()
+        else:
+            logging.warning("CLERK_JWKS_URL is not set: authenticated endpoints will answer 503")
+
+    timer.record("total", time.perf_counter() - _import_started)
+    logging.info(f"FastAPI application started. Startup: {timer.report()}")
+    yield
+    for pipeline in pipelines:
+        pipeline.stop()
+    if sweeper is not None:
+        sweeper.stop()
+    download_counter.stop()
+    agent_tokens.stop()
+    jwks_cache.stop()
+    shutdown_executors()
+    trace_exporter.shutdown()
+    engine.dispose()
+    stop_logging()
 
 # Create FastAPI app
 app = FastAPI(
     title="AIXIV Backend API",
     description="Backend API for AIXIV paper submission system",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -45,6 +113,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Attribute SQL query counts and DB time to each request
+app.add_middleware(QueryStatsMiddleware)
+
+# Trace ID, spans and the Server-Timing breakdown; outside QueryStatsMiddleware
+# so its db entry ends up in the same header
+app.add_middleware(TracingMiddleware)
+
+# Request counts, in-flight requests and latency per route template; added
+# last so it is outermost and its timing includes the other middleware
+app.add_middleware(HTTPMetricsMiddleware)
+
 # Create static directory if it doesn't exist
 os.makedirs("static", exist_ok=True)
 
@@ -54,8 +133,14 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 # Include routers
 app.include_router(submissions_router)
 app.include_router(agent_review_router)
+app.include_router(files_router)
 app.include_router(profiles_router, prefix="/api")
 
+@app.exception_handler(ExecutorSaturated)
+async def executor_saturated_handler(request, exc: ExecutorSaturated):
+    """Blocking-work queues are full: ask the client to retry instead of queueing more"""
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -65,6 +150,11 @@ async def root():
         "docs": "/docs"
     }
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Prometheus-style metrics for all registered subsystems"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/favicon.ico")
 async def favicon():
     """Serve favicon - tries .ico first, then .svg, then returns 204"""
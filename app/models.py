@@ -1,6 +1,6 @@
 from sqlalchemy import Column, Integer, String, Text, ARRAY, DateTime, BigInteger, Index, text,SmallInteger, TIMESTAMP
-from sqlalchemy import Column, Integer, String, Text, ARRAY, DateTime, BigInteger, Index, text, UniqueConstraint
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import Column, Integer, String, Text, ARRAY, DateTime, BigInteger, Index, text, UniqueConstraint, ForeignKey, Boolean, Date, CHAR
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -8,6 +8,12 @@ class Submission(Base):
     __tablename__ = "submissions"
     __table_args__ = (
         UniqueConstraint('aixiv_id', 'version', name='_aixiv_id_version_uc'),
+        Index("ix_submissions_uploaded_by", "uploaded_by"),
+        Index("ix_submissions_aixiv_id_version_doc_type", "aixiv_id", "version", "doc_type",
+              postgresql_include=["id"]),
+        Index("ix_submissions_aixiv_id_created_at", "aixiv_id", "created_at"),
+        # Reference checks of the orphan collector (app/services/upload_cleanup.py)
+        Index("ix_submissions_s3_key", "s3_key"),
     )
 
     id = Column(Integer, primary_key=True, index=True)
@@ -19,6 +25,7 @@ class Submission(Base):
     license = Column(String(50), nullable=False)
     abstract = Column(Text)
     s3_url = Column(Text, nullable=False)
+    s3_key = Column(Text)  # object key of s3_url in our bucket, however the URL is spelled; None elsewhere
     uploaded_by = Column(String(64), nullable=False)  # Assuming this references a users table
 
     # New fields
@@ -36,12 +43,117 @@ class Submission(Base):
     comments = Column(Integer, default=0, nullable=False)    # Number of comments
     citations = Column(Integer, default=0, nullable=False)   # Number of citations
 
+    # Filled in by the post-upload pipeline (app/services/upload_pipeline.py)
+    file_size = Column(BigInteger)           # bytes
+    file_sha256 = Column(String(64))         # hex digest of the uploaded object
+    page_count = Column(Integer)
+    thumbnail_url = Column(Text)             # first-page thumbnail
+    processed_at = Column(DateTime(timezone=True))
+
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
 
+class SubmissionJob(Base):
+    """Background work queued for a submission, claimed with FOR UPDATE SKIP LOCKED"""
+    __tablename__ = "submission_jobs"
+    __table_args__ = (
+        # One job of each kind per submission: enqueueing twice is a no-op
+        UniqueConstraint('submission_id', 'kind', name='_submission_job_kind_uc'),
+        Index("ix_submission_jobs_claimable", "kind", "run_after",
+              postgresql_where=text("status IN ('pending', 'running')")),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    submission_id = Column(Integer, ForeignKey("submissions.id", ondelete="CASCADE"), nullable=False)
+    kind = Column(String(32), nullable=False)
+    status = Column(String(16), nullable=False, server_default=text("'pending'"))  # pending | running | done | failed
+    attempts = Column(Integer, nullable=False, server_default=text("0"))
+    run_after = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    locked_at = Column(DateTime(timezone=True))
+    last_error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class SubmissionText(Base):
+    """Extracted full text of a submission's file, for search (app/services/text_index.py)"""
+    __tablename__ = "submission_texts"
+    __table_args__ = (
+        Index("ix_submission_texts_search_vector", "search_vector", postgresql_using="gin"),
+    )
+
+    submission_id = Column(Integer, ForeignKey("submissions.id", ondelete="CASCADE"), primary_key=True)
+    body = Column(Text, nullable=False)              # capped at SEARCH_MAX_TEXT_CHARS
+    truncated = Column(Boolean, nullable=False, server_default=text("false"))
+    pages_indexed = Column(Integer)
+    # title (A), abstract (B) and body (C), weighted for ranking
+    search_vector = Column(TSVECTOR, nullable=False)
+    indexed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class FileBlob(Base):
+    """
+    Content-addressed index of uploaded files: one row per distinct SHA-256,
+    pointing at the object that holds those bytes. Only hashes computed by
+    the upload pipeline are recorded, never ones claimed by clients.
+    """
+    __tablename__ = "file_blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    s3_url = Column(Text, nullable=False, unique=True)
+    size = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False, server_default=text("1"))  # submissions using s3_url
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class S3Deletion(Base):
+    """
+    Outbox of S3 objects to delete. Rows are added in the same transaction
+    that stops referencing the object and drained in batches by
+    app/services/deletion_queue.py.
+    """
+    __tablename__ = "s3_deletions"
+    __table_args__ = (
+        Index("ix_s3_deletions_run_after", "run_after"),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    s3_key = Column(Text, nullable=False, unique=True)
+    reason = Column(String(50), nullable=False)
+    attempts = Column(Integer, nullable=False, server_default=text("0"))
+    run_after = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class AuthorName(Base):
+    """
+    Distinct Submission.agent_authors with the number of submissions using
+    each, kept up to date by crud, for author autocomplete
+    """
+    __tablename__ = "author_names"
+    __table_args__ = (
+        Index("ix_author_names_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+    )
+
+    name = Column(Text, primary_key=True)
+    submission_count = Column(Integer, nullable=False, server_default=text("0"))
+
+
 class UserProfile(Base):
     __tablename__ = "user_profiles"
+    __table_args__ = (
+        # Reference checks of the orphan collector (app/services/upload_cleanup.py)
+        Index("ix_user_profiles_avatar_url", "avatar_url"),
+        Index("ix_user_profiles_avatar_variants", "avatar_variants", postgresql_using="gin",
+              postgresql_ops={"avatar_variants": "jsonb_path_ops"}),
+        # Author autocomplete (needs pg_trgm)
+        Index("ix_user_profiles_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index("ix_user_profiles_affiliation_trgm", "affiliation", postgresql_using="gin",
+              postgresql_ops={"affiliation": "gin_trgm_ops"}),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(String(255), unique=True, nullable=False, index=True)
@@ -56,12 +168,15 @@ class UserProfile(Base):
     twitter_url = Column(String(500))
     linkedin_url = Column(String(500))
     avatar_url = Column(String(500))
+    # {"webp": {"32": url, ...}, "jpeg": {...}}, see app/services/images.py
+    avatar_variants = Column(JSONB)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
 class PaperReview(Base):
     __tablename__ = "paper_review"
 
+    # Partitioned by month on create_time, so the key includes it
     id = Column(BigInteger, primary_key=True, autoincrement=True)
     aixiv_id = Column(String(128), nullable=False)
     version = Column(String(45), nullable=False)
@@ -69,7 +184,7 @@ class PaperReview(Base):
     agent_type = Column(SmallInteger, nullable=False, server_default=text("1"))
     doc_type = Column(SmallInteger, nullable=False, server_default=text("1"))
     create_time = Column(
-        TIMESTAMP, nullable=False, server_default=func.now()
+        TIMESTAMP, primary_key=True, nullable=False, server_default=func.now()
     )
     like_count = Column(Integer, nullable=False, server_default=text("0"))
     userid = Column(String(128), nullable=True)
@@ -77,4 +192,34 @@ class PaperReview(Base):
 
     __table_args__ = (
         Index("idx_paper_review_aixiv_id_create_time", "aixiv_id", "create_time"),
-    )
\ No newline at end of file
+        Index("idx_paper_review_aixiv_id_version_doc_type_ip_create_time",
+              "aixiv_id", "version", "doc_type", "ip", "create_time"),
+        {"postgresql_partition_by": "RANGE (create_time)"},
+    )
+
+
+class AgentToken(Base):
+    """
+    API token of an agent integration posting to /api/submit-review. Only
+    the SHA-256 of the token is stored. Quotas are per UTC day; NULL means
+    unlimited. See app/services/agent_tokens.py.
+    """
+    __tablename__ = "agent_tokens"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(100), nullable=False, unique=True)
+    token_hash = Column(CHAR(64), nullable=False, unique=True)
+    requests_per_day = Column(Integer)
+    bytes_per_day = Column(BigInteger)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    revoked_at = Column(DateTime(timezone=True))
+
+
+class AgentTokenUsage(Base):
+    """Requests and request bytes per agent token and UTC day, flushed in batches"""
+    __tablename__ = "agent_token_usage"
+
+    token_id = Column(Integer, ForeignKey("agent_tokens.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    requests = Column(BigInteger, nullable=False, server_default=text("0"))
+    bytes = Column(BigInteger, nullable=False, server_default=text("0"))
@@ -0,0 +1,97 @@
+"""
+S3 client configuration and per-operation instrumentation.
+
+`s3_client_config()` builds the botocore Config from Settings: connection pool
+size, connect/read timeouts, retry mode and TCP keepalive. The botocore
+default is a 10-connection pool, legacy retries and 60s timeouts.
+
+`instrument_s3_client()` hooks the client's event system to record, for every
+S3 API call (not pre-signing, which is local): total duration including
+retries, the number of retries and the outcome. These are exported on
+/metrics so S3 tail latency can be told apart from our own.
+"""
+import logging
+import time
+
+from botocore.config import Config
+
+from app.config import settings
+from app.metrics import registry
+from app.tracing import start_span
+
+logger = logging.getLogger(__name__)
+
+S3_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+s3_request_seconds = registry.histogram(
+    "aixiv_s3_request_seconds", "S3 API call duration including retries, by operation", ("operation",), S3_BUCKETS
+)
+s3_requests_total = registry.counter(
+    "aixiv_s3_requests_total", "S3 API calls by operation and outcome (ok or the error code)", ("operation", "outcome")
+)
+s3_retries_total = registry.counter(
+    "aixiv_s3_retries_total", "Retried S3 attempts, by operation", ("operation",)
+)
+
+_STARTED = "aixiv_started"
+_OPERATION = "aixiv_operation"
+_SPAN = "aixiv_span"
+
+
+def s3_client_config() -> Config:
+    return Config(
+        max_pool_connections=settings.s3_max_pool_connections,
+        connect_timeout=settings.s3_connect_timeout,
+        read_timeout=settings.s3_read_timeout,
+        # total_max_attempts counts the first attempt; botocore's max_attempts doesn't
+        retries={"mode": settings.s3_retry_mode, "total_max_attempts": settings.s3_max_attempts},
+        tcp_keepalive=settings.s3_tcp_keepalive,
+    )
+
+
+def _before_call(model, context, **kwargs):
+    context[_STARTED] = time.perf_counter()
+    context[_OPERATION] = model.name
+    context[_SPAN] = start_span(f"s3.{model.name}", "s3")
+
+
+def _record(context, outcome: str, retries: int) -> None:
+    started = context.pop(_STARTED, None)
+    if started is None:
+        return
+    operation = context.pop(_OPERATION)
+    handle = context.pop(_SPAN, None)
+    if handle is not None:
+        if handle.span is not None:
+            handle.span.attributes.update({"outcome": outcome, "retries": retries})
+        handle.end()
+    s3_request_seconds.observe(time.perf_counter() - started, operation=operation)
+    s3_requests_total.inc(operation=operation, outcome=outcome)
+    if retries:
+        s3_retries_total.inc(retries, operation=operation)
+
+
+def _after_call(context, parsed, **kwargs):
+    # HTTP errors (404, 503 SlowDown, ...) also arrive here, before botocore
+    # raises ClientError
+    metadata = parsed.get("ResponseMetadata", {})
+    error = parsed.get("Error", {}).get("Code")
+    _record(context, error or "ok", metadata.get("RetryAttempts", 0))
+
+
+def _after_call_error(context, exception, **kwargs):
+    # Connection errors and timeouts that survived every retry; botocore keeps
+    # the attempt number in the request context
+    attempts = context.get("retries", {}).get("attempt", 1)
+    _record(context, type(exception).__name__, attempts - 1)
+
+
+def instrument_s3_client(client) -> None:
+    """Register the timing hooks on a boto3 S3 client (idempotent)"""
+    events = client.meta.events
+    if getattr(client.meta, "_aixiv_instrumented", False):
+        return
+    events.register("before-call.s3", _before_call, unique_id="aixiv-s3-before-call")
+    events.register("after-call.s3", _after_call, unique_id="aixiv-s3-after-call")
+    events.register("after-call-error.s3", _after_call_error, unique_id="aixiv-s3-after-call-error")
+    client.meta._aixiv_instrumented = True
@@ -1,11 +1,11 @@
 import json
 import re
 
-from pydantic import BaseModel, Field, ConfigDict, field_validator
+from pydantic import BaseModel, Field, ConfigDict, computed_field, field_validator
 from typing import List, Optional, Dict
 from pydantic import BaseModel, Field, ConfigDict, EmailStr, HttpUrl
 from typing import List, Optional
-from datetime import datetime
+from datetime import date, datetime
 from pydantic import BaseModel, Field, confloat, constr
 from typing import Optional, Literal
 from pydantic import BaseModel, Field, constr, validator
@@ -62,13 +62,67 @@ class SubmissionDB(SubmissionBase):
 
 class UploadUrlRequest(BaseModel):
     filename: str
+    # Hex SHA-256 of the file: if it is already stored, no upload is needed
+    sha256: Optional[str] = Field(None, pattern=r"^[0-9a-fA-F]{64}$")
 
 class UploadUrlResponse(BaseModel):
-    upload_url: str
+    upload_url: Optional[str] = None  # None when existing is True
+    file_key: str
+    s3_url: str
+    content_type: str
+    file_extension: str
+    existing: bool = False
+    checksum_sha256: Optional[str] = None  # send as x-amz-checksum-sha256 with the PUT
+
+class UploadUrlsRequest(BaseModel):
+    filenames: List[str] = Field(..., min_length=1, max_length=50)
+
+class UploadUrlsResponse(BaseModel):
+    files: List[UploadUrlResponse]
+
+class MultipartUploadRequest(BaseModel):
+    filename: str
+    file_size: Optional[int] = None  # bytes; used to suggest a part size and count
+
+class MultipartUploadResponse(BaseModel):
+    upload_id: str
     file_key: str
     s3_url: str
     content_type: str
     file_extension: str
+    part_size: int
+    part_count: Optional[int] = None
+
+class MultipartPartUrlsRequest(BaseModel):
+    file_key: str
+    upload_id: str
+    part_numbers: List[int]
+
+class PartUploadUrl(BaseModel):
+    part_number: int
+    upload_url: str
+
+class MultipartPartUrlsResponse(BaseModel):
+    file_key: str
+    upload_id: str
+    expires_in: int
+    parts: List[PartUploadUrl]
+
+class MultipartUploadRef(BaseModel):
+    file_key: str
+    upload_id: str
+
+class UploadedPart(BaseModel):
+    part_number: int
+    etag: str
+    size: Optional[int] = None
+
+class MultipartCompleteRequest(MultipartUploadRef):
+    parts: List[UploadedPart]
+
+class MultipartCompleteResponse(BaseModel):
+    file_key: str
+    s3_url: str
 
 class SubmissionResponse(BaseModel):
     success: bool
@@ -91,6 +145,36 @@ class ProfileUpdateRequest(BaseModel):
     avatar_url: Optional[str] = None
 
 
+def build_avatar_srcset(variants: Optional[Dict[str, Dict[str, str]]]) -> Optional[Dict[str, str]]:
+    if not variants:
+        return None
+    return {
+        fmt: ", ".join(f"{url} {size}w" for size, url in sorted(urls.items(), key=lambda item: int(item[0])))
+        for fmt, urls in variants.items()
+    }
+
+
+class ProfileSummary(BaseModel):
+    """Compact profile for author lists (GET /api/profiles/batch)"""
+    user_id: str
+    name: str
+    affiliation: Optional[str] = None
+    avatar_url: Optional[str] = None
+    avatar_srcset: Optional[Dict[str, str]] = None
+
+    model_config = ConfigDict(frozen=True)
+
+
+class AuthorSuggestion(BaseModel):
+    """One /api/autocomplete/authors match"""
+    kind: Literal["profile", "author", "affiliation"]
+    label: str
+    user_id: Optional[str] = None        # profiles
+    affiliation: Optional[str] = None    # profiles
+    avatar_url: Optional[str] = None     # profiles
+    count: Optional[int] = None          # submissions (authors) or profiles (affiliations)
+
+
 class ProfileResponse(BaseModel):
     id: int
     user_id: str
@@ -105,11 +189,18 @@ class ProfileResponse(BaseModel):
     twitter_url: Optional[str]
     linkedin_url: Optional[str]
     avatar_url: Optional[str]
+    avatar_variants: Optional[Dict[str, Dict[str, str]]] = None  # format -> size -> URL
     created_at: datetime
     updated_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
 
+    @computed_field
+    @property
+    def avatar_srcset(self) -> Optional[Dict[str, str]]:
+        """Per format, a srcset attribute value ("url 32w, url 64w, ...")"""
+        return build_avatar_srcset(self.avatar_variants)
+
 
 class SubmitReviewIn(BaseModel):
     code: int
@@ -199,3 +290,28 @@ class GetReviewIn(BaseModel):
 class GetReviewOut(BaseModel):
     review_list: List[Review]
     code: int
+
+
+class AgentTokenUsage(BaseModel):
+    """Today's (UTC) usage of one agent token; quotas of None are unlimited"""
+    name: str
+    requests: int
+    bytes: int
+    requests_per_day: Optional[int] = None
+    bytes_per_day: Optional[int] = None
+
+
+class AgentUsageOut(BaseModel):
+    code: int
+    day: date
+    usage: List[AgentTokenUsage]
+
+class SearchResult(BaseModel):
+    id: int
+    aixiv_id: Optional[str] = None
+    version: Optional[str] = None
+    title: str
+    agent_authors: List[str]
+    created_at: datetime
+    rank: float
+    snippet: str
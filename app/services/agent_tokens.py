@@ -0,0 +1,311 @@
+"""
+API tokens and daily quotas for agent integrations posting reviews.
+
+/api/submit-review used to accept one shared AUTH_TOKEN. Each integration
+now has its own token. The table holds only the token's SHA-256, its daily
+request and byte quotas (NULL: unlimited) and when it was revoked.
+
+Checking a token must not cost a query, and counting its use must not cost
+a write per request, so `AgentTokenRegistry`:
+
+- keeps the active tokens in memory by hash and reloads them, together with
+  the usage already stored for today, every AGENT_TOKEN_REFRESH_SECONDS.
+  New and revoked tokens take effect after at most that long. They are
+  first loaded when the worker starts (app/main.py); if the database is
+  down then, token requests get 503 until the background thread's retry,
+  every AGENT_USAGE_FLUSH_SECONDS, succeeds. Requests never query;
+- counts requests and bytes per token in memory and adds them to
+  agent_token_usage with one INSERT ... ON CONFLICT every
+  AGENT_USAGE_FLUSH_SECONDS. Counts that fail to flush are kept for the
+  next attempt.
+
+Each worker process counts its own requests and sees other workers' usage
+as of its last refresh, so a token can overshoot its quota by what the other
+workers accepted in between. Days are UTC.
+
+Tokens are managed with the CLI:
+
+    python -m app.services.agent_tokens create --name acme-reviewer --requests-per-day 5000
+    python -m app.services.agent_tokens list
+    python -m app.services.agent_tokens revoke --name acme-reviewer
+"""
+import argparse
+import hashlib
+import logging
+import secrets
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+from app.database import engine
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+agent_requests_total = registry.counter(
+    "aixiv_agent_requests_total", "Review submissions with an agent token by token and outcome (ok, over_quota)",
+    ("token", "outcome")
+)
+agent_request_bytes_total = registry.counter(
+    "aixiv_agent_request_bytes_total", "Request bytes accepted per agent token", ("token",)
+)
+agent_usage_flushes_total = registry.counter(
+    "aixiv_agent_usage_flushes_total", "Agent token usage flushes by outcome (ok, error)", ("outcome",)
+)
+
+
+class AgentTokensUnavailable(Exception):
+    """The token table could not be loaded"""
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, token: "AgentTokenInfo", resource: str, retry_after: int):
+        super().__init__(f"Agent token {token.name!r} exceeded its daily {resource} quota")
+        self.token = token
+        self.resource = resource  # requests | bytes
+        self.retry_after = retry_after  # seconds until the quota resets
+
+
+class AgentTokenInfo(NamedTuple):
+    id: int
+    name: str
+    requests_per_day: Optional[int]
+    bytes_per_day: Optional[int]
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class AgentTokenRegistry:
+    """Active agent tokens by hash, with per-day usage counted in memory"""
+
+    def __init__(self, engine: Engine, refresh_seconds: Optional[float] = None, flush_seconds: Optional[float] = None):
+        self.engine = engine
+        self.refresh_seconds = refresh_seconds or settings.agent_token_refresh_seconds
+        self.flush_seconds = flush_seconds or settings.agent_usage_flush_seconds
+        self._tokens: Dict[str, AgentTokenInfo] = {}
+        self._day: Optional[date] = None
+        self._stored: Dict[int, List[int]] = {}  # token id -> [requests, bytes] in the database for self._day
+        self._pending: Dict[Tuple[int, date], List[int]] = {}  # counted here, not flushed yet
+        self._loaded = False
+        self._last_refresh = float("-inf")
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def refresh(self, now: Optional[datetime] = None) -> int:
+        """Reload the active tokens and today's stored usage; returns the number of tokens"""
+        day = (now or _utc_now()).date()
+        try:
+            with self.engine.connect() as connection:
+                rows = connection.execute(text("""
+                    SELECT id, name, token_hash, requests_per_day, bytes_per_day
+                    FROM agent_tokens WHERE revoked_at IS NULL
+                """)).all()
+                usage = connection.execute(text(
+                    "SELECT token_id, requests, bytes FROM agent_token_usage WHERE day = :day"
+                ), {"day": day}).all()
+        except Exception as e:
+            raise AgentTokensUnavailable(str(e)) from e
+        tokens = {row.token_hash: AgentTokenInfo(row.id, row.name, row.requests_per_day, row.bytes_per_day)
+                  for row in rows}
+        with self._lock:
+            self._tokens = tokens
+            self._day = day
+            self._stored = {row.token_id: [row.requests, row.bytes] for row in usage}
+            self._loaded = True
+        self._last_refresh = time.monotonic()
+        return len(tokens)
+
+    def load(self) -> bool:
+        """Initial refresh() at startup; on failure the background thread keeps retrying"""
+        try:
+            count = self.refresh()
+        except AgentTokensUnavailable as e:
+            logger.error(f"Failed to load agent tokens, retrying in the background: {e}")
+            return False
+        logger.info(f"Loaded {count} agent token(s)")
+        return True
+
+    def authenticate(self, token: str) -> Optional[AgentTokenInfo]:
+        """
+        The active token matching `token`, or None. Memory only: raises
+        AgentTokensUnavailable until the tokens have been loaded once.
+        """
+        if not self._loaded:
+            raise AgentTokensUnavailable("agent tokens are not loaded yet")
+        return self._tokens.get(hash_token(token))
+
+    def _used(self, token_id: int, day: date) -> Tuple[int, int]:
+        """Requests and bytes counted for `day` (called with the lock held)"""
+        stored = self._stored.get(token_id, (0, 0)) if day == self._day else (0, 0)
+        pending = self._pending.get((token_id, day), (0, 0))
+        return stored[0] + pending[0], stored[1] + pending[1]
+
+    def consume(self, token: AgentTokenInfo, nbytes: int, now: Optional[datetime] = None) -> None:
+        """Count one request of `nbytes`, or raise QuotaExceeded without counting it"""
+        now = now or _utc_now()
+        day = now.date()
+        with self._lock:
+            if self._day is None or day > self._day:
+                # First request after midnight: nothing is stored for the new day yet
+                self._day, self._stored = day, {}
+            requests, nbytes_used = self._used(token.id, day)
+            resource = None
+            if token.requests_per_day is not None and requests + 1 > token.requests_per_day:
+                resource = "requests"
+            elif token.bytes_per_day is not None and nbytes_used + nbytes > token.bytes_per_day:
+                resource = "bytes"
+            if resource is None:
+                pending = self._pending.setdefault((token.id, day), [0, 0])
+                pending[0] += 1
+                pending[1] += nbytes
+        if resource is not None:
+            agent_requests_total.inc(token=token.name, outcome="over_quota")
+            midnight = datetime.combine(day + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+            raise QuotaExceeded(token, resource, max(int((midnight - now).total_seconds()), 1))
+        agent_requests_total.inc(token=token.name, outcome="ok")
+        agent_request_bytes_total.inc(nbytes, token=token.name)
+
+    def usage(self, token_id: Optional[int] = None, now: Optional[datetime] = None) -> List[dict]:
+        """Today's usage of every active token, or of one"""
+        day = (now or _utc_now()).date()
+        with self._lock:
+            tokens = [t for t in self._tokens.values() if token_id is None or t.id == token_id]
+            result = []
+            for token in sorted(tokens, key=lambda t: t.name):
+                requests, nbytes = self._used(token.id, day)
+                result.append({"name": token.name, "requests": requests, "bytes": nbytes,
+                               "requests_per_day": token.requests_per_day, "bytes_per_day": token.bytes_per_day})
+        return result
+
+    def flush(self) -> int:
+        """Add the counted usage to agent_token_usage; returns the number of rows written"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        keys = list(pending)
+        try:
+            with self.engine.begin() as connection:
+                connection.execute(text("""
+                    INSERT INTO agent_token_usage (token_id, day, requests, bytes)
+                    SELECT * FROM unnest(CAST(:ids AS integer[]), CAST(:days AS date[]),
+                                         CAST(:requests AS bigint[]), CAST(:bytes AS bigint[]))
+                    ON CONFLICT (token_id, day) DO UPDATE
+                    SET requests = agent_token_usage.requests + EXCLUDED.requests,
+                        bytes = agent_token_usage.bytes + EXCLUDED.bytes
+                """), {"ids": [k[0] for k in keys], "days": [k[1] for k in keys],
+                       "requests": [pending[k][0] for k in keys], "bytes": [pending[k][1] for k in keys]})
+        except Exception:
+            with self._lock:
+                for key, (requests, nbytes) in pending.items():
+                    counts = self._pending.setdefault(key, [0, 0])
+                    counts[0] += requests
+                    counts[1] += nbytes
+            agent_usage_flushes_total.inc(outcome="error")
+            raise
+        with self._lock:
+            for (token_id, day), (requests, nbytes) in pending.items():
+                if day == self._day:
+                    stored = self._stored.setdefault(token_id, [0, 0])
+                    stored[0] += requests
+                    stored[1] += nbytes
+        agent_usage_flushes_total.inc(outcome="ok")
+        return len(keys)
+
+    def run(self) -> None:
+        while not self._stop.wait(self.flush_seconds):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush agent token usage: {e}")
+            if time.monotonic() - self._last_refresh >= self.refresh_seconds:
+                try:
+                    self.refresh()
+                except AgentTokensUnavailable as e:
+                    logger.error(f"Failed to refresh agent tokens, keeping the loaded ones: {e}")
+
+    def start(self) -> threading.Thread:
+        """Flush and refresh on a daemon thread until stop() is called"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="agent-tokens", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout: float = 10) -> None:
+        """Stop the thread and write what is left"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush agent token usage on shutdown: {e}")
+
+
+agent_tokens = AgentTokenRegistry(engine)
+
+
+def create_token(engine: Engine, name: str, requests_per_day: Optional[int] = None,
+                 bytes_per_day: Optional[int] = None, token: Optional[str] = None) -> str:
+    """Store a new token (generated unless given) and return it; only its hash is kept"""
+    token = token or secrets.token_urlsafe(32)
+    with engine.begin() as connection:
+        connection.execute(text("""
+            INSERT INTO agent_tokens (name, token_hash, requests_per_day, bytes_per_day)
+            VALUES (:name, :hash, :requests, :bytes)
+        """), {"name": name, "hash": hash_token(token), "requests": requests_per_day, "bytes": bytes_per_day})
+    return token
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage agent API tokens")
+    commands = parser.add_subparsers(dest="command", required=True)
+    create = commands.add_parser("create", help="create a token and print it (it is not stored in clear)")
+    create.add_argument("--name", required=True, help="integration name, shown in usage and metrics")
+    create.add_argument("--requests-per-day", type=int, help="default: unlimited")
+    create.add_argument("--bytes-per-day", type=int, help="default: unlimited")
+    create.add_argument("--token", help="register an existing secret (e.g. the old AUTH_TOKEN) instead of generating one")
+    revoke = commands.add_parser("revoke", help="revoke a token")
+    revoke.add_argument("--name", required=True)
+    commands.add_parser("list", help="tokens with today's stored usage")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if args.command == "create":
+        print(create_token(engine, args.name, args.requests_per_day, args.bytes_per_day, args.token))
+    elif args.command == "revoke":
+        with engine.begin() as connection:
+            revoked = connection.execute(text(
+                "UPDATE agent_tokens SET revoked_at = now() WHERE name = :name AND revoked_at IS NULL"
+            ), {"name": args.name}).rowcount
+        logger.info(f"Revoked {revoked} token(s) named {args.name!r}")
+    else:
+        with engine.connect() as connection:
+            rows = connection.execute(text("""
+                SELECT t.name, t.requests_per_day, t.bytes_per_day, t.revoked_at,
+                       coalesce(u.requests, 0) AS requests, coalesce(u.bytes, 0) AS bytes
+                FROM agent_tokens t
+                LEFT JOIN agent_token_usage u ON u.token_id = t.id AND u.day = (now() AT TIME ZONE 'UTC')::date
+                ORDER BY t.name
+            """)).all()
+        for row in rows:
+            state = "revoked" if row.revoked_at else "active"
+            print(f"{row.name}\t{state}\trequests {row.requests}/{row.requests_per_day or 'unlimited'}"
+                  f"\tbytes {row.bytes}/{row.bytes_per_day or 'unlimited'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Short-lived cache of author autocomplete responses, keyed by the normalized
+query and limit.
+
+Type-ahead sends the same few prefixes over and over (every user typing a
+name goes through its first letters), so even a TTL of seconds absorbs most
+queries. Entries are not invalidated on writes: a new profile or author shows
+up in suggestions within AUTOCOMPLETE_CACHE_TTL_SECONDS.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from app.config import settings
+from app.metrics import registry
+
+autocomplete_cache_requests_total = registry.counter(
+    "aixiv_autocomplete_cache_requests_total", "Autocomplete lookups by result (hit, miss)", ("result",)
+)
+
+
+class AutocompleteCache:
+    """TTL + LRU cache of autocomplete results"""
+
+    def __init__(self, ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        self.ttl = ttl if ttl is not None else settings.autocomplete_cache_ttl_seconds
+        self.max_entries = max_entries or settings.autocomplete_cache_max_entries
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (expires at, results)
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                autocomplete_cache_requests_total.inc(result="hit")
+                return entry[1]
+        autocomplete_cache_requests_total.inc(result="miss")
+        return None
+
+    def put(self, key: Hashable, results) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+autocomplete_cache = AutocompleteCache()
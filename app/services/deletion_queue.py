@@ -0,0 +1,145 @@
+"""
+Background deletion of S3 objects that are no longer referenced.
+
+Writers never delete from S3 on the request path. They add the keys to the
+s3_deletions outbox in the same transaction that stops using the objects
+(`crud.enqueue_s3_deletions`), so an object is only deleted once that change
+is committed, and a crash can't lose a deletion. The sweeper below drains the
+outbox:
+
+1. lock up to DELETION_BATCH_SIZE (max 1000) due rows with FOR UPDATE SKIP
+   LOCKED, so several sweepers can run side by side;
+2. delete them with a single DeleteObjects request;
+3. drop the rows that were deleted, and push the ones S3 reported as failed
+   back with exponential backoff. After DELETION_MAX_ATTEMPTS a key is
+   dropped from the queue and logged.
+
+Deleting a key that no longer exists succeeds, so retries are harmless.
+
+Run it as its own process:
+    python -m app.services.deletion_queue [--once]
+or in the API process with DELETION_SWEEPER_IN_PROCESS=True (see app/main.py).
+"""
+import argparse
+import logging
+import threading
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+MAX_DELETE_BATCH = 1000  # DeleteObjects limit
+
+s3_deletions_total = registry.counter(
+    "aixiv_s3_deletions_total", "Queued S3 deletions by outcome (deleted, retry, abandoned)", ("outcome",)
+)
+
+
+class DeletionSweeper:
+    """Drains the s3_deletions outbox in DeleteObjects batches"""
+
+    def __init__(self, engine: Engine, s3_service, batch_size: Optional[int] = None):
+        self.engine = engine
+        self.s3_service = s3_service
+        self.batch_size = min(batch_size or settings.deletion_batch_size, MAX_DELETE_BATCH)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> int:
+        """Delete one batch of due keys; returns the number of keys handled"""
+        # The rows stay locked during the S3 call, so another sweeper skips
+        # them; one DeleteObjects request is short enough to hold the lock
+        with self.engine.begin() as connection:
+            rows = connection.execute(text("""
+                SELECT id, s3_key, attempts FROM s3_deletions
+                WHERE run_after <= now()
+                ORDER BY run_after
+                LIMIT :limit
+                FOR UPDATE SKIP LOCKED
+            """), {"limit": self.batch_size}).all()
+            if not rows:
+                return 0
+
+            try:
+                failed = set(self.s3_service.delete_files([row.s3_key for row in rows]))
+                error = "DeleteObjects reported an error for this key"
+            except Exception as e:
+                failed = {row.s3_key for row in rows}
+                error = f"{type(e).__name__}: {e}"
+
+            done = [row.id for row in rows if row.s3_key not in failed]
+            retry = [row.id for row in rows if row.s3_key in failed and row.attempts + 1 < settings.deletion_max_attempts]
+            abandoned = [row for row in rows if row.s3_key in failed and row.attempts + 1 >= settings.deletion_max_attempts]
+
+            if done or abandoned:
+                connection.execute(text("DELETE FROM s3_deletions WHERE id = ANY(:ids)"),
+                                   {"ids": done + [row.id for row in abandoned]})
+            if retry:
+                connection.execute(text("""
+                    UPDATE s3_deletions
+                    SET attempts = attempts + 1, last_error = :error,
+                        run_after = now() + make_interval(secs => :base * power(2, attempts))
+                    WHERE id = ANY(:ids)
+                """), {"ids": retry, "error": error[:2000], "base": settings.deletion_retry_base_seconds})
+
+        for row in abandoned:
+            logger.error(f"Giving up deleting s3://{self.s3_service.bucket_name}/{row.s3_key}: {error}")
+        s3_deletions_total.inc(len(done), outcome="deleted")
+        s3_deletions_total.inc(len(retry), outcome="retry")
+        s3_deletions_total.inc(len(abandoned), outcome="abandoned")
+        return len(rows)
+
+    def run(self, poll_seconds: Optional[float] = None) -> None:
+        """Sweep until stop() is called; full batches are followed up right away"""
+        poll_seconds = poll_seconds or settings.deletion_poll_seconds
+        while not self._stop.is_set():
+            try:
+                handled = self.run_once()
+            except Exception as e:
+                logger.error(f"Deletion sweep failed: {e}")
+                handled = 0
+            if handled < self.batch_size:
+                self._stop.wait(poll_seconds)
+
+    def start(self) -> threading.Thread:
+        """Run the sweeper on a daemon thread (in-process mode)"""
+        self._thread = threading.Thread(target=self.run, name="s3-deletion-sweeper", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout: float = 30) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete S3 objects queued in s3_deletions")
+    parser.add_argument("--once", action="store_true", help="delete one batch and exit")
+    parser.add_argument("--batch-size", type=int, default=settings.deletion_batch_size)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from app.database import engine
+    from app.services.s3_service import s3_service
+
+    sweeper = DeletionSweeper(engine, s3_service, batch_size=args.batch_size)
+    try:
+        if args.once:
+            logger.info(f"Handled {sweeper.run_once()} queued deletion(s)")
+        else:
+            sweeper.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sweeper.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Batched download counting.
+
+/api/submissions/{id}/download only records the download in memory; a
+background thread adds the accumulated counts to submissions.downloads with
+one UPDATE every DOWNLOAD_COUNT_FLUSH_SECONDS, so a redirect never waits on
+(or takes a row lock in) the database. Counts that fail to flush are kept
+for the next attempt. Counts still in memory when a worker is killed are
+lost, which is acceptable for a statistic.
+"""
+import logging
+import threading
+from typing import Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+from app.database import engine
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+downloads_total = registry.counter(
+    "aixiv_submission_downloads_total", "Download redirects issued"
+)
+download_flushes_total = registry.counter(
+    "aixiv_download_count_flushes_total", "Download count flushes by outcome (ok, error)", ("outcome",)
+)
+
+
+class DownloadCounter:
+    """Accumulates downloads per submission and writes them in batches"""
+
+    def __init__(self, engine: Engine, flush_seconds: Optional[float] = None):
+        self.engine = engine
+        self.flush_seconds = flush_seconds or settings.download_count_flush_seconds
+        self._counts: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def record(self, submission_id: int) -> None:
+        with self._lock:
+            self._counts[submission_id] = self._counts.get(submission_id, 0) + 1
+        downloads_total.inc()
+
+    def pending(self) -> Dict[int, int]:
+        with self._lock:
+            return dict(self._counts)
+
+    def flush(self) -> int:
+        """Write the accumulated counts; returns the number of submissions updated"""
+        with self._lock:
+            counts, self._counts = self._counts, {}
+        if not counts:
+            return 0
+        ids = sorted(counts)
+        try:
+            with self.engine.begin() as connection:
+                # Lock the rows in id order first: the UPDATE's join locks them
+                # in whatever order the plan produces, and two workers flushing
+                # overlapping ids in different orders would deadlock
+                connection.execute(text("""
+                    SELECT id FROM submissions WHERE id = ANY(CAST(:ids AS integer[])) ORDER BY id FOR UPDATE
+                """), {"ids": ids})
+                connection.execute(text("""
+                    UPDATE submissions SET downloads = submissions.downloads + batch.n
+                    FROM unnest(CAST(:ids AS integer[]), CAST(:counts AS integer[])) AS batch(id, n)
+                    WHERE submissions.id = batch.id
+                """), {"ids": ids, "counts": [counts[submission_id] for submission_id in ids]})
+        except Exception:
+            with self._lock:
+                for submission_id, n in counts.items():
+                    self._counts[submission_id] = self._counts.get(submission_id, 0) + n
+            download_flushes_total.inc(outcome="error")
+            raise
+        download_flushes_total.inc(outcome="ok")
+        return len(counts)
+
+    def run(self) -> None:
+        while not self._stop.wait(self.flush_seconds):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush download counts: {e}")
+
+    def start(self) -> threading.Thread:
+        """Flush on a daemon thread until stop() is called"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="download-counter", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout: float = 10) -> None:
+        """Stop the thread and write what is left"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush download counts on shutdown: {e}")
+
+
+download_counter = DownloadCounter(engine)
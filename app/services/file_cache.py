@@ -0,0 +1,244 @@
+"""
+Local disk cache for objects served through /api/files/{key}.
+
+Paper downloads otherwise go straight to S3 through the public s3_url, which
+costs a GET and egress per download and leaves byte-range requests from
+in-browser PDF viewers to S3. With FILE_CACHE_ENABLED the API serves hot
+objects from a size-bounded directory instead:
+
+- a miss HEADs the object and streams it into the cache directory; concurrent
+  misses for the same key wait for that one download (single flight) instead
+  of each fetching it, and the download opens a handle for each of them.
+  Requests from app/api/files.py wait on the event loop, not on an S3
+  executor slot;
+- entries are evicted least-recently-used once the directory holds more than
+  FILE_CACHE_MAX_BYTES. Objects larger than the whole cache are downloaded,
+  served to the requests waiting for them and dropped;
+- the file's mtime is the object's LastModified, which is what the
+  Last-Modified / If-Modified-Since handling in app/api/files.py uses.
+
+Entries are never revalidated. Papers get a fresh uuid per upload and
+avatars a fresh id per upload. Thumbnails keep the fixed key
+thumbnails/submissions/{id}.jpg, but they are only rewritten when the
+submission's own file is processed again, which renders the same page (a
+new version is a new submission, with its own thumbnail key).
+
+The index lives in memory and is rebuilt from the directory on first use.
+Each worker process keeps its own index and size limit, so give each worker
+its own directory or size FILE_CACHE_MAX_BYTES per worker.
+"""
+import asyncio
+import glob
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import BinaryIO, Dict, List, NamedTuple, Optional, Union
+
+from app.config import settings
+from app.metrics import registry
+from app.services.s3_service import s3_service
+
+logger = logging.getLogger(__name__)
+
+file_cache_requests_total = registry.counter(
+    "aixiv_file_cache_requests_total", "Requests to the disk file cache by result (hit, miss)", ("result",)
+)
+file_cache_bytes_saved_total = registry.counter(
+    "aixiv_file_cache_bytes_saved_total", "Bytes served from the disk cache instead of S3"
+)
+file_cache_evictions_total = registry.counter(
+    "aixiv_file_cache_evictions_total", "Entries evicted from the disk file cache"
+)
+file_cache_size_bytes = registry.gauge(
+    "aixiv_file_cache_size_bytes", "Bytes currently held by the disk file cache"
+)
+
+
+def _hit_ratio():
+    hits = file_cache_requests_total.get(result="hit")
+    total = hits + file_cache_requests_total.get(result="miss")
+    yield "# HELP aixiv_file_cache_hit_ratio Share of file requests served without fetching from S3"
+    yield "# TYPE aixiv_file_cache_hit_ratio gauge"
+    yield f"aixiv_file_cache_hit_ratio {hits / total if total else 0.0}"
+
+
+registry.register_collector(_hit_ratio)
+
+
+class CachedFile(NamedTuple):
+    file: BinaryIO  # open for reading; the caller closes it
+    size: int
+    last_modified: float  # epoch seconds
+    from_cache: bool  # False when this request had to fetch the object
+
+
+class _Flight:
+    """A download in progress and the number of requests waiting for it"""
+
+    def __init__(self):
+        self.future: Future = Future()
+        # Running futures can't be cancelled, so a waiter that goes away can't
+        # cancel the download's result for everybody else
+        self.future.set_running_or_notify_cancel()
+        self.waiters = 0
+
+
+def _take(handles: List[CachedFile]) -> Optional[CachedFile]:
+    # One handle per waiter; list.pop is atomic
+    return handles.pop() if handles else None
+
+
+class DiskFileCache:
+    """Size-bounded LRU of S3 objects on local disk"""
+
+    def __init__(self, s3_service, directory: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.s3_service = s3_service
+        self.directory = directory or settings.file_cache_dir
+        self.max_bytes = max_bytes or settings.file_cache_max_bytes
+        self.total_bytes = 0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # file name -> size, oldest first
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _load(self) -> None:
+        """Index what a previous run left in the directory (called with the lock held)"""
+        os.makedirs(self.directory, exist_ok=True)
+        for leftover in glob.glob(self._path("*.tmp")):
+            os.unlink(leftover)
+        found = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file():
+                stat = entry.stat()
+                found.append((stat.st_atime, entry.name, stat.st_size))
+        for _, name, size in sorted(found):
+            self._entries[name] = size
+            self.total_bytes += size
+        self._evict()
+        self._loaded = True
+
+    def _evict(self) -> None:
+        while self.total_bytes > self.max_bytes and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            file_cache_evictions_total.inc()
+            try:
+                # Responses that already opened the file keep reading it
+                os.unlink(self._path(name))
+            except FileNotFoundError:
+                pass
+        file_cache_size_bytes.set(self.total_bytes)
+
+    def _open_entry(self, name: str, from_cache: bool) -> Optional[CachedFile]:
+        """Open an indexed entry and mark it most recently used (called with the lock held)"""
+        try:
+            file = open(self._path(name), "rb")
+        except FileNotFoundError:
+            # Removed behind our back (another worker sharing the directory)
+            self.total_bytes -= self._entries.pop(name)
+            file_cache_size_bytes.set(self.total_bytes)
+            return None
+        self._entries.move_to_end(name)
+        stat = os.fstat(file.fileno())
+        return CachedFile(file, stat.st_size, stat.st_mtime, from_cache)
+
+    def open(self, key: str, wait: bool = True) -> Union[Optional[CachedFile], Future]:
+        """
+        Open the cached copy of `key`, downloading it first on a miss.
+        Returns None if the object does not exist. Blocking: run it on the
+        S3 executor. If another request is already downloading `key`, this
+        one waits for it, or with wait=False gets a Future to pass to
+        `joined()` instead.
+        """
+        name = hashlib.sha256(key.encode()).hexdigest()
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if name in self._entries:
+                cached = self._open_entry(name, from_cache=True)
+                if cached is not None:
+                    file_cache_requests_total.inc(result="hit")
+                    return cached
+            flight = self._inflight.get(name)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[name] = _Flight()
+            else:
+                flight.waiters += 1
+
+        if not leader:
+            file_cache_requests_total.inc(result="hit")
+            return _take(flight.future.result()) if wait else flight.future
+
+        try:
+            cached = self._fetch(key, name, flight)
+        except BaseException as e:
+            with self._lock:
+                if self._inflight.get(name) is flight:
+                    del self._inflight[name]
+            if not flight.future.done():
+                flight.future.set_exception(e)
+            raise
+        file_cache_requests_total.inc(result="miss")
+        return cached
+
+    @staticmethod
+    async def joined(future: Future) -> Optional[CachedFile]:
+        """The handle another request's download opened for this one, awaited on the event loop"""
+        return _take(await asyncio.wrap_future(future))
+
+    def _fetch(self, key: str, name: str, flight: _Flight) -> Optional[CachedFile]:
+        """
+        Download `key` and open one handle for this request and one for each
+        request waiting on `flight`, which is resolved with the latter.
+        """
+        info = self.s3_service.head_file(key)
+        if info is None:
+            with self._lock:
+                del self._inflight[name]
+            flight.future.set_result([])
+            return None
+        with tempfile.NamedTemporaryFile(dir=self.directory, suffix=".tmp", delete=False) as tmp:
+            try:
+                self.s3_service.download_to(key, tmp)
+            except BaseException:
+                os.unlink(tmp.name)
+                raise
+        last_modified = info["last_modified"].timestamp() if info["last_modified"] else None
+        if last_modified is not None:
+            os.utime(tmp.name, (os.stat(tmp.name).st_atime, last_modified))
+
+        if info["size"] > self.max_bytes:
+            # Would evict everything else: serve this copy, keep nothing. No
+            # request joins once the flight is removed, so every waiter gets
+            # its own handle before the file is unlinked.
+            with self._lock:
+                waiters = self._inflight.pop(name).waiters
+            try:
+                files = [open(tmp.name, "rb") for _ in range(waiters + 1)]
+            finally:
+                os.unlink(tmp.name)
+        else:
+            with self._lock:
+                os.replace(tmp.name, self._path(name))
+                if name in self._entries:
+                    self.total_bytes -= self._entries.pop(name)
+                files = [open(self._path(name), "rb") for _ in range(self._inflight.pop(name).waiters + 1)]
+                self._entries[name] = os.fstat(files[0].fileno()).st_size
+                self.total_bytes += self._entries[name]
+                # Opened before evicting, so these requests' files are never the ones removed
+                self._evict()
+
+        stat = os.fstat(files[0].fileno())
+        flight.future.set_result([CachedFile(file, stat.st_size, stat.st_mtime, True) for file in files[1:]])
+        return CachedFile(files[0], stat.st_size, stat.st_mtime, False)
+
+
+file_cache = DiskFileCache(s3_service)
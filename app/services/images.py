@@ -0,0 +1,65 @@
+"""
+Image processing for uploads.
+
+These functions are CPU-bound and run in the image process pool
+(app.executors.image_executor), so they take and return plain bytes and must
+stay importable at module level.
+"""
+import io
+from typing import Dict
+
+from PIL import Image
+
+AVATAR_SIZES = (500, 128, 64, 32)  # bounding boxes, largest first
+AVATAR_FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+AVATAR_EXTENSIONS = ['jpg', 'jpeg', 'png', 'gif', 'webp']
+
+
+class ImageTooLarge(ValueError):
+    """The image's pixel count is over the limit; it is rejected before decoding"""
+
+
+def _encode(image: Image.Image, fmt: str) -> bytes:
+    output = io.BytesIO()
+    if fmt == "JPEG":
+        image.save(output, format="JPEG", quality=85, optimize=True, progressive=image.width > 128)
+    else:
+        image.save(output, format="WEBP", quality=80, method=4)
+    return output.getvalue()
+
+
+def process_avatar_variants(contents: bytes, max_pixels: int) -> Dict[str, Dict[int, bytes]]:
+    """
+    Decode an avatar once and encode every size in AVATAR_SIZES as WebP and
+    JPEG. Returns {"webp": {500: bytes, ...}, "jpeg": {...}}.
+
+    Only the header is read before the pixel count is checked, so oversized
+    images (decompression bombs) are rejected without allocating them. JPEGs
+    are decoded at a reduced scale (`draft`) close to the largest size, which
+    keeps peak memory near the output size rather than the camera resolution.
+    """
+    image = Image.open(io.BytesIO(contents))
+    width, height = image.size
+    if width * height > max_pixels:
+        raise ImageTooLarge(f"Image is {width}x{height}; at most {max_pixels} pixels are allowed")
+
+    largest = AVATAR_SIZES[0]
+    # JPEG only: let the decoder scale down by 1/2, 1/4 or 1/8 while decoding
+    image.draft("RGB", (largest, largest))
+
+    # Flatten transparency onto white; palette and other modes become RGB
+    if image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    variants = {name: {} for name in AVATAR_FORMATS}
+    for size in AVATAR_SIZES:
+        # Each size is scaled from the previous one, not from the original
+        image.thumbnail((size, size), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        for name, fmt in AVATAR_FORMATS.items():
+            variants[name][size] = _encode(image, fmt)
+    return variants
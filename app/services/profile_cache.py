@@ -0,0 +1,93 @@
+"""
+In-process cache of compact profiles (app.schemas.ProfileSummary) for
+GET /api/profiles/batch.
+
+Entries expire after PROFILE_CACHE_TTL_SECONDS and the least recently used
+are dropped past PROFILE_CACHE_MAX_ENTRIES. Users without a profile are
+cached too (as None), so unknown ids in author lists do not hit the database
+on every page view.
+
+Writers call invalidate() after committing (crud.create_or_update_profile and
+the avatar upload). Invalidation leaves a tombstone, so a batch lookup that
+read the old row before the commit cannot put it back afterwards. It only
+reaches the worker process that made the change; the TTL bounds how long
+other workers may serve the old profile.
+"""
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from app.config import settings
+from app.metrics import registry
+from app.schemas import ProfileSummary
+
+profile_cache_requests_total = registry.counter(
+    "aixiv_profile_cache_requests_total", "Profile summary lookups by result (hit, miss)", ("result",)
+)
+
+_TOMBSTONE = object()
+
+
+class ProfileCache:
+    """TTL + LRU cache of ProfileSummary by user_id"""
+
+    def __init__(self, ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        self.ttl = ttl if ttl is not None else settings.profile_cache_ttl_seconds
+        self.max_entries = max_entries or settings.profile_cache_max_entries
+        # user_id -> (expires at, summary / None / _TOMBSTONE, generation)
+        self._entries: "OrderedDict[str, Tuple[float, object, int]]" = OrderedDict()
+        self._generation = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def generation(self) -> int:
+        """Take before reading from the database; pass to put_many()"""
+        with self._lock:
+            return next(self._generation)
+
+    def get_many(self, user_ids: Iterable[str]) -> Tuple[Dict[str, Optional[ProfileSummary]], list]:
+        """(cached summaries, ids to load); a cached None means no profile"""
+        found, missing = {}, []
+        now = time.monotonic()
+        with self._lock:
+            for user_id in user_ids:
+                entry = self._entries.get(user_id)
+                if entry is not None and entry[1] is not _TOMBSTONE and entry[0] > now:
+                    self._entries.move_to_end(user_id)
+                    found[user_id] = entry[1]
+                else:
+                    missing.append(user_id)
+        profile_cache_requests_total.inc(len(found), result="hit")
+        profile_cache_requests_total.inc(len(missing), result="miss")
+        return found, missing
+
+    def put_many(self, summaries: Dict[str, Optional[ProfileSummary]], generation: int) -> None:
+        """Store what was read from the database after `generation` was taken"""
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for user_id, summary in summaries.items():
+                entry = self._entries.get(user_id)
+                if entry is not None and entry[1] is _TOMBSTONE and entry[2] > generation:
+                    # Changed while this batch was being read
+                    continue
+                self._entries[user_id] = (expires, summary, generation)
+                self._entries.move_to_end(user_id)
+            self._trim()
+
+    def invalidate(self, user_id: str) -> None:
+        with self._lock:
+            self._entries[user_id] = (0.0, _TOMBSTONE, next(self._generation))
+            self._entries.move_to_end(user_id)
+            self._trim()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _trim(self) -> None:
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+profile_cache = ProfileCache()
@@ -0,0 +1,54 @@
+"""
+Bulk import of user profiles, e.g. from an identity provider export.
+
+Reads JSON lines or CSV with user_profiles column names as keys / headers
+(user_id and name are required; unknown keys are ignored; empty CSV cells
+and nulls leave existing values alone) and upserts them with
+crud.bulk_upsert_profiles: one INSERT ... ON CONFLICT statement and commit
+per chunk. The file is streamed, so memory only depends on the chunk size.
+
+    python -m app.services.profile_import directory.jsonl [--chunk-size 2000]
+    python -m app.services.profile_import directory.csv
+"""
+import argparse
+import csv
+import json
+import logging
+from typing import Dict, Iterator, TextIO
+
+logger = logging.getLogger(__name__)
+
+
+def read_profiles(file: TextIO, fmt: str) -> Iterator[Dict]:
+    """Profiles from a JSON lines or CSV file; rows without user_id or name are skipped"""
+    if fmt == "csv":
+        rows = ({key: value or None for key, value in row.items()} for row in csv.DictReader(file))
+    else:
+        rows = (json.loads(line) for line in file if line.strip())
+    for number, row in enumerate(rows, start=1):
+        if not row.get("user_id") or not row.get("name"):
+            logger.warning(f"Skipping record {number}: user_id and name are required")
+            continue
+        yield row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upsert user profiles from a JSON lines or CSV file")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=("jsonl", "csv"), help="default: from the file extension")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="profiles per statement")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from app.crud import bulk_upsert_profiles
+    from app.database import SessionLocal
+
+    fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "jsonl")
+    with open(args.path, newline="", encoding="utf-8") as file, SessionLocal() as db:
+        written = bulk_upsert_profiles(db, read_profiles(file, fmt), chunk_size=args.chunk_size)
+    logger.info(f"Upserted {written} profile(s) from {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Partition maintenance and retention for the paper_review table.
+
+paper_review is range-partitioned by month on create_time (see the
+3f2a9c1d7b54 migration). This module keeps future partitions created ahead of
+time and archives partitions older than the retention window: each one is
+streamed out with COPY into a gzip file, uploaded to S3, then detached and
+dropped.
+
+Run it periodically (e.g. a daily scheduled ECS task):
+    python -m app.services.review_retention [--dry-run]
+"""
+import argparse
+import gzip
+import logging
+import os
+import re
+import tempfile
+from datetime import date
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+PARTITION_NAME = re.compile(r"^paper_review_(\d{4})_(\d{2})$")
+
+
+class ReviewPartition(NamedTuple):
+    name: str
+    month: date
+    attached: bool
+
+
+def ensure_partitions(engine: Engine, months_ahead: int) -> int:
+    """Create any missing monthly partitions up to `months_ahead` months out"""
+    with engine.begin() as connection:
+        return connection.execute(
+            text("SELECT paper_review_create_partitions(:months_ahead)"), {"months_ahead": months_ahead}
+        ).scalar()
+
+
+def list_partitions(engine: Engine) -> List[ReviewPartition]:
+    """
+    Monthly partitions, attached or not, so a partition detached by hand is
+    still archived by the next run.
+    """
+    with engine.connect() as connection:
+        rows = connection.execute(text(
+            "SELECT relname, relispartition FROM pg_class "
+            "WHERE relkind = 'r' AND relname ~ '^paper_review_[0-9]{4}_[0-9]{2}$'"
+        )).all()
+
+    partitions = []
+    for name, attached in rows:
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions.append(ReviewPartition(name, date(int(match.group(1)), int(match.group(2)), 1), attached))
+    return sorted(partitions, key=lambda p: p.month)
+
+
+def retention_cutoff(retention_months: int, today: Optional[date] = None) -> date:
+    """First month that is kept; partitions for earlier months are archived"""
+    today = today or date.today()
+    months = today.year * 12 + (today.month - 1) - retention_months
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def partitions_to_archive(partitions: List[ReviewPartition], retention_months: int,
+                          today: Optional[date] = None) -> List[ReviewPartition]:
+    cutoff = retention_cutoff(retention_months, today)
+    return [p for p in partitions if p.month < cutoff]
+
+
+def archive_key(partition_name: str) -> str:
+    return f"{settings.review_archive_prefix.rstrip('/')}/{partition_name}.csv.gz"
+
+
+def archive_partition(engine: Engine, partition: ReviewPartition, s3_service) -> str:
+    """
+    Export, upload and verify one partition, then detach and drop it. Returns
+    the S3 key. The rows stay visible to get_reviews and the IP rate limit
+    until the archive is confirmed; detach and drop commit together.
+    """
+    key = archive_key(partition.name)
+    tmp = tempfile.NamedTemporaryFile(suffix=".csv.gz", delete=False)
+    try:
+        # COPY works on an attached partition and streams rows straight into
+        # the gzip file, so memory stays flat
+        raw = engine.raw_connection()
+        try:
+            with gzip.GzipFile(fileobj=tmp, mode="wb") as gz:
+                cursor = raw.cursor()
+                try:
+                    cursor.copy_expert(f'COPY "{partition.name}" TO STDOUT WITH (FORMAT csv, HEADER)', gz)
+                finally:
+                    cursor.close()
+        finally:
+            raw.close()
+        tmp.close()
+
+        s3_service.s3_client.upload_file(tmp.name, s3_service.bucket_name, key)
+        if not s3_service.file_exists(key):
+            raise RuntimeError(f"Archive upload for {partition.name} could not be verified")
+    finally:
+        tmp.close()
+        os.unlink(tmp.name)
+
+    with engine.begin() as connection:
+        if partition.attached:
+            connection.execute(text(f'ALTER TABLE paper_review DETACH PARTITION "{partition.name}"'))
+        connection.execute(text(f'DROP TABLE "{partition.name}"'))
+    logger.info(f"Archived partition {partition.name} to s3://{s3_service.bucket_name}/{key}")
+    return key
+
+
+def run_retention(engine: Engine, s3_service, retention_months: int, months_ahead: int,
+                  dry_run: bool = False) -> List[str]:
+    """Create upcoming partitions and archive expired ones. Returns archived partition names."""
+    if not dry_run:
+        created = ensure_partitions(engine, months_ahead)
+        logger.info(f"Created {created} new paper_review partition(s)")
+
+    expired = partitions_to_archive(list_partitions(engine), retention_months)
+    archived = []
+    for partition in expired:
+        if dry_run:
+            logger.info(f"[dry-run] Would archive {partition.name} to {archive_key(partition.name)}")
+            continue
+        try:
+            archive_partition(engine, partition, s3_service)
+            archived.append(partition.name)
+        except Exception as e:
+            logger.error(f"Failed to archive partition {partition.name}: {e}")
+    return archived
+
+
+def main():
+    parser = argparse.ArgumentParser(description="paper_review partition maintenance and archival")
+    parser.add_argument("--retention-months", type=int, default=settings.review_retention_months)
+    parser.add_argument("--months-ahead", type=int, default=settings.review_partitions_ahead)
+    parser.add_argument("--dry-run", action="store_true", help="list expired partitions without changing anything")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from app.database import engine
+    from app.services.s3_service import s3_service
+
+    run_retention(engine, s3_service, args.retention_months, args.months_ahead, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,86 @@
-import boto3
+import base64
 from botocore.exceptions import ClientError
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from typing import List, Optional
+import math
+import re
+from urllib.parse import quote, unquote, urlparse
+import threading
+import time
 import uuid
 from app.config import settings
 import os
 
+MIB = 1024 * 1024
+# S3 multipart limits
+MULTIPART_MIN_PART_SIZE = 5 * MIB
+MULTIPART_MAX_PARTS = 10000
+MULTIPART_MAX_OBJECT_SIZE = 5 * 1024 * 1024 * MIB
+DOWNLOAD_URL_CACHE_SIZE = 10000  # signed download URLs kept for reuse
+
+# Keys this service writes; anything else in the bucket (e.g. review archives)
+# is not served or garbage-collected
+PAPER_KEY = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}_[^/]+$")
+THUMBNAIL_KEY = re.compile(r"^thumbnails/submissions/(\d+)\.jpg$")
+
+
+def key_kind(key: str) -> Optional[str]:
+    """"paper", "avatar" or "thumbnail" for keys this service creates, else None"""
+    if PAPER_KEY.match(key):
+        return "paper"
+    if key.startswith("avatars/") and ".." not in key:
+        return "avatar"
+    if THUMBNAIL_KEY.match(key):
+        return "thumbnail"
+    return None
+
+
+def key_from_url(url: str, bucket_name: str) -> Optional[str]:
+    """The object key for an S3 URL in `bucket_name`, or None if the URL points elsewhere"""
+    parsed = urlparse(url)
+    host, path = parsed.netloc.lower(), unquote(parsed.path.lstrip('/'))
+    if host.startswith(f"{bucket_name}.s3") and host.endswith("amazonaws.com"):
+        return path or None
+    if host.startswith("s3") and host.endswith("amazonaws.com") and path.startswith(f"{bucket_name}/"):
+        return path[len(bucket_name) + 1:] or None
+    return None
+
+
 class S3Service:
     def __init__(self):
-        self.s3_client = boto3.client(
-            's3',
-            aws_access_key_id=settings.aws_access_key_id,
-            aws_secret_access_key=settings.aws_secret_access_key,
-            region_name=settings.aws_region
-        )
+        # The boto3 client is built on first use (or during app startup), so
+        # importing this module stays cheap and never touches credentials.
+        self._s3_client = None
+        self._client_lock = threading.Lock()
         self.bucket_name = settings.aws_s3_bucket
+        # key -> (url, reuse until), least recently used first
+        self._download_urls: "OrderedDict[str, tuple]" = OrderedDict()
+        self._download_urls_lock = threading.Lock()
+
+    @property
+    def s3_client(self):
+        """Shared boto3 S3 client, created once on first access"""
+        if self._s3_client is None:
+            with self._client_lock:
+                if self._s3_client is None:
+                    import boto3
+                    from app.s3_instrumentation import instrument_s3_client, s3_client_config
+
+                    client = boto3.client(
+                        's3',
+                        aws_access_key_id=settings.aws_access_key_id,
+                        aws_secret_access_key=settings.aws_secret_access_key,
+                        region_name=settings.aws_region,
+                        config=s3_client_config()
+                    )
+                    instrument_s3_client(client)
+                    self._s3_client = client
+        return self._s3_client
+
+    @s3_client.setter
+    def s3_client(self, client):
+        self._s3_client = client
     
     def _get_file_extension(self, filename: str) -> str:
         """Extract file extension from filename"""
@@ -33,53 +100,270 @@ class S3Service:
         }
         return content_types.get(file_extension, 'application/octet-stream')
     
-    def generate_upload_url(self, filename: str) -> dict:
+    def _s3_url(self, file_key: str) -> str:
+        return f"https://{self.bucket_name}.s3.{settings.aws_region}.amazonaws.com/{file_key}"
+
+    def _new_paper_key(self, filename: str) -> tuple:
         """
-        Generate a pre-signed URL for uploading a file to S3
+        Validate a paper filename and build a unique key for it.
+        Returns (file_key, content_type, file_extension).
         """
-        # Generate unique file key with date-based organization
         file_extension = self._get_file_extension(filename)
-        
+
         # Validate file extension
         if file_extension not in ['pdf', 'tex', 'latex']:
             raise ValueError("Only PDF and LaTeX files (.pdf, .tex, .latex) are supported")
-        
+
+        file_uuid = str(uuid.uuid4())
+        # Sanitize the original filename to avoid S3 issues
+        safe_filename = os.path.basename(filename).replace(" ", "_")
+        file_key = f"{file_uuid}_{safe_filename}"
+
+        return file_key, self._get_content_type(file_extension), file_extension
+
+    def _presigned_put(self, client, file_key: str, content_type: str, file_extension: str,
+                       sha256: Optional[str] = None) -> dict:
+        params = {
+            'Bucket': self.bucket_name,
+            'Key': file_key,
+            'ContentType': content_type
+        }
+        checksum = None
+        if sha256:
+            # Signed into the URL: S3 rejects a body that doesn't match the
+            # hash, and the client must send it as x-amz-checksum-sha256
+            checksum = base64.b64encode(bytes.fromhex(sha256)).decode()
+            params['ChecksumSHA256'] = checksum
+
+        # Generate pre-signed URL for PUT operation
+        presigned_url = client.generate_presigned_url(
+            'put_object',
+            Params=params,
+            ExpiresIn=3600  # URL expires in 1 hour
+        )
+
+        return {
+            "upload_url": presigned_url,
+            "file_key": file_key,
+            "s3_url": self._s3_url(file_key),
+            "content_type": content_type,
+            "file_extension": file_extension,
+            "checksum_sha256": checksum
+        }
+
+    def generate_upload_url(self, filename: str, sha256: Optional[str] = None) -> dict:
+        """
+        Generate a pre-signed URL for uploading a file to S3. With the file's
+        SHA-256 (hex), S3 only accepts those exact bytes.
+        """
+        file_key, content_type, file_extension = self._new_paper_key(filename)
+
         try:
-            file_uuid = str(uuid.uuid4())
-            # Sanitize the original filename to avoid S3 issues
-            safe_filename = os.path.basename(filename).replace(" ", "_")
-            file_key = f"{file_uuid}_{safe_filename}"
-            
-            # Get appropriate content type
-            content_type = self._get_content_type(file_extension)
-            
-            # Generate pre-signed URL for PUT operation
-            presigned_url = self.s3_client.generate_presigned_url(
-                'put_object',
+            return self._presigned_put(self.s3_client, file_key, content_type, file_extension, sha256)
+        except ClientError as e:
+            raise Exception(f"S3 error: {str(e)}")
+        except Exception as e:
+            raise Exception(f"Error generating upload URL: {str(e)}")
+
+    def existing_upload(self, filename: str, s3_url: str) -> dict:
+        """
+        Upload-URL response for a file that is already stored at `s3_url`:
+        the client skips the upload and submits that URL.
+        """
+        file_key = self.key_from_url(s3_url)
+        _, content_type, file_extension = self._new_paper_key(filename)
+        return {
+            "upload_url": None,
+            "file_key": file_key,
+            "s3_url": s3_url,
+            "content_type": content_type,
+            "file_extension": file_extension,
+            "existing": True
+        }
+
+    def generate_upload_urls(self, filenames: List[str]) -> List[dict]:
+        """
+        Generate pre-signed upload URLs for several files at once.
+        Every filename is validated before anything is signed, so a bad name
+        fails the whole batch. Signing is local; all URLs share the client's
+        signer and credentials.
+        """
+        keys = []
+        for filename in filenames:
+            try:
+                keys.append(self._new_paper_key(filename))
+            except ValueError as e:
+                raise ValueError(f"{filename}: {e}")
+
+        client = self.s3_client
+        try:
+            return [self._presigned_put(client, *key) for key in keys]
+        except ClientError as e:
+            raise Exception(f"S3 error: {str(e)}")
+        except Exception as e:
+            raise Exception(f"Error generating upload URLs: {str(e)}")
+
+    def generate_download_url(self, file_key: str) -> str:
+        """
+        Short-lived pre-signed GET for an object, as an attachment under its
+        original filename. A URL is reused until a quarter of its lifetime
+        is left, so popular papers are not re-signed on every download.
+        """
+        now = time.monotonic()
+        with self._download_urls_lock:
+            cached = self._download_urls.get(file_key)
+            if cached is not None and cached[1] > now:
+                self._download_urls.move_to_end(file_key)
+                return cached[0]
+
+        expiry = settings.download_url_expiry
+        filename = file_key.split("_", 1)[1] if PAPER_KEY.match(file_key) else os.path.basename(file_key)
+        try:
+            url = self.s3_client.generate_presigned_url(
+                'get_object',
                 Params={
                     'Bucket': self.bucket_name,
                     'Key': file_key,
-                    'ContentType': content_type
+                    'ResponseContentDisposition': f"attachment; filename*=UTF-8''{quote(filename)}",
                 },
-                ExpiresIn=3600  # URL expires in 1 hour
+                ExpiresIn=expiry
             )
-            
-            # Construct the final S3 URL
-            s3_url = f"https://{self.bucket_name}.s3.{settings.aws_region}.amazonaws.com/{file_key}"
-            
-            return {
-                "upload_url": presigned_url,
-                "file_key": file_key,
-                "s3_url": s3_url,
-                "content_type": content_type,
-                "file_extension": file_extension
-            }
-            
         except ClientError as e:
             raise Exception(f"S3 error: {str(e)}")
-        except Exception as e:
-            raise Exception(f"Error generating upload URL: {str(e)}")
-    
+
+        with self._download_urls_lock:
+            self._download_urls[file_key] = (url, now + expiry * 0.75)
+            self._download_urls.move_to_end(file_key)
+            while len(self._download_urls) > DOWNLOAD_URL_CACHE_SIZE:
+                self._download_urls.popitem(last=False)
+        return url
+
+    def _multipart_part_size(self, file_size: Optional[int]) -> int:
+        """Configured part size, grown in whole MiB so the file fits in S3's part limit"""
+        part_size = max(settings.multipart_part_size_mb * MIB, MULTIPART_MIN_PART_SIZE)
+        if file_size and math.ceil(file_size / part_size) > MULTIPART_MAX_PARTS:
+            part_size = math.ceil(file_size / MULTIPART_MAX_PARTS / MIB) * MIB
+        return part_size
+
+    def create_multipart_upload(self, filename: str, file_size: Optional[int] = None) -> dict:
+        """
+        Start a multipart upload for a paper. The client then asks for part URLs,
+        PUTs the parts (in parallel, retrying any that fail) and completes it.
+        """
+        file_key, content_type, file_extension = self._new_paper_key(filename)
+        if file_size is not None and not 0 < file_size <= MULTIPART_MAX_OBJECT_SIZE:
+            raise ValueError("file_size must be between 1 byte and 5 TiB")
+
+        part_size = self._multipart_part_size(file_size)
+        try:
+            response = self.s3_client.create_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=file_key,
+                ContentType=content_type
+            )
+        except ClientError as e:
+            raise Exception(f"S3 error starting multipart upload: {str(e)}")
+
+        return {
+            "upload_id": response['UploadId'],
+            "file_key": file_key,
+            "s3_url": self._s3_url(file_key),
+            "content_type": content_type,
+            "file_extension": file_extension,
+            "part_size": part_size,
+            "part_count": math.ceil(file_size / part_size) if file_size else None
+        }
+
+    def generate_part_upload_urls(self, file_key: str, upload_id: str, part_numbers: List[int]) -> List[dict]:
+        """
+        Pre-sign PUT URLs for several parts of a multipart upload in one call.
+        Signing is local (no request to S3), so this only costs CPU.
+        """
+        if not part_numbers:
+            raise ValueError("At least one part number is required")
+        if len(part_numbers) > settings.multipart_max_presign_parts:
+            raise ValueError(f"At most {settings.multipart_max_presign_parts} parts can be signed per request")
+        if len(set(part_numbers)) != len(part_numbers):
+            raise ValueError("Part numbers must be unique")
+        if any(not 1 <= n <= MULTIPART_MAX_PARTS for n in part_numbers):
+            raise ValueError(f"Part numbers must be between 1 and {MULTIPART_MAX_PARTS}")
+
+        try:
+            return [
+                {
+                    "part_number": part_number,
+                    "upload_url": self.s3_client.generate_presigned_url(
+                        'upload_part',
+                        Params={
+                            'Bucket': self.bucket_name,
+                            'Key': file_key,
+                            'UploadId': upload_id,
+                            'PartNumber': part_number
+                        },
+                        ExpiresIn=settings.multipart_url_expiry
+                    )
+                }
+                for part_number in part_numbers
+            ]
+        except ClientError as e:
+            raise Exception(f"S3 error signing upload parts: {str(e)}")
+
+    def list_uploaded_parts(self, file_key: str, upload_id: str) -> List[dict]:
+        """Parts S3 already has for an upload, so an interrupted client can resume"""
+        parts = []
+        try:
+            paginator = self.s3_client.get_paginator('list_parts')
+            for page in paginator.paginate(Bucket=self.bucket_name, Key=file_key, UploadId=upload_id):
+                parts.extend(
+                    {"part_number": p['PartNumber'], "etag": p['ETag'], "size": p['Size']}
+                    for p in page.get('Parts', [])
+                )
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'NoSuchUpload':
+                raise ValueError("Multipart upload not found; it may have been completed or aborted")
+            raise Exception(f"S3 error listing upload parts: {str(e)}")
+        return parts
+
+    def complete_multipart_upload(self, file_key: str, upload_id: str, parts: List[dict]) -> dict:
+        """
+        Assemble the uploaded parts into the final object. `parts` holds the
+        part_number and etag returned by each part PUT.
+        """
+        if not parts:
+            raise ValueError("At least one part is required")
+        ordered = sorted(parts, key=lambda p: p['part_number'])
+        try:
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=file_key,
+                UploadId=upload_id,
+                MultipartUpload={
+                    'Parts': [{'PartNumber': p['part_number'], 'ETag': p['etag']} for p in ordered]
+                }
+            )
+        except ClientError as e:
+            code = e.response['Error']['Code']
+            if code == 'NoSuchUpload':
+                raise ValueError("Multipart upload not found; it may have been completed or aborted")
+            if code in ('InvalidPart', 'InvalidPartOrder', 'EntityTooSmall'):
+                raise ValueError(f"Invalid parts: {e.response['Error'].get('Message', code)}")
+            raise Exception(f"S3 error completing multipart upload: {str(e)}")
+
+        return {"file_key": file_key, "s3_url": self._s3_url(file_key)}
+
+    def abort_multipart_upload(self, file_key: str, upload_id: str) -> bool:
+        """
+        Abort an upload and free its stored parts. Returns False if the upload
+        no longer exists (already completed or aborted).
+        """
+        try:
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket_name, Key=file_key, UploadId=upload_id)
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'NoSuchUpload':
+                return False
+            raise Exception(f"S3 error aborting multipart upload: {str(e)}")
+
     def delete_file(self, file_key: str) -> bool:
         """
         Delete a file from S3
@@ -97,65 +381,108 @@ class S3Service:
         """
         Check if a file exists in S3
         """
+        return self.head_file(file_key) is not None
+
+    def head_file(self, file_key: str) -> Optional[dict]:
+        """
+        HEAD an object. Returns its size, ETag, content type and last-modified
+        time, or None if it does not exist.
+        """
         try:
-            self.s3_client.head_object(Bucket=self.bucket_name, Key=file_key)
-            return True
+            response = self.s3_client.head_object(Bucket=self.bucket_name, Key=file_key)
         except ClientError as e:
-            if e.response['Error']['Code'] == '404':
-                return False
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                return None
             raise Exception(f"Error checking file existence: {str(e)}")
+        return {
+            "size": response['ContentLength'],
+            "etag": response.get('ETag', '').strip('"'),
+            "content_type": response.get('ContentType'),
+            "last_modified": response.get('LastModified'),
+        }
+
+    def download_to(self, file_key: str, fileobj, chunk_size: int = 1024 * 1024, on_chunk=None) -> int:
+        """
+        Stream an object into `fileobj` chunk by chunk, so memory use does not
+        depend on the object size. `on_chunk` sees every chunk (e.g. to hash
+        it). Returns the number of bytes written.
+        """
+        try:
+            body = self.s3_client.get_object(Bucket=self.bucket_name, Key=file_key)['Body']
+        except ClientError as e:
+            raise Exception(f"Error downloading file from S3: {str(e)}")
+        written = 0
+        try:
+            for chunk in body.iter_chunks(chunk_size):
+                if on_chunk:
+                    on_chunk(chunk)
+                fileobj.write(chunk)
+                written += len(chunk)
+        finally:
+            body.close()
+        return written
+
+    def key_from_url(self, url: str) -> Optional[str]:
+        """
+        The object key for an S3 URL in our bucket (virtual-hosted or path
+        style), or None if the URL points elsewhere.
+        """
+        return key_from_url(url, self.bucket_name)
+
+    def upload_thumbnail(self, image_bytes: bytes, submission_id: int) -> str:
+        """
+        Upload a submission's first-page thumbnail. The key only depends on
+        the submission, so reprocessing overwrites instead of adding objects.
+        """
+        file_key = f"thumbnails/submissions/{submission_id}.jpg"
+        try:
+            self.s3_client.put_object(
+                Bucket=self.bucket_name,
+                Key=file_key,
+                Body=image_bytes,
+                ContentType='image/jpeg',
+                CacheControl='max-age=86400'
+            )
+        except ClientError as e:
+            raise Exception(f"S3 error uploading thumbnail: {str(e)}")
+        return self._s3_url(file_key)
     
-    def upload_avatar(self, file_content: bytes, filename: str, user_id: str) -> str:
+    def upload_avatar_variant(self, file_content: bytes, user_id: str, avatar_id: str, size: int, fmt: str) -> str:
         """
-        Upload avatar image directly to S3
-        Returns the S3 URL of the uploaded avatar
+        Upload one size/format of an avatar. All variants of an upload share
+        the avatars/{user_id}/{avatar_id}/ prefix. Returns the S3 URL.
         """
-        file_extension = self._get_file_extension(filename)
-        
-        # Validate file extension for avatars
-        if file_extension not in ['jpg', 'jpeg', 'png', 'gif', 'webp']:
-            raise ValueError("Only image files (jpg, jpeg, png, gif, webp) are supported for avatars")
-        
+        file_key = f"avatars/{user_id}/{avatar_id}/{size}.{fmt}"
         try:
-            # Generate unique file key with user ID prefix for organization
-            file_uuid = str(uuid.uuid4())
-            file_key = f"avatars/{user_id}/{file_uuid}.{file_extension}"
-            
-            # Get appropriate content type
-            content_type = self._get_content_type(file_extension)
-            
-            # Upload directly to S3
             self.s3_client.put_object(
                 Bucket=self.bucket_name,
                 Key=file_key,
                 Body=file_content,
-                ContentType=content_type,
-                # Set cache control for avatars
-                CacheControl='max-age=31536000'
+                ContentType=self._get_content_type(fmt),
+                # Keys are never reused, so avatars can be cached forever
+                CacheControl='public, max-age=31536000, immutable'
             )
-            
-            # Construct the final S3 URL
-            s3_url = f"https://{self.bucket_name}.s3.{settings.aws_region}.amazonaws.com/{file_key}"
-            
-            return s3_url
-            
+            return self._s3_url(file_key)
         except ClientError as e:
             raise Exception(f"S3 error uploading avatar: {str(e)}")
-        except Exception as e:
-            raise Exception(f"Error uploading avatar: {str(e)}")
-    
-    def delete_avatar(self, avatar_url: str) -> bool:
+
+    def delete_files(self, file_keys: List[str]) -> List[str]:
         """
-        Delete an avatar from S3 based on its URL
+        Delete several objects with one DeleteObjects request per 1000 keys.
+        Returns the keys that could not be deleted.
         """
-        try:
-            # Extract file key from S3 URL
-            if f"{self.bucket_name}.s3" in avatar_url:
-                file_key = avatar_url.split(f"{self.bucket_name}.s3.{settings.aws_region}.amazonaws.com/")[-1]
-                return self.delete_file(file_key)
-            return False
-        except Exception as e:
-            raise Exception(f"Error deleting avatar: {str(e)}")
+        failed = []
+        for start in range(0, len(file_keys), 1000):
+            batch = file_keys[start:start + 1000]
+            try:
+                response = self.s3_client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+                )
+            except ClientError as e:
+                raise Exception(f"Error deleting files from S3: {str(e)}")
+            failed.extend(error['Key'] for error in response.get('Errors', []))
+        return failed
 
 # Create a singleton instance
 s3_service = S3Service() 
\ No newline at end of file
@@ -0,0 +1,124 @@
+"""
+Full-text indexing of submission files for /api/search.
+
+Creating a submission or a new version queues an `index_text` job (see
+app/crud.py), so only that version is (re)indexed. A pipeline worker
+(app/services/upload_pipeline.py) then:
+
+1. streams the object from S3 to a temporary file in 1 MiB chunks;
+2. extracts the text page by page in a process pool (`text_executor`), so
+   pdfium's CPU work neither holds the worker's GIL nor touches the event
+   loop, and stops once SEARCH_MAX_TEXT_CHARS characters were collected.
+   A file that takes longer than SEARCH_EXTRACT_TIMEOUT gets its process
+   killed (the pool is recycled) and the job is retried;
+3. upserts submission_texts with a weighted tsvector of title (A),
+   abstract (B) and body (C), computed by Postgres in the same statement.
+
+LaTeX sources are indexed as plain text. Other files only get their title and
+abstract indexed.
+"""
+import logging
+import tempfile
+from concurrent.futures import BrokenExecutor
+from typing import Dict
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+from app.executors import text_executor
+from app.services.upload_pipeline import DOWNLOAD_CHUNK_SIZE, ClaimedJob, resolve_object
+
+logger = logging.getLogger(__name__)
+
+TEXT_EXTENSIONS = (".tex",)
+
+
+def extract_text(path: str, max_chars: int) -> Dict:
+    """
+    Text of a PDF, page by page until `max_chars` is reached. Runs in a
+    separate process; pdfium only loads the pages it reads.
+    """
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(path)
+    parts, size, pages = [], 0, 0
+    try:
+        for index in range(len(pdf)):
+            page = pdf[index]
+            try:
+                textpage = page.get_textpage()
+                try:
+                    page_text = textpage.get_text_bounded()
+                finally:
+                    textpage.close()
+            finally:
+                page.close()
+            pages += 1
+            parts.append(page_text)
+            size += len(page_text)
+            if size >= max_chars:
+                break
+        truncated = size > max_chars or pages < len(pdf)
+    finally:
+        pdf.close()
+    return {"body": _clean("\n".join(parts))[:max_chars], "truncated": truncated, "pages": pages}
+
+
+def _clean(value: str) -> str:
+    # Postgres text can't hold NUL; pdfium emits \r\n and form feeds
+    return value.replace("\x00", "").replace("\r\n", "\n").replace("\x0c", "\n")
+
+
+def _read_text_file(path: str, max_chars: int) -> Dict:
+    with open(path, encoding="utf-8", errors="replace") as f:
+        body = f.read(max_chars + 1)
+    return {"body": _clean(body[:max_chars]), "truncated": len(body) > max_chars, "pages": None}
+
+
+_upsert_text = text("""
+    INSERT INTO submission_texts (submission_id, body, truncated, pages_indexed, search_vector, indexed_at)
+    SELECT s.id, :body, :truncated, :pages,
+           setweight(to_tsvector('english', coalesce(s.title, '')), 'A')
+           || setweight(to_tsvector('english', coalesce(s.abstract, '')), 'B')
+           || setweight(to_tsvector('english', :body), 'C'),
+           now()
+    FROM submissions s WHERE s.id = :submission_id
+    ON CONFLICT (submission_id) DO UPDATE SET
+        body = EXCLUDED.body, truncated = EXCLUDED.truncated, pages_indexed = EXCLUDED.pages_indexed,
+        search_vector = EXCLUDED.search_vector, indexed_at = EXCLUDED.indexed_at
+""")
+
+
+def read_submission_text(s3_service, job: ClaimedJob, max_chars: int) -> Dict:
+    """Download the job's file and extract its text (empty for unsupported types)"""
+    file_key, _ = resolve_object(s3_service, job)
+    lower_key = file_key.lower()
+    if not lower_key.endswith(".pdf") and not lower_key.endswith(TEXT_EXTENSIONS):
+        return {"body": "", "truncated": False, "pages": None}
+
+    with tempfile.NamedTemporaryFile(suffix=".upload") as tmp:
+        s3_service.download_to(file_key, tmp, DOWNLOAD_CHUNK_SIZE)
+        tmp.flush()
+        if lower_key.endswith(TEXT_EXTENSIONS):
+            return _read_text_file(tmp.name, max_chars)
+        try:
+            return text_executor.call(extract_text, tmp.name, max_chars, timeout=settings.search_extract_timeout)
+        except (TimeoutError, BrokenExecutor):
+            # The pool was recycled, so the file no longer holds a process; retried later by the pipeline
+            raise
+        except Exception as e:
+            # Unreadable PDFs are still searchable by title and abstract
+            logger.warning(f"Could not extract text from {file_key} of submission {job.submission_id}: {e}")
+            return {"body": "", "truncated": False, "pages": None}
+
+
+def index_submission_text(engine: Engine, s3_service, job: ClaimedJob) -> Dict:
+    """Pipeline handler for `index_text` jobs. Stores nothing on the submission itself."""
+    extracted = read_submission_text(s3_service, job, settings.search_max_text_chars)
+    with engine.begin() as connection:
+        connection.execute(_upsert_text, {
+            "submission_id": job.submission_id, "body": extracted["body"],
+            "truncated": extracted["truncated"], "pages": extracted["pages"],
+        })
+    return {}
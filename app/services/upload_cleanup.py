@@ -0,0 +1,246 @@
+"""
+Cleanup of abandoned uploads.
+
+Parts of a multipart upload that is never completed or aborted stay in the
+bucket (and are billed) until they are removed. Two layers take care of that:
+
+- a bucket lifecycle rule (AbortIncompleteMultipartUpload) that S3 applies on
+  its own, installed with --configure-lifecycle;
+- a sweep that lists in-progress uploads and aborts the stale ones, for
+  buckets (or local S3 stand-ins) where lifecycle rules are not available.
+
+Completed uploads that never became a submission (presigned URLs are handed
+out freely) are removed by the orphan collector (--orphans). It streams the
+bucket listing page by page, checks each page's keys against the database
+in a few indexed queries and deletes the unreferenced objects older than a
+grace period with one DeleteObjects call per page, so memory stays bounded
+whatever the bucket size. Only keys this application creates are considered:
+
+- papers: `{uuid}_{filename}` at the bucket root, referenced by
+  submissions.s3_key (the key of s3_url, so any spelling of the URL counts;
+  rows without one are resolved from s3_url, erring on keeping the file);
+- avatars: `avatars/...`, referenced by user_profiles.avatar_url or
+  avatar_variants;
+- thumbnails: `thumbnails/submissions/{id}.jpg`, referenced by the submission.
+
+Anything else (e.g. review archives) is never touched.
+
+Run it periodically (e.g. a daily scheduled ECS task):
+    python -m app.services.upload_cleanup [--configure-lifecycle] [--dry-run]
+    python -m app.services.upload_cleanup --orphans [--grace-days 7] [--dry-run]
+"""
+import argparse
+import json
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set
+from urllib.parse import quote
+
+from botocore.exceptions import ClientError
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+from app.services.s3_service import THUMBNAIL_KEY, key_kind
+
+logger = logging.getLogger(__name__)
+
+LIFECYCLE_RULE_ID = "abort-incomplete-multipart-uploads"
+
+
+def configure_multipart_lifecycle(s3_service, days: int) -> dict:
+    """
+    Install (or update) the lifecycle rule that aborts uploads left incomplete
+    for `days` days. Other rules on the bucket are kept as they are.
+    """
+    client = s3_service.s3_client
+    try:
+        rules = client.get_bucket_lifecycle_configuration(Bucket=s3_service.bucket_name)['Rules']
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'NoSuchLifecycleConfiguration':
+            raise
+        rules = []
+
+    rule = {
+        'ID': LIFECYCLE_RULE_ID,
+        'Status': 'Enabled',
+        'Filter': {'Prefix': ''},
+        'AbortIncompleteMultipartUpload': {'DaysAfterInitiation': days},
+    }
+    rules = [r for r in rules if r.get('ID') != LIFECYCLE_RULE_ID] + [rule]
+    client.put_bucket_lifecycle_configuration(
+        Bucket=s3_service.bucket_name, LifecycleConfiguration={'Rules': rules}
+    )
+    logger.info(f"Multipart uploads on {s3_service.bucket_name} are aborted after {days} day(s)")
+    return rule
+
+
+def abort_stale_multipart_uploads(s3_service, max_age: timedelta, dry_run: bool = False,
+                                  now: Optional[datetime] = None) -> List[dict]:
+    """Abort uploads initiated more than `max_age` ago. Returns the stale uploads found."""
+    cutoff = (now or datetime.now(timezone.utc)) - max_age
+    stale = []
+    paginator = s3_service.s3_client.get_paginator('list_multipart_uploads')
+    for page in paginator.paginate(Bucket=s3_service.bucket_name):
+        for upload in page.get('Uploads', []):
+            if upload['Initiated'] < cutoff:
+                stale.append({"file_key": upload['Key'], "upload_id": upload['UploadId'],
+                              "initiated": upload['Initiated']})
+
+    for upload in stale:
+        if dry_run:
+            logger.info(f"[dry-run] Would abort multipart upload of {upload['file_key']} "
+                        f"started {upload['initiated'].isoformat()}")
+            continue
+        try:
+            s3_service.abort_multipart_upload(upload['file_key'], upload['upload_id'])
+        except Exception as e:
+            logger.error(f"Failed to abort multipart upload of {upload['file_key']}: {e}")
+    logger.info(f"{len(stale)} stale multipart upload(s) {'found' if dry_run else 'aborted'}")
+    return stale
+
+
+_AVATAR_VARIANT_KEY = re.compile(r"^avatars/[^/]+/[^/]+/(\d+)\.(webp|jpeg)$")
+
+
+def _url_forms(s3_service, key: str) -> List[str]:
+    """The URL spellings a reference to `key` may have been stored with"""
+    bucket, region = s3_service.bucket_name, settings.aws_region
+    urls = []
+    for path in dict.fromkeys((key, quote(key, safe="/"))):
+        urls += [
+            f"https://{bucket}.s3.{region}.amazonaws.com/{path}",
+            f"https://{bucket}.s3.amazonaws.com/{path}",
+            f"https://s3.{region}.amazonaws.com/{bucket}/{path}",
+        ]
+    return urls
+
+
+def referenced_keys(connection, s3_service, keys: List[str]) -> Set[str]:
+    """
+    The subset of `keys` still used by a submission or profile. One indexed
+    query per kind of key, whatever the number of keys.
+    """
+    by_kind: Dict[str, List[str]] = {"paper": [], "avatar": [], "thumbnail": []}
+    for key in keys:
+        by_kind[key_kind(key)].append(key)
+    referenced = set()
+
+    def match_urls(sql: str, kind_keys: List[str]) -> None:
+        url_to_key = {url: key for key in kind_keys for url in _url_forms(s3_service, key)}
+        if url_to_key:
+            rows = connection.execute(text(sql), {"urls": list(url_to_key)}).scalars()
+            referenced.update(url_to_key[url] for url in rows)
+
+    papers = set(by_kind["paper"])
+    if papers:
+        rows = connection.execute(text("SELECT DISTINCT s3_key FROM submissions WHERE s3_key = ANY(:keys)"),
+                                  {"keys": list(papers)}).scalars()
+        referenced.update(rows)
+        # Rows stored before s3_key existed, or by an older release during a
+        # deploy; URLs outside the bucket stay NULL, so this stays small
+        rows = connection.execute(text("SELECT s3_url FROM submissions WHERE s3_key IS NULL")).scalars()
+        referenced.update(papers.intersection(map(s3_service.key_from_url, rows)))
+    match_urls("SELECT DISTINCT avatar_url FROM user_profiles WHERE avatar_url = ANY(:urls)", by_kind["avatar"])
+
+    # Size variants are matched by containment, which the GIN index on
+    # avatar_variants answers without a scan
+    docs = {}
+    for key in by_kind["avatar"]:
+        variant = _AVATAR_VARIANT_KEY.match(key)
+        if variant and key not in referenced:
+            size, fmt = variant.groups()
+            for url in _url_forms(s3_service, key):
+                docs[json.dumps({fmt: {size: url}})] = key
+    if docs:
+        rows = connection.execute(text("""
+            SELECT doc FROM unnest(CAST(:docs AS text[])) AS doc
+            WHERE EXISTS (SELECT 1 FROM user_profiles WHERE avatar_variants @> CAST(doc AS jsonb))
+        """), {"docs": list(docs)}).scalars()
+        referenced.update(docs[doc] for doc in rows)
+
+    ids = {int(THUMBNAIL_KEY.match(key).group(1)): key for key in by_kind["thumbnail"]}
+    if ids:
+        rows = connection.execute(text("SELECT id FROM submissions WHERE id = ANY(:ids)"), {"ids": list(ids)}).scalars()
+        referenced.update(ids[submission_id] for submission_id in rows)
+    return referenced
+
+
+def collect_orphaned_objects(engine: Engine, s3_service, grace: timedelta, dry_run: bool = False,
+                             now: Optional[datetime] = None, page_size: int = 1000) -> Dict[str, int]:
+    """
+    Delete objects this application created that nothing references any
+    more and that are older than `grace`. Returns counters for the run.
+    """
+    cutoff = (now or datetime.now(timezone.utc)) - grace
+    stats = {"scanned": 0, "recent": 0, "unmanaged": 0, "referenced": 0,
+             "orphaned": 0, "orphaned_bytes": 0, "deleted": 0, "failed": 0}
+    paginator = s3_service.s3_client.get_paginator('list_objects_v2')
+    pages = paginator.paginate(Bucket=s3_service.bucket_name, PaginationConfig={'PageSize': page_size})
+    for page in pages:
+        candidates = {}
+        for obj in page.get('Contents', []):
+            stats["scanned"] += 1
+            if key_kind(obj['Key']) is None:
+                stats["unmanaged"] += 1
+            elif obj['LastModified'] >= cutoff:
+                stats["recent"] += 1
+            else:
+                candidates[obj['Key']] = obj['Size']
+        if not candidates:
+            continue
+
+        with engine.connect() as connection:
+            referenced = referenced_keys(connection, s3_service, list(candidates))
+        stats["referenced"] += len(referenced)
+        orphans = [key for key in candidates if key not in referenced]
+        stats["orphaned"] += len(orphans)
+        stats["orphaned_bytes"] += sum(candidates[key] for key in orphans)
+        if not orphans:
+            continue
+
+        if dry_run:
+            for key in orphans:
+                logger.info(f"[dry-run] Would delete orphaned {key} ({candidates[key]} bytes)")
+            continue
+        try:
+            failed = s3_service.delete_files(orphans)
+        except Exception as e:
+            # Left for the next run
+            logger.error(f"Failed to delete {len(orphans)} orphaned object(s): {e}")
+            failed = orphans
+        stats["failed"] += len(failed)
+        stats["deleted"] += len(orphans) - len(failed)
+
+    logger.info(f"Orphaned objects {'found' if dry_run else 'collected'}: {stats}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clean up abandoned multipart uploads and orphaned objects")
+    parser.add_argument("--abort-after-days", type=int, default=settings.multipart_abort_after_days)
+    parser.add_argument("--configure-lifecycle", action="store_true",
+                        help="install the bucket lifecycle rule instead of sweeping")
+    parser.add_argument("--orphans", action="store_true",
+                        help="delete objects no submission or profile references, instead of multipart uploads")
+    parser.add_argument("--grace-days", type=float, default=settings.orphan_grace_days,
+                        help="never delete orphans younger than this")
+    parser.add_argument("--dry-run", action="store_true", help="list what would be removed without removing it")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from app.services.s3_service import s3_service
+
+    if args.orphans:
+        from app.database import engine
+        collect_orphaned_objects(engine, s3_service, timedelta(days=args.grace_days), dry_run=args.dry_run)
+    elif args.configure_lifecycle:
+        configure_multipart_lifecycle(s3_service, args.abort_after_days)
+    else:
+        abort_stale_multipart_uploads(s3_service, timedelta(days=args.abort_after_days), dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+"""
+Post-upload processing for submissions.
+
+Creating a submission (or a new version) queues a `process_upload` row in
+submission_jobs in the same transaction. Workers claim due jobs with
+FOR UPDATE SKIP LOCKED, so any number of them (in the API processes or a
+separate one) can run side by side. For each job a worker:
+
+1. HEADs the object behind s3_url;
+2. streams it to a temporary file while computing its SHA-256;
+3. for PDFs, reads the page count and renders a first-page thumbnail in a
+   process pool (`pdf_executor`): pdfium is not thread-safe, and a PDF that
+   crashes or hangs it then only costs a pool process, not the API process;
+4. writes the results to the submission, records the hash in file_blobs
+   (pointing the submission at an existing copy of the same bytes, if any,
+   and queueing the duplicate for deletion) and marks the job done, in one
+   transaction.
+
+Every step can be repeated safely (the thumbnail key depends only on the
+submission), so a job that is retried or reclaimed after a crash just runs
+again. Failures are retried with exponential backoff up to
+PIPELINE_MAX_ATTEMPTS. A job left `running` longer than the lease is treated
+as abandoned and claimed again.
+
+Other job kinds (`index_text`, see app/services/text_index.py) go through the
+same queue with their own handler.
+
+Run it as its own process:
+    python -m app.services.upload_pipeline [--kind index_text] [--once]
+or in the API process with PIPELINE_IN_PROCESS=True (see app/main.py).
+"""
+import argparse
+import functools
+import hashlib
+import io
+import logging
+import tempfile
+import threading
+from concurrent.futures import BrokenExecutor, ThreadPoolExecutor
+from datetime import timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql import func
+
+from app.config import settings
+from app.crud import JOB_INDEX_TEXT, JOB_PROCESS_UPLOAD, SUBMISSION_JOB_KINDS
+from app.executors import pdf_executor
+from app.metrics import registry
+from app.models import Submission, SubmissionJob
+
+logger = logging.getLogger(__name__)
+
+pipeline_jobs_total = registry.counter(
+    "aixiv_pipeline_jobs_total", "Submission jobs processed, by kind and outcome (done, retry, failed)",
+    ("kind", "outcome"),
+)
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class ClaimedJob(NamedTuple):
+    id: int
+    submission_id: int
+    kind: str
+    attempts: int
+    s3_url: str
+
+
+class PermanentJobError(Exception):
+    """The job can never succeed (e.g. the URL is not in our bucket); don't retry"""
+
+
+class ObjectMissing(Exception):
+    """The uploaded object is not (yet) in S3"""
+
+
+def claim_jobs(engine: Engine, kind: str, limit: int, lease_seconds: int) -> List[ClaimedJob]:
+    """
+    Lock up to `limit` due jobs of `kind` and mark them running. Jobs locked
+    by another worker are skipped rather than waited for.
+    """
+    with engine.begin() as connection:
+        rows = connection.execute(text("""
+            UPDATE submission_jobs j
+            SET status = 'running', attempts = j.attempts + 1, locked_at = now(), updated_at = now()
+            FROM submissions s
+            WHERE s.id = j.submission_id AND j.id IN (
+                SELECT id FROM submission_jobs
+                WHERE kind = :kind AND (
+                    (status = 'pending' AND run_after <= now())
+                    OR (status = 'running' AND locked_at < now() - make_interval(secs => :lease))
+                )
+                ORDER BY run_after
+                LIMIT :limit
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING j.id, j.submission_id, j.kind, j.attempts, s.s3_url
+        """), {"kind": kind, "limit": limit, "lease": lease_seconds}).all()
+    return [ClaimedJob(*row) for row in rows]
+
+
+def complete_job(engine: Engine, job: ClaimedJob, submission_values: Optional[Dict] = None, s3_service=None) -> None:
+    """Store the results on the submission and mark the job done, atomically"""
+    jobs = SubmissionJob.__table__
+    with engine.begin() as connection:
+        if submission_values and submission_values.get("file_sha256"):
+            submission_values = dict(submission_values, **register_file_blob(connection, job, submission_values, s3_service))
+        if submission_values:
+            connection.execute(
+                update(Submission.__table__).where(Submission.id == job.submission_id).values(**submission_values)
+            )
+        connection.execute(
+            update(jobs).where(jobs.c.id == job.id)
+            .values(status="done", locked_at=None, last_error=None, updated_at=func.now())
+        )
+    pipeline_jobs_total.inc(kind=job.kind, outcome="done")
+
+
+def register_file_blob(connection, job: ClaimedJob, values: Dict, s3_service=None) -> Dict:
+    """
+    Record the hash of a freshly processed upload in file_blobs. If the same
+    bytes are already stored under another URL, the submission is pointed at
+    that object instead, and the duplicate is queued for deletion unless
+    another submission still uses it. Returns the submission columns to change.
+    """
+    inserted = connection.execute(text("""
+        INSERT INTO file_blobs (sha256, s3_url, size, ref_count) VALUES (:sha256, :s3_url, :size, 1)
+        ON CONFLICT DO NOTHING
+        RETURNING sha256
+    """), {"sha256": values["file_sha256"], "s3_url": job.s3_url, "size": values["file_size"]}).first()
+    if inserted:
+        return {}
+
+    canonical = connection.execute(text("""
+        SELECT s3_url FROM file_blobs WHERE sha256 = :sha256 FOR UPDATE
+    """), {"sha256": values["file_sha256"]}).scalar()
+    if canonical is None or canonical == job.s3_url:
+        # Already counted when the submission was created with this URL, or
+        # the URL belongs to a blob with different bytes (it was overwritten)
+        return {}
+    connection.execute(text("""
+        UPDATE file_blobs SET ref_count = ref_count + 1, updated_at = now() WHERE sha256 = :sha256
+    """), {"sha256": values["file_sha256"]})
+
+    duplicate_key = s3_service.key_from_url(job.s3_url) if s3_service is not None else None
+    if duplicate_key:
+        connection.execute(text("""
+            INSERT INTO s3_deletions (s3_key, reason)
+            SELECT :key, 'duplicate_upload'
+            WHERE NOT EXISTS (SELECT 1 FROM submissions WHERE s3_key = :key AND id <> :submission_id)
+            ON CONFLICT (s3_key) DO NOTHING
+        """), {"key": duplicate_key, "submission_id": job.submission_id})
+    logger.info(f"Submission {job.submission_id}: {job.s3_url} duplicates {canonical}, deduplicated")
+    if s3_service is None:
+        return {"s3_url": canonical}
+    return {"s3_url": canonical, "s3_key": s3_service.key_from_url(canonical)}
+
+
+def fail_job(engine: Engine, job: ClaimedJob, error: Exception, max_attempts: int, retry_base_seconds: float) -> str:
+    """Schedule a retry with exponential backoff, or give up. Returns the new status."""
+    permanent = isinstance(error, PermanentJobError)
+    status = "failed" if permanent or job.attempts >= max_attempts else "pending"
+    delay = retry_base_seconds * 2 ** (job.attempts - 1)
+    jobs = SubmissionJob.__table__
+    with engine.begin() as connection:
+        connection.execute(
+            update(jobs).where(jobs.c.id == job.id).values(
+                status=status,
+                locked_at=None,
+                last_error=f"{type(error).__name__}: {error}"[:2000],
+                run_after=func.now() + timedelta(seconds=delay),
+                updated_at=func.now(),
+            )
+        )
+    pipeline_jobs_total.inc(kind=job.kind, outcome="retry" if status == "pending" else "failed")
+    return status
+
+
+def inspect_pdf(path: str, thumbnail_width: int) -> Dict:
+    """
+    Page count and a JPEG of the first page scaled to `thumbnail_width`.
+    Runs in a `pdf_executor` process; pdfium only maps the pages it renders,
+    so large files are fine.
+    """
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(path)
+    try:
+        page_count = len(pdf)
+        thumbnail = None
+        if page_count:
+            page = pdf[0]
+            try:
+                scale = thumbnail_width / page.get_width()
+                image = page.render(scale=scale).to_pil().convert("RGB")
+            finally:
+                page.close()
+            output = io.BytesIO()
+            image.save(output, format="JPEG", quality=80, optimize=True)
+            thumbnail = output.getvalue()
+        return {"page_count": page_count, "thumbnail": thumbnail}
+    finally:
+        pdf.close()
+
+
+def resolve_object(s3_service, job: ClaimedJob):
+    """The key and HEAD of the job's file; raises if it can't (yet) be processed"""
+    file_key = s3_service.key_from_url(job.s3_url)
+    if not file_key:
+        raise PermanentJobError(f"{job.s3_url} is not in bucket {s3_service.bucket_name}")
+
+    head = s3_service.head_file(file_key)
+    if head is None:
+        raise ObjectMissing(f"{file_key} does not exist")
+    return file_key, head
+
+
+def process_upload(s3_service, job: ClaimedJob, thumbnail_width: int) -> Dict:
+    """Inspect the uploaded file of one submission. Returns the submission columns to set."""
+    file_key, head = resolve_object(s3_service, job)
+
+    values = {"file_size": head["size"], "processed_at": func.now()}
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(suffix=".upload") as tmp:
+        s3_service.download_to(file_key, tmp, DOWNLOAD_CHUNK_SIZE, on_chunk=digest.update)
+        tmp.flush()
+        values["file_sha256"] = digest.hexdigest()
+
+        if file_key.lower().endswith(".pdf"):
+            try:
+                pdf = pdf_executor.call(inspect_pdf, tmp.name, thumbnail_width, timeout=settings.pipeline_pdf_timeout)
+            except BrokenExecutor:
+                # Possibly another file's crash; retried by the pipeline
+                raise
+            except Exception as e:
+                # A file pdfium can't read still gets its size and checksum
+                logger.warning(f"Could not read PDF {file_key} of submission {job.submission_id}: {e}")
+            else:
+                values["page_count"] = pdf["page_count"]
+                if pdf["thumbnail"]:
+                    values["thumbnail_url"] = s3_service.upload_thumbnail(pdf["thumbnail"], job.submission_id)
+    return values
+
+
+class PipelineWorker:
+    """
+    Claims and runs jobs of one kind with at most `concurrency` at a time.
+    `handler(s3_service, job)` returns the submission columns to store.
+    """
+
+    def __init__(self, engine: Engine, s3_service, kind: str = JOB_PROCESS_UPLOAD,
+                 handler: Optional[Callable] = None, concurrency: Optional[int] = None):
+        self.engine = engine
+        self.s3_service = s3_service
+        self.kind = kind
+        self.handler = handler or (lambda s3, job: process_upload(s3, job, settings.pipeline_thumbnail_width))
+        self.concurrency = concurrency or settings.pipeline_concurrency
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=f"{kind}-worker")
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run_job(self, job: ClaimedJob) -> None:
+        try:
+            values = self.handler(self.s3_service, job)
+        except Exception as e:
+            status = fail_job(self.engine, job, e, settings.pipeline_max_attempts, settings.pipeline_retry_base_seconds)
+            logger.warning(f"{self.kind} job {job.id} for submission {job.submission_id} "
+                           f"(attempt {job.attempts}) -> {status}: {e}")
+            return
+        complete_job(self.engine, job, values, self.s3_service)
+
+    def run_once(self) -> int:
+        """Claim one batch, process it and return the number of jobs run"""
+        jobs = claim_jobs(self.engine, self.kind, self.concurrency, settings.pipeline_lease_seconds)
+        # list() waits for the batch and re-raises unexpected errors (e.g. the DB is down)
+        list(self._pool.map(self._run_job, jobs))
+        return len(jobs)
+
+    def run(self, poll_seconds: Optional[float] = None) -> None:
+        """Process jobs until stop() is called, sleeping while the queue is empty"""
+        poll_seconds = poll_seconds or settings.pipeline_poll_seconds
+        while not self._stop.is_set():
+            try:
+                processed = self.run_once()
+            except Exception as e:
+                logger.error(f"{self.kind} worker iteration failed: {e}")
+                processed = 0
+            if not processed:
+                self._stop.wait(poll_seconds)
+
+    def start(self) -> threading.Thread:
+        """Run the worker on a daemon thread (in-process mode)"""
+        self._thread = threading.Thread(target=self.run, name=f"{self.kind}-pipeline", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout: float = 30) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._pool.shutdown(wait=True)
+
+
+def pipeline_worker(kind: str, engine: Engine, s3_service, concurrency: Optional[int] = None) -> PipelineWorker:
+    """A worker with the default handler for `kind`"""
+    if kind == JOB_INDEX_TEXT:
+        from app.services.text_index import index_submission_text
+        return PipelineWorker(engine, s3_service, kind, functools.partial(index_submission_text, engine),
+                              concurrency=concurrency)
+    return PipelineWorker(engine, s3_service, kind, concurrency=concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process uploaded submission files")
+    parser.add_argument("--kind", choices=SUBMISSION_JOB_KINDS, default=JOB_PROCESS_UPLOAD)
+    parser.add_argument("--once", action="store_true", help="process one batch and exit")
+    parser.add_argument("--concurrency", type=int, default=settings.pipeline_concurrency)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from app.database import engine
+    from app.services.s3_service import s3_service
+
+    worker = pipeline_worker(args.kind, engine, s3_service, concurrency=args.concurrency)
+    try:
+        if args.once:
+            logger.info(f"Processed {worker.run_once()} job(s)")
+        else:
+            worker.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        worker.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Application startup work that used to run at import time.
+
+Everything here is called from the lifespan handler in app/main.py, so importing
+the app never touches the database, S3 or the filesystem. Each phase is timed
+and reported through the log and the /metrics endpoint.
+"""
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Set
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.metrics import registry
+from app.services.review_retention import ensure_partitions
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ALEMBIC_INI = os.path.join(PROJECT_ROOT, "alembic.ini")
+
+startup_seconds = registry.gauge(
+    "aixiv_startup_seconds", "Duration of each startup phase of this worker", ("phase",)
+)
+
+
+class StartupTimer:
+    """Collects per-phase durations for the startup report"""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float) -> None:
+        self.phases[name] = seconds
+        startup_seconds.set(seconds, phase=name)
+
+    def report(self) -> str:
+        return ", ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in self.phases.items())
+
+
+def get_alembic_heads() -> Set[str]:
+    """Revision ids of the Alembic heads shipped with this build"""
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("script_location", os.path.join(PROJECT_ROOT, "alembic"))
+    return set(ScriptDirectory.from_config(config).get_heads())
+
+
+def get_database_revisions(engine: Engine) -> Set[str]:
+    """Revision ids recorded in the database's alembic_version table"""
+    with engine.connect() as connection:
+        return {row[0] for row in connection.execute(text("SELECT version_num FROM alembic_version"))}
+
+
+def check_schema_version(engine: Engine) -> bool:
+    """
+    Compare the database revision with the Alembic head instead of reflecting
+    the schema with create_all. Returns True when they match.
+    """
+    expected = get_alembic_heads()
+    try:
+        current = get_database_revisions(engine)
+    except Exception as e:
+        logger.error(f"Could not read alembic_version: {e}")
+        return False
+
+    if current != expected:
+        logger.error(
+            f"Database schema revision {sorted(current)} does not match Alembic head {sorted(expected)}. "
+            f"Run 'alembic upgrade head'."
+        )
+        return False
+    return True
+
+
+def warm_up_pool(engine: Engine, connections: int) -> int:
+    """
+    Open `connections` pool connections in parallel and return them to the pool,
+    so the first requests don't pay for TCP/TLS/auth. Capped at the pool size.
+    Returns how many opened.
+    """
+    # Asking for more than the pool keeps would make the extra checkouts wait out
+    # pool_timeout, and overflow connections are closed on return anyway
+    if hasattr(engine.pool, "size"):
+        connections = min(connections, engine.pool.size())
+    if connections <= 0:
+        return 0
+
+    def _connect(_):
+        try:
+            return engine.connect()
+        except Exception as e:
+            logger.warning(f"Pool warm-up connection failed: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=connections) as executor:
+        opened = [c for c in executor.map(_connect, range(connections)) if c is not None]
+    for connection in opened:
+        connection.close()
+    return len(opened)
+
+
+def run_startup(engine: Engine, s3_service, timer: Optional[StartupTimer] = None,
+                check_schema: bool = True, pool_warmup: int = 0, strict_schema: bool = False,
+                partitions_ahead: int = 0) -> StartupTimer:
+    """
+    Run the startup phases. The S3 client is built on a worker thread while the
+    database is checked and warmed, since both are mostly waiting on I/O.
+    """
+    timer = timer or StartupTimer()
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        s3_start = time.perf_counter()
+        s3_future = executor.submit(lambda: s3_service.s3_client)
+
+        if check_schema:
+            with timer.phase("schema_check"):
+                matches = check_schema_version(engine)
+            if not matches and strict_schema:
+                raise RuntimeError("Database schema does not match Alembic head")
+
+        if partitions_ahead:
+            # Cheap when partitions exist; keeps inserts out of the default
+            # partition even if the retention job hasn't run lately
+            with timer.phase("review_partitions"):
+                try:
+                    ensure_partitions(engine, partitions_ahead)
+                except Exception as e:
+                    logger.warning(f"Could not create paper_review partitions: {e}")
+
+        with timer.phase("pool_warmup"):
+            opened = warm_up_pool(engine, pool_warmup)
+        if pool_warmup:
+            logger.info(f"Pre-opened {opened}/{pool_warmup} database connections")
+
+        try:
+            s3_future.result()
+        except Exception as e:
+            # The client is created again lazily on first use
+            logger.warning(f"S3 client initialization failed: {e}")
+        timer.record("s3_client", time.perf_counter() - s3_start)
+
+    return timer
@@ -0,0 +1,427 @@
+"""
+Lightweight request tracing.
+
+Every HTTP request gets a trace: its ID comes from an incoming W3C
+`traceparent` header or is generated. It is returned in `X-Trace-Id` and
+passed on to outgoing HTTP calls with `traceparent_header()`. Inside the
+request, spans are opened around:
+
+- the endpoint function (`TracedRoute`). The rest of the request time is
+  validation, dependencies and serialization;
+- public crud functions (`trace_module_functions` at the end of app/crud.py);
+- SQL statements (`instrument_engine_tracing`);
+- S3 API calls (app/s3_instrumentation.py) and executor tasks (app/executors.py).
+
+Whether a trace is recorded is decided once, at its root. A sampled parent
+is followed, and otherwise TRACE_SAMPLE_RATE of requests are sampled.
+Sampled traces go to the exporter named by TRACE_EXPORTER:
+
+- "json" (default): one JSON line per span in TRACE_FILE, written by a
+  background thread;
+- "none";
+- "package.module:Class": any class with export(spans) and shutdown().
+
+Unsampled requests cost a few clock reads per span. Whether sampled or not,
+each response carries a `Server-Timing` breakdown: total app time, the
+endpoint and, per category (crud, s3, ...), the wall-clock time during
+which at least one of its spans was open. Nested spans and concurrent ones
+(e.g. S3 uploads under asyncio.gather) are counted once. It is merged into
+the header QueryStatsMiddleware already set.
+"""
+import asyncio
+import functools
+import importlib
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.routing import request_response
+
+from app.config import settings
+from app.db_instrumentation import route_template
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+_INVALID_TRACE_ID = "0" * 32
+_INVALID_SPAN_ID = "0" * 16
+
+traces_total = registry.counter(
+    "aixiv_traces_total", "Request traces by sampling decision (sampled, unsampled)", ("decision",)
+)
+spans_dropped_total = registry.counter(
+    "aixiv_trace_spans_dropped_total", "Spans dropped because the export queue was full"
+)
+
+
+def _new_id(nbytes: int) -> str:
+    return f"{random.getrandbits(nbytes * 8):0{nbytes * 2}x}"
+
+
+class Span:
+    """One timed operation of a sampled trace"""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "category", "start", "duration", "attributes", "error")
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], name: str, category: str, attributes: dict):
+        self.trace_id = trace_id
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.category = category
+        self.start = time.time()
+        self.duration = 0.0
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+            "name": self.name, "category": self.category, "start": self.start,
+            "duration_ms": round(self.duration * 1000, 3), "attributes": self.attributes, "error": self.error,
+        }
+
+
+class Trace:
+    """Spans and per-category timings of one request"""
+
+    __slots__ = ("trace_id", "parent_id", "sampled", "spans", "_intervals", "_lock")
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], sampled: bool):
+        self.trace_id = trace_id
+        self.parent_id = parent_id  # the caller's span, from traceparent
+        self.sampled = sampled
+        self.spans: List[Span] = []
+        self._intervals: Dict[str, List[Tuple[float, float]]] = {}  # category -> (start, end) of ended spans
+        self._lock = threading.Lock()  # spans also end on executor threads
+
+    @property
+    def timings(self) -> Dict[str, float]:
+        """Seconds per category covered by at least one of its spans (the union of their intervals)"""
+        with self._lock:
+            intervals = {category: sorted(spans) for category, spans in self._intervals.items()}
+        timings = {}
+        for category, spans in intervals.items():
+            total, (start, end) = 0.0, spans[0]
+            for next_start, next_end in spans[1:]:
+                if next_start > end:
+                    total += end - start
+                    start, end = next_start, next_end
+                else:
+                    end = max(end, next_end)
+            timings[category] = total + end - start
+        return timings
+
+    def server_timing(self, total: float) -> str:
+        entries = [f"app;dur={total * 1000:.1f}"]
+        entries.extend(f"{category};dur={seconds * 1000:.1f}" for category, seconds in self.timings.items())
+        return ", ".join(entries)
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("trace_span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def traceparent_header() -> Optional[str]:
+    """`traceparent` value for an outgoing request made in the current span"""
+    trace = _current_trace.get()
+    if trace is None:
+        return None
+    span = _current_span.get()
+    parent = span.span_id if span is not None else (trace.parent_id or _new_id(8))
+    return f"00-{trace.trace_id}-{parent}-{'01' if trace.sampled else '00'}"
+
+
+def parse_traceparent(header: Optional[str]):
+    """(trace_id, parent_id, sampled) from a version-00 traceparent, or None if absent or malformed"""
+    match = _TRACEPARENT.match(header.strip().lower()) if header else None
+    if not match or match.group(1) == _INVALID_TRACE_ID or match.group(2) == _INVALID_SPAN_ID:
+        return None
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+
+def start_trace(traceparent: Optional[str] = None, sample_rate: Optional[float] = None) -> Trace:
+    parent = parse_traceparent(traceparent)
+    if parent is not None:
+        trace = Trace(*parent)
+    else:
+        rate = settings.trace_sample_rate if sample_rate is None else sample_rate
+        trace = Trace(_new_id(16), None, random.random() < rate)
+    traces_total.inc(decision="sampled" if trace.sampled else "unsampled")
+    return trace
+
+
+@contextmanager
+def use_trace(trace: Trace) -> Iterator[Trace]:
+    """Make `trace` the current trace inside the block, e.g. for a background job"""
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+class SpanHandle:
+    """An open span; call end() exactly once, in the context it was started in"""
+
+    __slots__ = ("trace", "span", "category", "started", "_token")
+
+    def __init__(self, trace: Trace, name: str, category: str, attributes: dict):
+        self.trace = trace
+        self.category = category
+        self.span = None
+        self._token = None
+        if trace.sampled:
+            parent = _current_span.get()
+            self.span = Span(trace.trace_id, parent.span_id if parent is not None else trace.parent_id,
+                             name, category, attributes)
+            self._token = _current_span.set(self.span)
+        self.started = time.perf_counter()
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        ended = time.perf_counter()
+        elapsed = ended - self.started
+        trace = self.trace
+        with trace._lock:
+            trace._intervals.setdefault(self.category, []).append((self.started, ended))
+            if self.span is not None:
+                trace.spans.append(self.span)
+        if self.span is not None:
+            self.span.duration = elapsed
+            if error is not None:
+                self.span.error = f"{type(error).__name__}: {error}"
+            _current_span.reset(self._token)
+
+
+def start_span(name: str, category: str, **attributes) -> Optional[SpanHandle]:
+    """Open a span in the current trace; None (and nothing to end) outside a request"""
+    trace = _current_trace.get()
+    return SpanHandle(trace, name, category, attributes) if trace is not None else None
+
+
+@contextmanager
+def span(name: str, category: str, **attributes) -> Iterator[Optional[SpanHandle]]:
+    handle = start_span(name, category, **attributes)
+    if handle is None:
+        yield None
+        return
+    try:
+        yield handle
+    except BaseException as e:
+        handle.end(e)
+        raise
+    handle.end()
+
+
+def traced(fn: Callable = None, *, category: str = "crud", name: Optional[str] = None) -> Callable:
+    """Decorator: run every call of fn in a span named `category.fn_name`"""
+    if fn is None:
+        return functools.partial(traced, category=category, name=name)
+    span_name = name or f"{category}.{fn.__name__}"
+
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return await fn(*args, **kwargs)
+            with span(span_name, category):
+                return await fn(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if _current_trace.get() is None:
+            return fn(*args, **kwargs)
+        with span(span_name, category):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def trace_module_functions(namespace: dict, module_name: str, category: str) -> None:
+    """
+    Wrap the public functions defined in a module with `traced`. Call it at
+    the end of the module, before other modules import names from it.
+    """
+    for attr, value in list(namespace.items()):
+        if (not attr.startswith("_") and callable(value) and getattr(value, "__module__", None) == module_name
+                and not isinstance(value, type) and not isinstance(value, functools.partial)):
+            namespace[attr] = traced(value, category=category)
+
+
+class TracedRoute(APIRoute):
+    """APIRoute whose endpoint runs in a `handler` span"""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, endpoint, **kwargs)
+        # The dependant was built from the original endpoint; only the call is swapped
+        self.dependant.call = traced(self.dependant.call, category="handler",
+                                     name=f"handler.{getattr(endpoint, '__name__', 'endpoint')}")
+        self.app = request_response(self.get_route_handler())
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = _current_trace.get()
+    if trace is not None and trace.sampled:
+        # Statement text only: parameters can carry user data
+        conn.info.setdefault("trace_spans", []).append(start_span("sql", "sql", statement=statement[:500]))
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    handles = conn.info.get("trace_spans")
+    if handles and _current_trace.get() is handles[-1].trace:
+        handles.pop().end()
+
+
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    handles = connection.info.get("trace_spans") if connection is not None else None
+    if handles and _current_trace.get() is handles[-1].trace:
+        handles.pop().end(exception_context.original_exception)
+
+
+def instrument_engine_tracing(engine: Engine) -> None:
+    """Open a span per SQL statement of sampled traces (idempotent)"""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+class JSONFileExporter:
+    """
+    Appends spans as JSON lines to a file. export() only queues them; a
+    daemon thread does the writing, so requests never wait on the disk.
+    Spans are dropped (and counted) when the queue is full.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_queue: int = 10000):
+        self.path = path or settings.trace_file
+        self._queue: "queue.Queue[Optional[List[dict]]]" = queue.Queue(max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+                    self._thread.start()
+        try:
+            self._queue.put_nowait([span.to_dict() for span in spans])
+        except queue.Full:
+            spans_dropped_total.inc(len(spans))
+
+    def _run(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as out:
+            while True:
+                batch = self._queue.get()
+                if batch is None:
+                    return
+                try:
+                    out.writelines(json.dumps(span, default=str) + "\n" for span in batch)
+                    if self._queue.empty():
+                        out.flush()
+                except Exception as e:
+                    logger.error(f"Failed to write spans to {self.path}: {e}")
+
+    def shutdown(self, timeout: float = 5) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+
+
+class NoopExporter:
+    def export(self, spans: List[Span]) -> None:
+        pass
+
+    def shutdown(self) -> None:
+        pass
+
+
+def load_exporter(spec: Optional[str] = None):
+    """The exporter named by TRACE_EXPORTER: json, none or package.module:Class"""
+    spec = (spec if spec is not None else settings.trace_exporter).strip()
+    if spec in ("", "none"):
+        return NoopExporter()
+    if spec == "json":
+        return JSONFileExporter()
+    module_name, _, class_name = spec.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+exporter = load_exporter()
+
+
+class TracingMiddleware:
+    """
+    Pure ASGI middleware that opens a trace per HTTP request, records its
+    root span, sets `X-Trace-Id` and adds the trace's timings to
+    `Server-Timing`. Add it outside QueryStatsMiddleware so both end up in
+    one header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.tracing:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        trace = start_trace(headers.get(b"traceparent", b"").decode("latin-1"))
+        trace_token = _current_trace.set(trace)
+        root = SpanHandle(trace, "request", "request", {"http.method": scope["method"]})
+        status = 500
+
+        async def send_with_trace(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers = MutableHeaders(scope=message)
+                timing = trace.server_timing(time.perf_counter() - root.started)
+                existing = response_headers.getlist("server-timing")
+                if existing:
+                    del response_headers["server-timing"]
+                response_headers["Server-Timing"] = ", ".join(existing + [timing])
+                response_headers["X-Trace-Id"] = trace.trace_id
+            await send(message)
+
+        error = None
+        try:
+            await self.app(scope, receive, send_with_trace)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            if root.span is not None:
+                route = route_template(scope)
+                root.span.name = f"{scope['method']} {route}"
+                root.span.attributes.update({"http.route": route, "http.status_code": status})
+            root.end(error)
+            _current_trace.reset(trace_token)
+            if trace.sampled:
+                exporter.export(trace.spans)
@@ -0,0 +1,97 @@
+"""
+Benchmark: per-request cost of verifying Clerk session tokens.
+
+Signs tokens with a local JWKS stand-in (tests/jwks_standin.py) and
+compares, in-process and through the ASGI app:
+
+- decoding without checking the signature (what the API used to do),
+- a full RS256 verification on every request (verified-token cache off),
+- the verified-token cache (one verification, then a digest lookup).
+
+Usage:
+    python -m benchmarks.bench_auth --seconds 3
+"""
+import argparse
+import asyncio
+import os
+import time
+from unittest.mock import MagicMock, patch
+
+os.environ.setdefault("TESTING", "true")
+
+import jwt
+from fastapi.security import HTTPAuthorizationCredentials
+from fastapi.testclient import TestClient
+
+from app import auth
+from app.auth import JWKSCache, VerifiedTokenCache
+from app.database import get_db
+from app.main import app
+from tests.jwks_standin import JWKSStandIn
+
+
+def rate(fn, seconds: float) -> float:
+    """Calls per second while calling fn repeatedly for `seconds`"""
+    fn()  # warm up (JWKS download, first verification)
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        fn()
+        calls += 1
+    return calls / (time.perf_counter() - start)
+
+
+class _NoCache(VerifiedTokenCache):
+    def get(self, digest):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=3.0, help="duration of each measurement")
+    args = parser.parse_args()
+
+    standin = JWKSStandIn().start()
+    token = standin.token("bench-user")
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    headers = {"Authorization": f"Bearer {token}"}
+    client = TestClient(app)
+    app.dependency_overrides[get_db] = lambda: MagicMock()
+    loop = asyncio.new_event_loop()
+
+    def unverified():
+        jwt.decode(token, options={"verify_signature": False})
+
+    def dependency():
+        loop.run_until_complete(auth.get_current_user(credentials))
+
+    def http():
+        # 404: the user has no profile, which the patched lookup reports without a database
+        assert client.get("/api/profile/me", headers=headers).status_code == 404
+
+    results = []
+    try:
+        with patch.object(auth, "jwks_cache", JWKSCache([standin.url])), \
+                patch("app.api.profiles.get_profile_by_user_id", return_value=None):
+            for label, fn, cache in (
+                ("decode, no signature check", unverified, None),
+                ("dependency, verify each time", dependency, _NoCache()),
+                ("dependency, cached", dependency, VerifiedTokenCache()),
+                ("HTTP, verify each time", http, _NoCache()),
+                ("HTTP, cached", http, VerifiedTokenCache()),
+            ):
+                with patch.object(auth, "verified_tokens", cache or VerifiedTokenCache()):
+                    results.append((label, rate(fn, args.seconds)))
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        loop.close()
+        standin.stop()
+
+    print(f"{'path':<32}{'requests/s':>12}{'us/request':>12}")
+    for label, per_second in results:
+        print(f"{label:<32}{per_second:>12.0f}{1e6 / per_second:>12.1f}")
+    print(f"JWKS downloads: {standin.requests}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark: peak memory and time of avatar processing per upload.
+
+Each measurement runs in a fresh process (like an image_executor worker) and
+reports how much that process's peak RSS (VmHWM, Linux) grew while
+processing one image.
+Compares the previous approach (full-resolution decode, one 500px JPEG) with
+process_avatar_variants (reduced-scale JPEG decode, 4 sizes x WebP/JPEG).
+
+Usage:
+    python -m benchmarks.bench_avatar_memory
+    python -m benchmarks.bench_avatar_memory --width 6000 --height 4000
+"""
+import argparse
+import io
+import multiprocessing
+import tempfile
+import time
+
+from PIL import Image
+
+from app.services.images import process_avatar_variants
+
+
+def _image(width: int, height: int, fmt: str) -> bytes:
+    buffer = io.BytesIO()
+    Image.effect_noise((width, height), 64).convert("RGB").save(buffer, format=fmt, quality=90)
+    return buffer.getvalue()
+
+
+def _single_size(contents: bytes) -> dict:
+    # Before: decode everything at full resolution, then shrink once
+    image = Image.open(io.BytesIO(contents))
+    image.load()
+    image = image.convert("RGB")
+    image.thumbnail((500, 500), Image.Resampling.LANCZOS)
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=85, optimize=True)
+    return {"jpeg": {500: output.getvalue()}}
+
+
+def _variants(contents: bytes) -> dict:
+    return process_avatar_variants(contents, max_pixels=100_000_000)
+
+
+def _rss_kib(field: str) -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise RuntimeError(f"{field} not in /proc/self/status")
+
+
+def _reset_peak_rss() -> None:
+    # ru_maxrss would include the parent's RSS at fork time; writing 5 to
+    # clear_refs resets VmHWM to the current RSS instead (Linux only)
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+
+
+def _measure(mode: str, path: str, queue) -> None:
+    fn = _variants if mode == "variants" else _single_size
+    with open(path, "rb") as f:
+        contents = f.read()
+    _reset_peak_rss()
+    before = _rss_kib("VmHWM")
+    started = time.perf_counter()
+    result = fn(contents)
+    elapsed = time.perf_counter() - started
+    queue.put((_rss_kib("VmHWM") - before, elapsed, sum(len(data) for sizes in result.values() for data in sizes.values())))
+
+
+def measure(mode: str, path: str):
+    # The upload is read from disk in the child, so passing it in does not
+    # count towards the child's peak
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_measure, args=(mode, path, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    args = parser.parse_args()
+
+    for fmt in ("JPEG", "PNG"):
+        contents = _image(args.width, args.height, fmt)
+        print(f"{fmt} {args.width}x{args.height} ({len(contents) // 1024} KiB upload)")
+        with tempfile.NamedTemporaryFile(suffix=f".{fmt.lower()}") as upload:
+            upload.write(contents)
+            upload.flush()
+            results = [(mode, measure(mode, upload.name)) for mode in ("single", "variants")]
+        for mode, (peak_kib, seconds, output) in results:
+            print(f"  {mode:8s}  peak +{peak_kib / 1024:7.1f} MiB  {seconds * 1000:7.1f} ms  "
+                  f"output {output // 1024} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Micro-benchmark: ORM query path vs. the Core read path in app/crud.py.
+
+Seeds submissions, profiles and reviews inside a transaction that is rolled
+back at the end, then times each hot read including validation into its
+response model. Reports rows/sec and the peak memory allocated per call.
+
+Usage (needs a Postgres reachable through DATABASE_URL):
+    python -m benchmarks.bench_crud_reads --iterations 2000
+"""
+import argparse
+import time
+import tracemalloc
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.database import engine
+from app.models import Submission, UserProfile, PaperReview
+from app.schemas import SubmissionDB, ProfileResponse, Review
+from app.constants import ReviewerConst
+
+AIXIV_ID = "aixiv.991231.000001"
+USER_ID = "bench-user"
+
+
+def seed(db: Session, reviews: int) -> int:
+    submission = Submission(
+        title="Benchmark paper", agent_authors=["Agent"], corresponding_author="Agent",
+        category=["cs.AI"], keywords=["bench"], license="CC-BY-4.0", abstract="x" * 1000,
+        s3_url="https://example.com/bench.pdf", uploaded_by=USER_ID, aixiv_id=AIXIV_ID,
+        version="1.0", doc_type="paper",
+    )
+    db.add(submission)
+    db.add(UserProfile(user_id=USER_ID, name="Bench User", affiliation="Bench Lab"))
+    db.add_all(
+        PaperReview(aixiv_id=AIXIV_ID, version="1.0", review_results={"score": i, "text": "y" * 200})
+        for i in range(reviews)
+    )
+    db.flush()
+    return submission.id
+
+
+def orm_paths(submission_id: int):
+    def get_submission(db):
+        row = db.query(Submission).filter(Submission.id == submission_id).first()
+        return [SubmissionDB.model_validate(row)]
+
+    def get_profile(db):
+        row = db.query(UserProfile).filter(UserProfile.user_id == USER_ID).first()
+        return [ProfileResponse.model_validate(row)]
+
+    def check_if_exist(db):
+        return [db.query(Submission).filter(
+            Submission.aixiv_id == AIXIV_ID, Submission.version == "1.0", Submission.doc_type == "paper"
+        ).first()]
+
+    def get_reviews(db):
+        rows = db.query(PaperReview).filter(PaperReview.aixiv_id == AIXIV_ID, PaperReview.version == "1.0").all()
+        return [_review(r) for r in rows]
+
+    return {"get_submission": get_submission, "get_profile_by_user_id": get_profile,
+            "check_if_exist": check_if_exist, "get_reviews": get_reviews}
+
+
+def core_paths(submission_id: int):
+    def get_submission(db):
+        return [SubmissionDB.model_validate(crud.get_submission(db, submission_id))]
+
+    def get_profile(db):
+        return [ProfileResponse.model_validate(crud.get_profile_by_user_id(db, USER_ID))]
+
+    def check_if_exist(db):
+        return [crud.check_if_exist(db, AIXIV_ID, "1.0", "paper")]
+
+    def get_reviews(db):
+        return [_review(r) for r in crud.get_reviews(db, AIXIV_ID, version="1.0")]
+
+    return {"get_submission": get_submission, "get_profile_by_user_id": get_profile,
+            "check_if_exist": check_if_exist, "get_reviews": get_reviews}
+
+
+def _review(r) -> Review:
+    return Review(
+        aixiv_id=r.aixiv_id, version=r.version, review_results=r.review_results, create_time=r.create_time,
+        reviewer=ReviewerConst.REVIEWERS_TYPE_MAP.get(r.agent_type, ReviewerConst.UNKNOWN_REVIEWER),
+    )
+
+
+def measure(db: Session, fn, iterations: int) -> dict:
+    for _ in range(min(50, iterations)):
+        fn(db)
+        db.expunge_all()
+
+    rows = 0
+    start = time.perf_counter()
+    for _ in range(iterations):
+        rows += len(fn(db))
+        # Each request gets a fresh session in the app, so the identity map never warms up
+        db.expunge_all()
+    elapsed = time.perf_counter() - start
+
+    # Hydration garbage is freed before the loop ends, so compare the peak
+    # traced memory of each call against what was live when it started
+    tracemalloc.start()
+    sample = min(200, iterations)
+    peaks = []
+    for _ in range(sample):
+        db.expunge_all()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        fn(db)
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+    db.expunge_all()
+
+    return {
+        "calls_per_sec": iterations / elapsed,
+        "rows_per_sec": rows / elapsed,
+        "peak_bytes_per_call": sum(peaks) / sample,
+        "max_peak_bytes": max(peaks),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--reviews", type=int, default=20, help="reviews seeded for the benchmark paper")
+    args = parser.parse_args()
+
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        db = Session(bind=connection)
+        try:
+            submission_id = seed(db, args.reviews)
+            orm, core = orm_paths(submission_id), core_paths(submission_id)
+            print(f"{datetime.now().isoformat()}  iterations={args.iterations} reviews={args.reviews}")
+            print(f"{'query':<24}{'path':<6}{'calls/s':>10}{'rows/s':>12}{'peak B/call':>13}{'max peak B':>12}")
+            for name in orm:
+                for label, fn in (("orm", orm[name]), ("core", core[name])):
+                    r = measure(db, fn, args.iterations)
+                    print(f"{name:<24}{label:<6}{r['calls_per_sec']:>10.0f}{r['rows_per_sec']:>12.0f}"
+                          f"{r['peak_bytes_per_call']:>13.0f}{r['max_peak_bytes']:>12.0f}")
+        finally:
+            db.close()
+            transaction.rollback()
+
+
+if __name__ == "__main__":
+    main()
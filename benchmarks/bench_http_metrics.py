@@ -0,0 +1,96 @@
+"""
+Benchmark: per-request cost of HTTPMetricsMiddleware.
+
+Drives ASGI apps directly, without a server or TestClient, so the
+middleware's microseconds are not lost in transport noise:
+
+- a minimal FastAPI app with one templated route, bare and wrapped in the
+  middleware;
+- the real app's GET /, with HTTP_METRICS on and off (the off case still
+  pays for the settings check).
+
+Usage:
+    python -m benchmarks.bench_http_metrics --requests 20000
+"""
+import argparse
+import asyncio
+import os
+import time
+from unittest.mock import patch
+
+os.environ.setdefault("TESTING", "true")
+
+from fastapi import FastAPI
+
+from app.http_metrics import HTTPMetricsMiddleware
+from app.main import app as main_app
+
+
+def minimal_app(with_metrics: bool) -> FastAPI:
+    app = FastAPI()
+    if with_metrics:
+        app.add_middleware(HTTPMetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        return {"id": item_id}
+
+    return app
+
+
+async def drive(app, path: str, requests: int) -> float:
+    """Microseconds per request for `requests` sequential GETs of `path`"""
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+             "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+             "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1), "server": ("bench", 80)}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    for _ in range(200):  # warm up (middleware stack build, route compilation)
+        await app(dict(scope), receive, send)
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000, help="requests per measurement")
+    parser.add_argument("--rounds", type=int, default=5, help="measurements per case; the fastest is reported")
+    args = parser.parse_args()
+
+    loop = asyncio.new_event_loop()
+    bare, wrapped = minimal_app(False), minimal_app(True)
+
+    async def main_app_without_metrics(path, requests):
+        with patch("app.http_metrics.settings.http_metrics", False):
+            return await drive(main_app, path, requests)
+
+    cases = [
+        ("minimal app, no middleware", lambda: drive(bare, "/items/7", args.requests)),
+        ("minimal app, with metrics", lambda: drive(wrapped, "/items/7", args.requests)),
+        ("app GET /, HTTP_METRICS off", lambda: main_app_without_metrics("/", args.requests)),
+        ("app GET /, HTTP_METRICS on", lambda: drive(main_app, "/", args.requests)),
+    ]
+    best = {label: float("inf") for label, _ in cases}
+    # Interleaved rounds, so drift (CPU frequency, GC) affects every case alike
+    for _ in range(args.rounds):
+        for label, run in cases:
+            best[label] = min(best[label], loop.run_until_complete(run()))
+    loop.close()
+    results = list(best.items())
+
+    print(f"{'path':<32}{'us/request':>12}{'requests/s':>12}")
+    for label, micros in results:
+        print(f"{label:<32}{micros:>12.1f}{1e6 / micros:>12.0f}")
+    print(f"middleware overhead: minimal app {results[1][1] - results[0][1]:+.1f}us, "
+          f"app {results[3][1] - results[2][1]:+.1f}us per request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark: pre-signed upload URL throughput for one worker.
+
+Compares signing a submission's files one request at a time
+(/api/get-upload-url per file) with one batched request
+(/api/get-upload-urls), both in-process and through the ASGI app. Signing is
+local, so no AWS access is needed; dummy credentials are used.
+
+Usage:
+    python -m benchmarks.bench_presign --files 6 --seconds 3
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("TESTING", "true")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "AKIABENCHMARK000000")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark-secret")
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.s3_service import s3_service
+
+
+def rate(fn, signatures_per_call: int, seconds: float) -> float:
+    """Signatures per second while calling fn repeatedly for `seconds`"""
+    fn()  # warm up (client creation, endpoint resolution)
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        fn()
+        calls += 1
+    return calls * signatures_per_call / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=6, help="files per submission")
+    parser.add_argument("--seconds", type=float, default=3.0, help="duration of each measurement")
+    args = parser.parse_args()
+
+    filenames = ["paper.pdf"] + [f"section{i}.tex" for i in range(1, args.files)]
+    client = TestClient(app)
+
+    def service_single():
+        for name in filenames:
+            s3_service.generate_upload_url(name)
+
+    def service_batch():
+        s3_service.generate_upload_urls(filenames)
+
+    def http_single():
+        for name in filenames:
+            assert client.post("/api/get-upload-url", json={"filename": name}).status_code == 200
+
+    def http_batch():
+        assert client.post("/api/get-upload-urls", json={"filenames": filenames}).status_code == 200
+
+    print(f"files per submission: {args.files}")
+    print(f"{'path':<28}{'signatures/s':>14}{'submissions/s':>15}")
+    for label, fn in (("service, one at a time", service_single), ("service, batched", service_batch),
+                      ("HTTP, one request per file", http_single), ("HTTP, batched request", http_batch)):
+        signatures = rate(fn, args.files, args.seconds)
+        print(f"{label:<28}{signatures:>14.0f}{signatures / args.files:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
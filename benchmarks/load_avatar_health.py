@@ -0,0 +1,152 @@
+"""
+Load test: /api/health latency while avatar uploads are in flight.
+
+Drives the ASGI app in-process (one event loop, like one uvicorn worker) with
+a number of concurrent avatar uploads and probes /api/health meanwhile. S3 is
+replaced by a stub that sleeps for --s3-latency-ms per call and the database
+by a mock session, so only event-loop blocking is measured.
+
+--inline runs the image and S3 work directly in the handler, as before the
+executor layer, for comparison.
+
+Usage:
+    python -m benchmarks.load_avatar_health --uploads 8 --seconds 5
+    python -m benchmarks.load_avatar_health --uploads 8 --seconds 5 --inline
+"""
+import argparse
+import asyncio
+import io
+import math
+import os
+import statistics
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+os.environ.setdefault("TESTING", "true")
+
+import httpx
+from PIL import Image
+
+from app.auth import get_current_user
+from app.database import get_db
+from app.executors import image_executor, s3_executor, shutdown_executors
+from app.main import app
+from app.services.s3_service import s3_service
+
+
+class SlowS3:
+    """Stands in for the boto3 client: each call blocks like a network round trip"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def put_object(self, **kwargs):
+        time.sleep(self.latency)
+
+    def delete_object(self, **kwargs):
+        time.sleep(self.latency)
+
+
+def _avatar_bytes() -> bytes:
+    buffer = io.BytesIO()
+    Image.effect_noise((1200, 1200), 64).convert("RGB").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+async def _inline(fn, *args, **kwargs):
+    return fn(*args, **kwargs)
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+    return f"p50={pick(0.5):7.1f}ms  p95={pick(0.95):7.1f}ms  p99={pick(0.99):7.1f}ms  max={samples[-1] * 1000:7.1f}ms"
+
+
+async def probe_health(client, stop: asyncio.Event, interval: float):
+    """
+    Probe on a fixed schedule and measure from the scheduled send time, so a
+    blocked event loop shows up as latency instead of as fewer probes.
+    """
+    latencies = []
+    started = time.perf_counter()
+    probe = 0
+    while not stop.is_set():
+        scheduled = started + probe * interval
+        await asyncio.sleep(max(0, scheduled - time.perf_counter()))
+        response = await client.get("/api/health")
+        latencies.append(time.perf_counter() - scheduled)
+        assert response.status_code == 200
+        # Skip slots that passed while this probe was stuck
+        probe = max(probe + 1, math.ceil((time.perf_counter() - started) / interval))
+    return latencies
+
+
+async def upload_loop(client, stop: asyncio.Event, avatar: bytes, results: dict):
+    while not stop.is_set():
+        response = await client.post(
+            "/api/profile/avatar",
+            data={"user_id": "bench-user"},
+            files={"avatar": ("avatar.png", avatar, "image/png")},
+        )
+        results[response.status_code] = results.get(response.status_code, 0) + 1
+
+
+async def run(args):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        avatar = _avatar_bytes()
+        # Start the process pool before measuring
+        await client.post("/api/profile/avatar", data={"user_id": "bench-user"},
+                          files={"avatar": ("avatar.png", avatar, "image/png")})
+
+        stop = asyncio.Event()
+        probe = asyncio.create_task(probe_health(client, stop, args.probe_interval))
+        await asyncio.sleep(1)
+        stop.set()
+        idle = await probe
+
+        stop = asyncio.Event()
+        results = {}
+        uploads = [asyncio.create_task(upload_loop(client, stop, avatar, results)) for _ in range(args.uploads)]
+        probe = asyncio.create_task(probe_health(client, stop, args.probe_interval))
+        await asyncio.sleep(args.seconds)
+        stop.set()
+        busy = await probe
+        await asyncio.gather(*uploads)
+
+    print(f"mode={'inline' if args.inline else 'executors'} uploads={args.uploads} "
+          f"s3_latency={args.s3_latency_ms}ms avatar={len(avatar) // 1024}KiB")
+    print(f"health idle    ({len(idle):4d} probes): {_percentiles(idle)}")
+    print(f"health loaded  ({len(busy):4d} probes): {_percentiles(busy)}")
+    print(f"upload responses: {dict(sorted(results.items()))} "
+          f"({sum(results.values()) / args.seconds:.1f}/s, mean health {statistics.mean(busy) * 1000:.1f}ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=8, help="concurrent upload loops")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--s3-latency-ms", type=float, default=80.0)
+    parser.add_argument("--probe-interval", type=float, default=0.02, help="seconds between health probes")
+    parser.add_argument("--inline", action="store_true", help="run blocking work on the event loop")
+    args = parser.parse_args()
+
+    app.dependency_overrides[get_current_user] = lambda: {"user_id": "bench-user"}
+    app.dependency_overrides[get_db] = lambda: MagicMock()
+    s3_service.s3_client = SlowS3(args.s3_latency_ms / 1000)
+
+    with patch("app.api.profiles.get_profile_for_update", return_value=SimpleNamespace(avatar_url=None, avatar_variants=None)):
+        if args.inline:
+            with patch.object(image_executor, "run", _inline), patch.object(s3_executor, "run", _inline):
+                asyncio.run(run(args))
+        else:
+            try:
+                asyncio.run(run(args))
+            finally:
+                shutdown_executors()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Local stand-in for Clerk's JWKS endpoint, for development, tests and
+benchmarks.
+
+It generates an RSA key pair, serves the public half at
+/.well-known/jwks.json and signs tokens with the private half. Point
+CLERK_JWKS_URL (or CLERK_JWKS_FALLBACK_URL) at it to run the API without a
+Clerk instance:
+
+    python -m tests.jwks_standin --port 8765 --sub user_123
+    CLERK_JWKS_URL=http://127.0.0.1:8765/.well-known/jwks.json uvicorn app.main:app
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+JWKS_PATH = "/.well-known/jwks.json"
+
+
+class JWKSStandIn:
+    """An RSA signing key and a tiny HTTP server publishing it as a JWKS"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.kid = uuid.uuid4().hex
+        self.private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(self.private_key.public_key()))
+        self.jwks = {"keys": [{**jwk, "kid": self.kid, "use": "sig", "alg": "RS256"}]}
+        self.requests = 0
+
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != JWKS_PATH:
+                    self.send_error(404)
+                    return
+                standin.requests += 1
+                body = json.dumps(standin.jwks).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}{JWKS_PATH}"
+
+    def token(self, sub: str, ttl: float = 3600, kid: Optional[str] = None, **claims) -> str:
+        """A token for `sub` signed with this key, valid for `ttl` seconds"""
+        now = int(time.time())
+        payload = {"sub": sub, "iat": now, "nbf": now, "exp": now + int(ttl), **claims}
+        return jwt.encode(payload, self.private_key, algorithm="RS256", headers={"kid": kid or self.kid})
+
+    def start(self) -> "JWKSStandIn":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="jwks-standin", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a stand-in JWKS and print a token signed by it")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--sub", default="dev-user", help="user id of the printed token")
+    parser.add_argument("--ttl", type=float, default=24 * 3600, help="token lifetime in seconds")
+    args = parser.parse_args()
+
+    standin = JWKSStandIn(args.host, args.port)
+    print(f"JWKS:  {standin.url}")
+    print(f"Token: {standin.token(args.sub, ttl=args.ttl)}")
+    try:
+        standin.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        standin.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import text
+
+from app.services.agent_tokens import (
+    AgentTokenInfo, AgentTokenRegistry, AgentTokensUnavailable, QuotaExceeded, create_token, hash_token,
+)
+
+NOON = datetime(2026, 10, 19, 12, 0, tzinfo=timezone.utc)
+REVIEW = {
+    "code": 0,
+    "aixiv_id": "aixiv.250101.000001",
+    "version": "1.0",
+    "review_results": {"score": 5},
+    "doc_type": "paper",
+    "reviewer": "agent",
+}
+
+
+def _registry(*tokens, engine=None):
+    """A registry holding `tokens` as (secret, AgentTokenInfo) pairs, without a database"""
+    registry = AgentTokenRegistry(engine or MagicMock())
+    registry._tokens = {hash_token(secret): info for secret, info in tokens}
+    registry._loaded = True
+    return registry
+
+
+class TestQuotas:
+    """Test counting against daily quotas in memory"""
+
+    def test_request_and_byte_quotas(self):
+        token = AgentTokenInfo(1, "acme", requests_per_day=3, bytes_per_day=250)
+        registry = _registry(("secret", token))
+        assert registry.authenticate("secret") == token
+        assert registry.authenticate("other") is None
+        registry.consume(token, 100, now=NOON)
+        registry.consume(token, 100, now=NOON)
+        with pytest.raises(QuotaExceeded) as exc:
+            registry.consume(token, 100, now=NOON)
+        assert (exc.value.resource, exc.value.retry_after) == ("bytes", 12 * 3600)
+        registry.consume(token, 50, now=NOON)
+        with pytest.raises(QuotaExceeded) as exc:
+            registry.consume(token, 0, now=NOON)
+        assert exc.value.resource == "requests"
+        # Rejected requests are not counted
+        assert registry.usage(now=NOON)[0] == {"name": "acme", "requests": 3, "bytes": 250,
+                                               "requests_per_day": 3, "bytes_per_day": 250}
+
+    def test_stored_usage_counts_and_days_reset(self):
+        token = AgentTokenInfo(1, "acme", requests_per_day=10, bytes_per_day=None)
+        registry = _registry(("secret", token))
+        registry._day, registry._stored = NOON.date(), {1: [10, 0]}  # as loaded by refresh()
+        with pytest.raises(QuotaExceeded):
+            registry.consume(token, 1, now=NOON)
+        registry.consume(token, 1, now=NOON.replace(day=20, hour=0))
+        assert registry.usage(now=NOON.replace(day=20))[0]["requests"] == 1
+
+    def test_tokens_are_never_loaded_by_a_request(self):
+        engine = MagicMock()
+        registry = AgentTokenRegistry(engine)
+        with pytest.raises(AgentTokensUnavailable):
+            registry.authenticate("secret")
+        engine.connect.assert_not_called()
+
+        # A failed startup load leaves the retry to the background thread
+        engine.connect.side_effect = RuntimeError("database down")
+        assert registry.load() is False
+        with pytest.raises(AgentTokensUnavailable):
+            registry.authenticate("secret")
+
+    def test_failed_flush_keeps_counts(self):
+        token = AgentTokenInfo(1, "acme", None, None)
+        engine = MagicMock()
+        engine.begin.side_effect = RuntimeError("db down")
+        registry = _registry(("secret", token), engine=engine)
+        registry.consume(token, 10, now=NOON)
+        with pytest.raises(RuntimeError):
+            registry.flush()
+        registry.consume(token, 5, now=NOON)
+        assert registry._pending == {(1, NOON.date()): [2, 15]}
+
+
+class TestSubmitReviewTokens:
+    """Test agent tokens on /api/submit-review and /api/agent-tokens/usage"""
+
+    @pytest.fixture
+    def tokens(self):
+        registry = _registry(("acme-secret", AgentTokenInfo(1, "acme", requests_per_day=1, bytes_per_day=None)),
+                             ("beta-secret", AgentTokenInfo(2, "beta", requests_per_day=None, bytes_per_day=None)))
+        with patch("app.api.agent_review.agent_tokens", registry), \
+                patch("app.api.agent_review.settings.paper_exist_check", False), \
+                patch("app.api.agent_review.settings.ip_limit_window_size", 0), \
+                patch("app.api.agent_review.create_paper_review") as create:
+            create.return_value = MagicMock(aixiv_id=REVIEW["aixiv_id"], version="1.0", id=1)
+            yield registry
+
+    def test_token_quota(self, client, tokens):
+        response = client.post("/api/submit-review", json={**REVIEW, "token": "acme-secret"})
+        assert response.status_code == 200
+        response = client.post("/api/submit-review", json={**REVIEW, "token": "acme-secret"})
+        assert response.status_code == 429
+        assert int(response.headers["retry-after"]) > 0
+        assert client.post("/api/submit-review", json={**REVIEW, "token": "wrong"}).status_code == 401
+        # Anonymous agents are not affected
+        assert client.post("/api/submit-review", json=REVIEW).status_code == 200
+        usage = tokens.usage()
+        assert usage[0]["requests"] == 1 and usage[0]["bytes"] > 0 and usage[1]["requests"] == 0
+
+    def test_usage_endpoint(self, client, tokens):
+        assert client.get("/api/agent-tokens/usage").status_code == 401
+        assert client.get("/api/agent-tokens/usage", headers={"Authorization": "Bearer wrong"}).status_code == 401
+        own = client.get("/api/agent-tokens/usage", headers={"Authorization": "Bearer beta-secret"}).json()
+        assert [u["name"] for u in own["usage"]] == ["beta"]
+        with patch("app.api.agent_review.settings.agent_usage_admin_token", "admin"):
+            every = client.get("/api/agent-tokens/usage", headers={"Authorization": "Bearer admin"}).json()
+        assert [u["name"] for u in every["usage"]] == ["acme", "beta"]
+
+
+@pytest.mark.database
+@pytest.mark.usefixtures("clean_postgres")
+class TestAgentTokensWithPostgres:
+    """Test loading tokens and flushing usage against Postgres"""
+
+    def test_refresh_and_flush(self, postgres_engine):
+        secret = create_token(postgres_engine, "acme", requests_per_day=100)
+        create_token(postgres_engine, "revoked", token="old-shared-token")
+        with postgres_engine.begin() as conn:
+            conn.execute(text("UPDATE agent_tokens SET revoked_at = now() WHERE name = 'revoked'"))
+            stored = conn.execute(text("SELECT token_hash FROM agent_tokens WHERE name = 'acme'")).scalar()
+        assert stored == hash_token(secret) and secret not in stored
+
+        registry = AgentTokenRegistry(postgres_engine)
+        assert registry.load() is True
+        token = registry.authenticate(secret)
+        assert token.name == "acme" and registry.authenticate("old-shared-token") is None
+        registry.consume(token, 40)
+        registry.consume(token, 60)
+        assert registry.flush() == 1
+        registry.consume(token, 1)
+        assert registry.flush() == 1
+        assert registry.flush() == 0
+
+        # Another worker sees the stored usage after its refresh
+        other = AgentTokenRegistry(postgres_engine)
+        other.refresh()
+        assert other.usage()[0]["requests"] == 3 and other.usage()[0]["bytes"] == 101
+        with postgres_engine.connect() as conn:
+            row = conn.execute(text("SELECT requests, bytes FROM agent_token_usage")).one()
+        assert tuple(row) == (3, 101)
@@ -56,6 +56,30 @@ class TestUploadEndpoints:
         assert response.status_code == 400
         assert "Only PDF and LaTeX files" in response.json()["detail"]
 
+    def test_get_upload_urls_batch(self, client):
+        """Test batch upload URL generation keeps the filename order"""
+        filenames = ["paper.pdf", "main.tex", "appendix.latex"]
+        response = client.post("/api/get-upload-urls", json={"filenames": filenames})
+        # This might fail due to missing AWS credentials, but should not crash
+        assert response.status_code in [200, 500]
+        if response.status_code == 200:
+            files = response.json()["files"]
+            assert [f["file_extension"] for f in files] == ["pdf", "tex", "latex"]
+            assert len({f["file_key"] for f in files}) == 3
+
+    def test_get_upload_urls_rejects_whole_batch(self, client):
+        """Test one invalid filename fails the batch before anything is signed"""
+        with patch("app.services.s3_service.S3Service._presigned_put") as mock_sign:
+            response = client.post("/api/get-upload-urls", json={"filenames": ["paper.pdf", "notes.txt"]})
+        assert response.status_code == 400
+        assert response.json()["detail"].startswith("notes.txt:")
+        mock_sign.assert_not_called()
+
+    def test_get_upload_urls_empty_batch(self, client):
+        """Test an empty filename list is rejected"""
+        response = client.post("/api/get-upload-urls", json={"filenames": []})
+        assert response.status_code == 422
+
 class TestSubmissionEndpoints:
     """Test submission-related endpoints with proper mocking"""
     
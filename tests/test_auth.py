@@ -0,0 +1,120 @@
+import time
+from unittest.mock import MagicMock, patch
+
+import jwt
+import pytest
+
+from app import auth
+from app.auth import JWKSCache, VerifiedTokenCache, auth_verifications_total, jwks_refreshes_total
+from app.database import get_db
+from app.main import app
+from tests.jwks_standin import JWKSStandIn
+
+UNREACHABLE = "http://127.0.0.1:9/.well-known/jwks.json"
+
+
+@pytest.fixture(scope="module")
+def standin():
+    server = JWKSStandIn().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def keys(standin):
+    """app.auth wired to the stand-in, with empty caches"""
+    cache = JWKSCache([standin.url], refresh_seconds=3600, min_refresh_seconds=30, timeout=2)
+    app.dependency_overrides[get_db] = lambda: MagicMock()
+    with patch.object(auth, "jwks_cache", cache), patch.object(auth, "verified_tokens", VerifiedTokenCache(100)), \
+            patch("app.api.profiles.get_profile_by_user_id", return_value=None):
+        yield cache
+    app.dependency_overrides.pop(get_db, None)
+
+
+def _me(client, token):
+    # 404 (no profile) means the token was accepted
+    return client.get("/api/profile/me", headers={"Authorization": f"Bearer {token}"})
+
+
+class TestTokenVerification:
+    """Test /api/profile/me with tokens signed by a stand-in JWKS"""
+
+    def test_valid_token_is_verified_once(self, client, standin, keys):
+        token = standin.token("user_1")
+        with patch("app.api.profiles.get_profile_by_user_id", return_value=None) as lookup:
+            cached = auth_verifications_total.get(result="cached")
+            assert _me(client, token).status_code == 404
+            with patch.object(auth.jwt, "decode", side_effect=AssertionError("verified twice")):
+                assert _me(client, token).status_code == 404
+        assert lookup.call_args[0][1] == "user_1"
+        assert auth_verifications_total.get(result="cached") == cached + 1
+
+    @pytest.mark.parametrize("make_token", [
+        lambda s: s.token("user_1", ttl=-60),                                    # expired
+        lambda s: JWKSStandIn().token("user_1", kid=s.kid),                      # signed by another key
+        lambda s: jwt.encode({"sub": "user_1", "exp": time.time() + 60}, "secret", algorithm="HS256",
+                             headers={"kid": s.kid}),                            # symmetric algorithm
+        lambda s: jwt.encode({"sub": "user_1", "exp": time.time() + 60}, None, algorithm="none"),
+        lambda s: s.token("", ttl=60),                                          # no subject
+        lambda s: "not-a-jwt",
+    ])
+    def test_rejected(self, client, standin, keys, make_token):
+        response = _me(client, make_token(standin))
+        assert response.status_code == 401
+        assert response.headers["www-authenticate"] == "Bearer"
+
+    def test_issuer_and_authorized_party(self, client, standin, keys):
+        with patch.object(auth.settings, "clerk_issuer", "https://clerk.example"), \
+                patch.object(auth.settings, "clerk_authorized_parties", "https://aixiv.co, http://localhost:3000"):
+            assert _me(client, standin.token("u", iss="https://clerk.example", azp="https://aixiv.co")).status_code == 404
+            assert _me(client, standin.token("u", iss="https://evil.example", azp="https://aixiv.co")).status_code == 401
+            assert _me(client, standin.token("u", iss="https://clerk.example", azp="https://evil.example")).status_code == 401
+
+    def test_unknown_kid_refreshes_at_most_once_per_interval(self, client, standin, keys):
+        assert _me(client, standin.token("u")).status_code == 404
+        requests = standin.requests
+        assert _me(client, standin.token("u", kid="rotated-1")).status_code == 401
+        assert standin.requests == requests  # the first refresh was just now
+        with patch.object(keys, "_last_attempt", float("-inf")):
+            assert _me(client, standin.token("u", kid="rotated-2")).status_code == 401
+        assert standin.requests == requests + 1
+
+    def test_no_jwks_is_unavailable(self, client, standin):
+        with patch.object(auth, "jwks_cache", JWKSCache([UNREACHABLE], timeout=1)), \
+                patch.object(auth, "verified_tokens", VerifiedTokenCache(100)):
+            assert _me(client, standin.token("u")).status_code == 503
+
+
+class TestJWKSCache:
+    """Test fetching and refreshing signing keys"""
+
+    def test_fallback_url(self, standin):
+        failed = jwks_refreshes_total.get(source="primary", outcome="error")
+        cache = JWKSCache([UNREACHABLE, standin.url], timeout=1)
+        assert cache.get_key(standin.kid).key_id == standin.kid
+        assert jwks_refreshes_total.get(source="primary", outcome="error") == failed + 1
+
+    def test_background_refresh_keeps_keys_on_failure(self, standin):
+        cache = JWKSCache([standin.url], refresh_seconds=0.05, min_refresh_seconds=0.05, timeout=1)
+        cache.start()
+        try:
+            deadline = time.monotonic() + 5
+            while standin.kid not in cache._keys and time.monotonic() < deadline:
+                time.sleep(0.01)
+            cache.urls = [UNREACHABLE]
+            time.sleep(0.2)
+        finally:
+            cache.stop()
+        assert standin.kid in cache._keys
+
+
+class TestVerifiedTokenCache:
+    """Test the verified-claims LRU"""
+
+    def test_expiry_and_bound(self):
+        cache = VerifiedTokenCache(max_entries=2)
+        cache.put(b"old", {"exp": time.time() - 1})
+        assert cache.get(b"old") is None
+        for digest in (b"a", b"b", b"c"):
+            cache.put(digest, {"exp": time.time() + 60})
+        assert cache.get(b"a") is None and cache.get(b"c") is not None
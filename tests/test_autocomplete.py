@@ -0,0 +1,102 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.database import get_db
+from app.main import app
+from app.services.autocomplete_cache import autocomplete_cache
+
+
+@pytest.fixture(autouse=True)
+def _empty_cache():
+    autocomplete_cache.clear()
+    yield
+    autocomplete_cache.clear()
+
+
+class TestAutocompleteEndpoint:
+    """Test /api/autocomplete/authors without a database"""
+
+    @pytest.fixture
+    def db(self):
+        db = MagicMock()
+        db.connection.return_value.execute.return_value.all.return_value = [
+            SimpleNamespace(kind="affiliation", label="Ada Labs", user_id=None, affiliation=None, avatar_url=None,
+                            count=3, tier=0),
+            SimpleNamespace(kind="author", label="Grace Ada", user_id=None, affiliation=None, avatar_url=None,
+                            count=9, tier=1),
+            SimpleNamespace(kind="profile", label="Ada Lovelace", user_id="u1", affiliation="Ada Labs",
+                            avatar_url=None, count=None, tier=0),
+        ]
+        app.dependency_overrides[get_db] = lambda: db
+        yield db
+        app.dependency_overrides.pop(get_db, None)
+
+    def test_ranked_and_cached_per_prefix(self, client, db):
+        response = client.get("/api/autocomplete/authors", params={"q": "  ADA ", "limit": 2})
+        assert response.status_code == 200
+        assert [(s["kind"], s["label"]) for s in response.json()] == [
+            ("profile", "Ada Lovelace"), ("affiliation", "Ada Labs")]
+        params = db.connection.return_value.execute.call_args[0][1]
+        assert params == {"prefix": "ada%", "word": "% ada%", "contains": "%ada%", "limit": 2}
+
+        client.get("/api/autocomplete/authors", params={"q": "ada", "limit": 2})
+        assert db.connection.return_value.execute.call_count == 1
+
+    def test_like_wildcards_are_literal(self, client, db):
+        client.get("/api/autocomplete/authors", params={"q": "5%_x"})
+        assert db.connection.return_value.execute.call_args[0][1]["contains"] == "%5\\%\\_x%"
+
+    def test_short_queries(self, client, db):
+        assert client.get("/api/autocomplete/authors", params={"q": "a"}).status_code == 422
+        assert client.get("/api/autocomplete/authors", params={"q": " a "}).status_code == 400
+
+
+@pytest.mark.database
+@pytest.mark.usefixtures("clean_postgres")
+class TestAutocompleteWithPostgres:
+    """Test author name bookkeeping and ranking against PostgreSQL"""
+
+    def _submit(self, db, authors):
+        from app.schemas import SubmissionCreate
+        return crud.create_submission(db, SubmissionCreate(
+            title="Paper", agent_authors=authors, corresponding_author=authors[0], category=["cs.AI"],
+            keywords=["kw"], license="CC-BY-4.0", s3_url="https://b.s3.amazonaws.com/p.pdf", uploaded_by="user-1",
+            doc_type="paper",
+        )).id
+
+    def _author_counts(self, engine):
+        with engine.connect() as conn:
+            return dict(conn.execute(text("SELECT name, submission_count FROM author_names")).all())
+
+    def test_names_are_counted_and_ranked(self, postgres_engine):
+        with Session(postgres_engine) as db:
+            first = self._submit(db, ["Ada Agent", " Grace Bot ", "Ada Agent"])
+            self._submit(db, ["Ada Agent"])
+            crud.create_or_update_profile(db, {"user_id": "u1", "name": "Madame Adams", "affiliation": "Ada Institute"})
+        assert self._author_counts(postgres_engine) == {"Ada Agent": 2, "Grace Bot": 1}
+
+        with Session(postgres_engine) as db:
+            suggestions = crud.autocomplete_authors(db, "ada", limit=5)
+        assert [(s.kind, s.label, s.count) for s in suggestions] == [
+            ("author", "Ada Agent", 2),                 # starts with "ada"
+            ("affiliation", "Ada Institute", 1),
+            ("profile", "Madame Adams", None),          # a word starts with "ada"
+        ]
+        assert suggestions[2].user_id == "u1"
+
+        with Session(postgres_engine) as db:
+            assert crud.delete_submission(db, first)
+        assert self._author_counts(postgres_engine) == {"Ada Agent": 1}
+
+    def test_trigram_indexes_are_used(self, postgres_engine):
+        with postgres_engine.connect() as conn:
+            if not conn.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).scalar():
+                pytest.skip("pg_trgm is not installed on this server")
+            conn.execute(text("SET enable_seqscan = off"))
+            plan = "\n".join(conn.execute(text("EXPLAIN SELECT name FROM author_names WHERE name ILIKE '%ada%'")).scalars())
+        assert "ix_author_names_name_trgm" in plan
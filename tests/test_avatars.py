@@ -0,0 +1,120 @@
+import io
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+from PIL import Image, JpegImagePlugin
+
+from app.auth import get_current_user
+from app.database import get_db
+from app.main import app
+from app.schemas import build_avatar_srcset
+from app.services.images import AVATAR_SIZES, ImageTooLarge, process_avatar_variants
+from tests.test_upload_pipeline import BUCKET, _url, s3  # noqa: F401 (fixture)
+
+
+def _image(size, fmt="PNG", mode="RGBA") -> bytes:
+    buffer = io.BytesIO()
+    Image.new(mode, size, (10, 20, 30, 128) if mode == "RGBA" else (10, 20, 30)).save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+async def _inline(fn, *args, **kwargs):
+    return fn(*args, **kwargs)
+
+
+class TestAvatarVariants:
+    """Test the one-decode, multi-size avatar encoder"""
+
+    def test_every_size_in_webp_and_jpeg(self):
+        variants = process_avatar_variants(_image((1200, 800)), max_pixels=10_000_000)
+        assert set(variants) == {"webp", "jpeg"}
+        for fmt, pil_format in (("webp", "WEBP"), ("jpeg", "JPEG")):
+            assert sorted(variants[fmt]) == sorted(AVATAR_SIZES)
+            for size, data in variants[fmt].items():
+                image = Image.open(io.BytesIO(data))
+                assert image.format == pil_format
+                assert image.mode == "RGB"
+                assert image.width == size and abs(image.height - size * 2 / 3) <= 1
+
+    def test_jpeg_is_decoded_at_reduced_scale(self):
+        drafted = []
+        original_draft = JpegImagePlugin.JpegImageFile.draft
+
+        def draft(image, mode, size):
+            result = original_draft(image, mode, size)
+            drafted.append(image.size)
+            return result
+
+        data = _image((4000, 3000), "JPEG", "RGB")
+        with patch.object(JpegImagePlugin.JpegImageFile, "draft", draft):
+            variants = process_avatar_variants(data, max_pixels=20_000_000)
+        # The decoder scaled 4000x3000 down to 1000x750 (1/4) before resizing
+        assert drafted[0] == (1000, 750)
+        assert Image.open(io.BytesIO(variants["jpeg"][500])).size == (500, 375)
+
+    def test_pixel_limit_is_checked_before_decoding(self):
+        data = _image((2000, 2000))
+        with patch.object(Image.Image, "load", side_effect=AssertionError("decoded")):
+            with pytest.raises(ImageTooLarge):
+                process_avatar_variants(data, max_pixels=1_000_000)
+
+    def test_srcset(self):
+        srcset = build_avatar_srcset({"webp": {"128": "u128", "32": "u32", "500": "u500"}})
+        assert srcset == {"webp": "u32 32w, u128 128w, u500 500w"}
+        assert build_avatar_srcset(None) is None
+
+
+class TestAvatarUpload:
+    """Test /api/profile/avatar against a moto bucket"""
+
+    @pytest.fixture(autouse=True)
+    def _auth(self):
+        app.dependency_overrides[get_current_user] = lambda: {"user_id": "user-1"}
+        app.dependency_overrides[get_db] = lambda: MagicMock()
+        yield
+        app.dependency_overrides.pop(get_current_user, None)
+        app.dependency_overrides.pop(get_db, None)
+
+    def _upload(self, client, s3, profile, data=None):
+        with patch("app.api.profiles.s3_service", s3), \
+                patch("app.api.profiles.image_executor.run", _inline), \
+                patch("app.api.profiles.get_profile_for_update", return_value=profile), \
+                patch("app.api.profiles.create_or_update_profile"):
+            return client.post(
+                "/api/profile/avatar",
+                data={"user_id": "user-1"},
+                files={"avatar": ("me.png", data or _image((800, 800)), "image/png")},
+            )
+
+    def test_variants_are_stored_and_old_avatar_queued_for_deletion(self, client, s3):
+        profile = SimpleNamespace(
+            avatar_url=_url("avatars/user-1/old/500.jpeg"),
+            avatar_variants={"webp": {"32": _url("avatars/user-1/old/32.webp")},
+                             "jpeg": {"500": _url("avatars/user-1/old/500.jpeg")}},
+        )
+        with patch("app.api.profiles.enqueue_s3_deletions") as enqueue:
+            response = self._upload(client, s3, profile)
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["avatar_url"] == body["avatar_variants"]["jpeg"]["500"]
+        assert body["avatar_srcset"]["webp"].endswith("/500.webp 500w")
+        assert profile.avatar_variants == body["avatar_variants"]
+
+        # Nothing is deleted on the request path
+        assert enqueue.call_args[0][1] == ["avatars/user-1/old/32.webp", "avatars/user-1/old/500.jpeg"]
+        keys = sorted(o["Key"] for o in s3.s3_client.list_objects_v2(Bucket=BUCKET)["Contents"])
+        assert len(keys) == 2 * len(AVATAR_SIZES)
+        head = s3.s3_client.head_object(Bucket=BUCKET, Key=s3.key_from_url(body["avatar_variants"]["webp"]["64"]))
+        assert head["ContentType"] == "image/webp"
+
+    def test_oversized_image_is_rejected(self, client, s3):
+        with patch("app.api.profiles.settings.avatar_max_pixels", 10_000):
+            response = self._upload(client, s3, None)
+        assert response.status_code == 400
+        assert "pixels" in response.json()["detail"]
+
+    def test_not_an_image(self, client, s3):
+        response = self._upload(client, s3, None, data=b"not an image")
+        assert response.status_code == 400
@@ -0,0 +1,84 @@
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import postgresql
+
+from app import crud
+from app.schemas import ProfileResponse
+
+
+def _compiled(db):
+    """Compile the statement passed to db.connection().execute for Postgres"""
+    stmt = db.connection().execute.call_args[0][0]
+    return stmt.compile(dialect=postgresql.dialect())
+
+
+class TestCoreReadPath:
+    """Test the Core statements behind the hot read functions"""
+
+    def test_get_reviews_only_adds_given_filters(self):
+        db = MagicMock()
+        crud.get_reviews(db, "aixiv.250101.000001", version="1.0")
+        compiled = _compiled(db)
+        assert "paper_review.version" in str(compiled)
+        assert "paper_review.ip" not in str(compiled)
+        assert compiled.params == {"aixiv_id_1": "aixiv.250101.000001", "version_1": "1.0"}
+
+    def test_lambda_statement_binds_new_values(self):
+        db = MagicMock()
+        crud.get_reviews(db, "aixiv.250101.000001", start_date=datetime(2025, 1, 1), ip="1.2.3.4")
+        crud.get_reviews(db, "aixiv.250102.000002", start_date=datetime(2025, 2, 1), ip="5.6.7.8")
+        params = _compiled(db).params
+        assert params["aixiv_id_1"] == "aixiv.250102.000002"
+        assert params["ip_1"] == "5.6.7.8"
+
+    def test_count_reviews_selects_count(self):
+        db = MagicMock()
+        db.connection().execute.return_value.scalar_one.return_value = 4
+        assert crud.count_reviews(db, "aixiv.250101.000001", ip="1.2.3.4") == 4
+        assert "count(*)" in str(_compiled(db))
+
+    def test_check_if_exist_selects_id_only(self):
+        db = MagicMock()
+        db.connection().execute.return_value.scalar.return_value = None
+        assert crud.check_if_exist(db, "aixiv.250101.000001", "1.0", "paper") is None
+        stmt = db.connection().execute.call_args[0][0]
+        assert str(stmt.compile(dialect=postgresql.dialect())).startswith("SELECT submissions.id \nFROM submissions")
+
+    def test_response_model_validates_row(self):
+        """Rows carry attribute access, so from_attributes models accept them"""
+        engine = create_engine("sqlite://")
+        with engine.connect() as conn:
+            row = conn.execute(text(
+                "SELECT 1 AS id, 'user-1' AS user_id, 'Ada' AS name, NULL AS title, NULL AS affiliation, "
+                "NULL AS location, NULL AS bio, NULL AS email, NULL AS website, NULL AS github_url, "
+                "NULL AS twitter_url, NULL AS linkedin_url, NULL AS avatar_url, "
+                "'2025-01-01 00:00:00' AS created_at, '2025-01-01 00:00:00' AS updated_at"
+            )).first()
+        profile = ProfileResponse.model_validate(row)
+        assert profile.user_id == "user-1"
+        assert profile.name == "Ada"
+
+
+class TestRateLimitUsesCount:
+    """Test that the review rate limit counts instead of fetching rows"""
+
+    @patch("app.api.agent_review.create_paper_review")
+    @patch("app.api.agent_review.count_reviews", return_value=10)
+    def test_rate_limited(self, mock_count, mock_create, client):
+        with patch("app.api.agent_review.settings") as mock_settings:
+            mock_settings.paper_exist_check = False
+            mock_settings.ip_limit_window_size = 1
+            mock_settings.ip_limit_frequency = 3
+            response = client.post("/api/submit-review", json={
+                "code": 0,
+                "aixiv_id": "aixiv.250101.000001",
+                "version": "1.0",
+                "review_results": {"score": 5},
+                "doc_type": "paper",
+                "reviewer": "agent",
+            })
+        assert response.status_code == 429
+        mock_count.assert_called_once()
+        mock_create.assert_not_called()
@@ -0,0 +1,100 @@
+import logging
+from unittest.mock import Mock, patch
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.config import settings
+from app.db_instrumentation import (
+    instrument_engine,
+    track_queries,
+    redact_parameters,
+    db_repeated_statements_total,
+)
+
+
+@pytest.fixture
+def engine():
+    """In-memory SQLite engine with the instrumentation hooks attached"""
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    yield engine
+    engine.dispose()
+
+
+class TestQueryTracking:
+    """Test per-request query attribution"""
+
+    def test_counts_queries_in_scope(self, engine):
+        with track_queries() as stats:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+                conn.execute(text("SELECT 2"))
+        assert stats.count == 2
+        assert stats.total_ms >= 0
+        assert stats.server_timing().startswith("db;dur=")
+        assert 'desc="2 queries"' in stats.server_timing()
+
+    def test_queries_outside_scope_are_not_attributed(self, engine):
+        with track_queries() as stats:
+            pass
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        assert stats.count == 0
+
+    def test_repeated_statement_flagged_once(self, engine):
+        before = db_repeated_statements_total.get(route="background")
+        with patch.object(settings, "repeated_statement_threshold", 2):
+            with track_queries() as stats:
+                with engine.connect() as conn:
+                    for i in range(5):
+                        conn.execute(text("SELECT :x"), {"x": i})
+        assert stats.count == 5
+        assert len(stats.flagged) == 1
+        assert db_repeated_statements_total.get(route="background") == before + 1
+
+    def test_slow_query_logged_with_redacted_parameters(self, engine, caplog):
+        with patch.object(settings, "slow_query_ms", 0):
+            with caplog.at_level(logging.WARNING, logger="app.slow_query"):
+                with engine.connect() as conn:
+                    conn.execute(text("SELECT :secret"), {"secret": "hunter2"})
+        assert caplog.records
+        assert "hunter2" not in caplog.text
+        assert "<str>" in caplog.text
+
+
+class TestRouteLabel:
+    """Test the route label used for metrics"""
+
+    def test_unmatched_path_uses_fixed_label(self):
+        with track_queries({"type": "http", "path": "/random/12345"}) as stats:
+            assert stats.route == "unmatched"
+
+    def test_matched_route_uses_template(self):
+        route = Mock(path="/api/submissions/{submission_id}")
+        with track_queries({"type": "http", "path": "/api/submissions/7", "route": route}) as stats:
+            assert stats.route == "/api/submissions/{submission_id}"
+
+
+class TestRedaction:
+    """Test parameter redaction for slow-query logs"""
+
+    def test_redact_dict(self):
+        assert redact_parameters({"a": "x", "b": 1, "c": None}) == {"a": "<str>", "b": "<int>", "c": None}
+
+    def test_redact_executemany(self):
+        assert redact_parameters([{"a": 1}, {"a": 2}], executemany=True) == "<2 parameter sets>"
+
+
+class TestServerTimingHeader:
+    """Test that DB totals are reported on responses"""
+
+    def test_server_timing_header_present(self, client):
+        response = client.get("/api/health")
+        assert response.status_code == 200
+        assert "db;dur=" in response.headers["server-timing"]
+
+    def test_metrics_endpoint_lists_db_counters(self, client):
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert "aixiv_db_queries_total" in response.text
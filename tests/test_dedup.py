@@ -0,0 +1,116 @@
+import base64
+import hashlib
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.services.upload_pipeline import PipelineWorker
+from tests.test_upload_pipeline import BUCKET, _pdf, _url, s3  # noqa: F401 (fixture)
+
+SHA256 = hashlib.sha256(b"paper").hexdigest()
+
+
+class TestUploadUrlDedup:
+    """Test /api/get-upload-url with a client-supplied SHA-256"""
+
+    def test_known_hash_skips_the_upload(self, client, s3):
+        blob = SimpleNamespace(sha256=SHA256, s3_url=_url("abc_paper.pdf"))
+        with patch("app.api.submissions.get_file_blob", return_value=blob) as lookup, \
+                patch("app.api.submissions.s3_service", s3), \
+                patch.object(s3, "generate_upload_url") as generate:
+            response = client.post("/api/get-upload-url", json={"filename": "paper.pdf", "sha256": SHA256})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["existing"] is True
+        assert data["upload_url"] is None
+        assert (data["s3_url"], data["file_key"]) == (blob.s3_url, "abc_paper.pdf")
+        assert lookup.call_args[0][1] == SHA256
+        generate.assert_not_called()
+
+    def test_unknown_hash_is_signed_into_the_url(self, client, s3):
+        with patch("app.api.submissions.get_file_blob", return_value=None), \
+                patch("app.api.submissions.s3_service", s3):
+            response = client.post("/api/get-upload-url", json={"filename": "paper.pdf", "sha256": SHA256})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["existing"] is False
+        assert data["checksum_sha256"] == base64.b64encode(hashlib.sha256(b"paper").digest()).decode()
+        assert "x-amz-checksum-sha256=" in data["upload_url"]
+
+    def test_without_hash_the_database_is_not_used(self, client):
+        with patch("app.api.submissions.get_file_blob") as lookup:
+            client.post("/api/get-upload-url", json={"filename": "paper.pdf"})
+        lookup.assert_not_called()
+
+    def test_malformed_hash_is_rejected(self, client):
+        response = client.post("/api/get-upload-url", json={"filename": "paper.pdf", "sha256": "abc"})
+        assert response.status_code == 422
+
+
+@pytest.mark.database
+@pytest.mark.usefixtures("clean_postgres")
+class TestDedupWithPostgres:
+    """End to end: hashes recorded by the pipeline, reference counts, release"""
+
+    def _submit(self, db, key):
+        from app.schemas import SubmissionCreate
+        return crud.create_submission(db, SubmissionCreate(
+            title="Dedup", agent_authors=["Agent"], corresponding_author="Agent", category=["cs.AI"],
+            keywords=["kw"], license="CC-BY-4.0", s3_url=_url(key), uploaded_by="user-1", doc_type="paper",
+        )).id
+
+    def _process(self, engine, s3):
+        worker = PipelineWorker(engine, s3, concurrency=1)
+        try:
+            while worker.run_once():
+                pass
+        finally:
+            worker.stop()
+
+    def _blob(self, engine, sha256):
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT s3_url, ref_count FROM file_blobs WHERE sha256 = :s"),
+                                {"s": sha256}).first()
+
+    def test_duplicate_uploads_share_one_object(self, postgres_engine, s3):
+        data = _pdf(pages=1)
+        digest = hashlib.sha256(data).hexdigest()
+        s3.s3_client.put_object(Bucket=BUCKET, Key="first.pdf", Body=data)
+        s3.s3_client.put_object(Bucket=BUCKET, Key="second.pdf", Body=data)
+
+        with Session(postgres_engine) as db:
+            first = self._submit(db, "first.pdf")
+        self._process(postgres_engine, s3)
+        assert tuple(self._blob(postgres_engine, digest)) == (_url("first.pdf"), 1)
+
+        # Same bytes uploaded under another key: the submission is re-pointed and the copy queued for deletion
+        with Session(postgres_engine) as db:
+            second = self._submit(db, "second.pdf")
+        self._process(postgres_engine, s3)
+        assert tuple(self._blob(postgres_engine, digest)) == (_url("first.pdf"), 2)
+        with postgres_engine.connect() as conn:
+            queued = conn.execute(text("SELECT s3_key, reason FROM s3_deletions")).all()
+        assert [tuple(row) for row in queued] == [("second.pdf", "duplicate_upload")]
+        with Session(postgres_engine) as db:
+            assert crud.get_submission(db, second).s3_url == _url("first.pdf")
+
+            # A client that sends the hash first gets the stored URL, and submitting it counts
+            assert crud.get_file_blob(db, digest.upper()).s3_url == _url("first.pdf")
+            third = self._submit(db, "first.pdf")
+        assert self._blob(postgres_engine, digest).ref_count == 3
+
+        with Session(postgres_engine) as db:
+            assert crud.release_file_blob(db, _url("first.pdf")) is False
+            db.rollback()
+            assert crud.delete_submission(db, first) and crud.delete_submission(db, second)
+            assert self._blob(postgres_engine, digest).ref_count == 1
+            assert crud.delete_submission(db, third)
+        assert self._blob(postgres_engine, digest) is None
+        with Session(postgres_engine) as db:
+            assert crud.get_file_blob(db, digest) is None
+            # Objects that were never indexed have no other users
+            assert crud.release_file_blob(db, _url("unknown.pdf")) is True
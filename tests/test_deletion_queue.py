@@ -0,0 +1,87 @@
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.config import settings
+from app.services.deletion_queue import DeletionSweeper
+from tests.test_upload_pipeline import BUCKET, _url, s3  # noqa: F401 (fixture)
+
+
+class TestDeleteFiles:
+    """Test S3Service.delete_files batching against a moto bucket"""
+
+    def test_batches_of_1000(self, s3):
+        keys = [f"old/{i}.pdf" for i in range(1500)]
+        for key in keys[:3]:
+            s3.s3_client.put_object(Bucket=BUCKET, Key=key, Body=b"x")
+        with patch.object(s3.s3_client, "delete_objects", wraps=s3.s3_client.delete_objects) as delete:
+            assert s3.delete_files(keys) == []
+        assert [len(call.kwargs["Delete"]["Objects"]) for call in delete.call_args_list] == [1000, 500]
+        assert "Contents" not in s3.s3_client.list_objects_v2(Bucket=BUCKET)
+
+
+@pytest.mark.database
+@pytest.mark.usefixtures("clean_postgres")
+class TestSweeperWithPostgres:
+    """End to end: writers queue keys in their transaction, the sweeper deletes them"""
+
+    def _queue(self, engine):
+        with engine.connect() as conn:
+            return {row.s3_key: row for row in conn.execute(text("SELECT * FROM s3_deletions"))}
+
+    def test_queued_keys_are_deleted_in_batches(self, postgres_engine, s3):
+        keys = [f"avatars/u/{i}.webp" for i in range(5)]
+        for key in keys:
+            s3.s3_client.put_object(Bucket=BUCKET, Key=key, Body=b"x")
+        with Session(postgres_engine) as db:
+            crud.enqueue_s3_deletions(db, keys + [keys[0], None], reason="test")
+            db.rollback()
+        assert self._queue(postgres_engine) == {}  # nothing without a commit
+
+        with Session(postgres_engine) as db:
+            crud.enqueue_s3_deletions(db, keys + [keys[0], None], reason="test")
+            db.commit()
+        sweeper = DeletionSweeper(postgres_engine, s3, batch_size=2)
+        with patch.object(s3.s3_client, "delete_objects", wraps=s3.s3_client.delete_objects) as delete:
+            assert [sweeper.run_once() for _ in range(4)] == [2, 2, 1, 0]
+        assert delete.call_count == 3
+        assert self._queue(postgres_engine) == {}
+        assert "Contents" not in s3.s3_client.list_objects_v2(Bucket=BUCKET)
+
+    def test_failures_back_off_then_give_up(self, postgres_engine, s3):
+        with Session(postgres_engine) as db:
+            crud.enqueue_s3_deletions(db, ["a", "b"], reason="test")
+            db.commit()
+        sweeper = DeletionSweeper(postgres_engine, s3)
+
+        with patch.object(s3, "delete_files", return_value=["b"]):
+            assert sweeper.run_once() == 2
+        queue = self._queue(postgres_engine)
+        assert list(queue) == ["b"]
+        assert queue["b"].attempts == 1
+        assert sweeper.run_once() == 0  # not due yet
+
+        with postgres_engine.begin() as conn:
+            conn.execute(text("UPDATE s3_deletions SET run_after = now(), attempts = :n"),
+                         {"n": settings.deletion_max_attempts - 1})
+        with patch.object(s3, "delete_files", side_effect=Exception("SlowDown")):
+            assert sweeper.run_once() == 1
+        assert self._queue(postgres_engine) == {}
+
+    def test_deleting_a_submission_queues_its_files(self, postgres_engine, s3):
+        from app.schemas import SubmissionCreate
+        create = lambda: crud.create_submission(db, SubmissionCreate(
+            title="Gone", agent_authors=["Agent"], corresponding_author="Agent", category=["cs.AI"],
+            keywords=["kw"], license="CC-BY-4.0", s3_url=_url("shared.pdf"), uploaded_by="user-1", doc_type="paper",
+        ))
+        with patch("app.crud.s3_service", s3), Session(postgres_engine) as db:
+            first, second = create().id, create().id
+            assert crud.delete_submission(db, first)
+            assert set(self._queue(postgres_engine)) == {f"thumbnails/submissions/{first}.jpg"}
+            assert crud.delete_submission(db, second)
+        assert set(self._queue(postgres_engine)) == {
+            f"thumbnails/submissions/{first}.jpg", f"thumbnails/submissions/{second}.jpg", "shared.pdf",
+        }
@@ -0,0 +1,114 @@
+from unittest.mock import MagicMock, patch
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.services.download_counter import DownloadCounter
+from tests.test_upload_pipeline import BUCKET, _url, s3  # noqa: F401 (fixture)
+
+KEY = "0f8e4c2a-1b3d-4e5f-8a9b-0c1d2e3f4a5b_my paper.pdf"
+
+
+class TestDownloadUrls:
+    """Test signing and reusing pre-signed download URLs"""
+
+    def test_url_is_reused_for_most_of_its_lifetime(self, s3):
+        with patch("app.services.s3_service.time.monotonic", return_value=1000.0):
+            url = s3.generate_download_url(KEY)
+            assert s3.generate_download_url(KEY) == url
+        query = parse_qs(urlparse(url).query)
+        assert query["response-content-disposition"] == ["attachment; filename*=UTF-8''my%20paper.pdf"]
+
+        with patch("app.services.s3_service.settings.download_url_expiry", 300), \
+                patch.object(s3.s3_client, "generate_presigned_url", return_value="https://signed/again") as sign:
+            with patch("app.services.s3_service.time.monotonic", return_value=1000.0 + 200):
+                assert s3.generate_download_url(KEY) == url
+            with patch("app.services.s3_service.time.monotonic", return_value=1000.0 + 230):
+                assert s3.generate_download_url(KEY) == "https://signed/again"
+        sign.assert_called_once()
+
+    def test_cache_is_bounded(self, s3):
+        with patch("app.services.s3_service.DOWNLOAD_URL_CACHE_SIZE", 2):
+            for key in ("a", "b", "c"):
+                s3.generate_download_url(key)
+        assert list(s3._download_urls) == ["b", "c"]
+
+
+class TestDownloadEndpoint:
+    """Test /api/submissions/{id}/download"""
+
+    def test_redirects_and_counts(self, client, s3):
+        counter = DownloadCounter(MagicMock())
+        with patch("app.api.submissions.get_submission_file_url", return_value=_url(KEY)), \
+                patch("app.api.submissions.s3_service", s3), \
+                patch("app.api.submissions.download_counter", counter):
+            response = client.get("/api/submissions/7/download", follow_redirects=False)
+            client.get("/api/submissions/7/download", follow_redirects=False)
+        assert response.status_code == 302
+        assert response.headers["cache-control"] == "no-store"
+        location = urlparse(response.headers["location"])
+        assert location.netloc.startswith(BUCKET) and "Signature=" in location.query
+        assert counter.pending() == {7: 2}
+
+    def test_unknown_submission(self, client):
+        with patch("app.api.submissions.get_submission_file_url", return_value=None):
+            response = client.get("/api/submissions/7/download", follow_redirects=False)
+        assert response.status_code == 404
+
+    def test_foreign_url_is_passed_through(self, client):
+        with patch("app.api.submissions.get_submission_file_url", return_value="https://example.org/p.pdf"):
+            response = client.get("/api/submissions/7/download", follow_redirects=False)
+        assert response.headers["location"] == "https://example.org/p.pdf"
+
+
+class TestDownloadCounter:
+    """Test the in-memory side of download counting"""
+
+    def test_failed_flush_keeps_the_counts(self):
+        engine = MagicMock()
+        engine.begin.side_effect = RuntimeError("database down")
+        counter = DownloadCounter(engine)
+        counter.record(1)
+        with pytest.raises(RuntimeError):
+            counter.flush()
+        counter.record(1)
+        assert counter.pending() == {1: 2}
+
+    def test_rows_are_locked_in_id_order(self):
+        engine = MagicMock()
+        counter = DownloadCounter(engine)
+        for submission_id in (9, 2, 9, 5):
+            counter.record(submission_id)
+        assert counter.flush() == 3
+        lock, update = engine.begin.return_value.__enter__.return_value.execute.call_args_list
+        assert "ORDER BY id FOR UPDATE" in str(lock.args[0])
+        assert lock.args[1] == {"ids": [2, 5, 9]}
+        assert update.args[1] == {"ids": [2, 5, 9], "counts": [1, 1, 2]}
+
+
+@pytest.mark.database
+@pytest.mark.usefixtures("clean_postgres")
+class TestDownloadCounterFlush:
+    """Test writing batched counts to submissions.downloads"""
+
+    def test_counts_are_added_in_one_batch(self, postgres_engine):
+        from app.schemas import SubmissionCreate
+        with Session(postgres_engine) as db:
+            ids = [crud.create_submission(db, SubmissionCreate(
+                title=f"Paper {i}", agent_authors=["Agent"], corresponding_author="Agent", category=["cs.AI"],
+                keywords=["kw"], license="CC-BY-4.0", s3_url=_url(f"{i}.pdf"), uploaded_by="user-1",
+                doc_type="paper",
+            )).id for i in range(2)]
+            assert crud.get_submission_file_url(db, ids[0]) == _url("0.pdf")
+
+        counter = DownloadCounter(postgres_engine)
+        for submission_id in (ids[0], ids[0], ids[1], ids[0]):
+            counter.record(submission_id)
+        assert counter.flush() == 2
+        assert counter.flush() == 0
+        with postgres_engine.connect() as conn:
+            rows = dict(conn.execute(text("SELECT id, downloads FROM submissions")).all())
+        assert rows == {ids[0]: 3, ids[1]: 1}
@@ -0,0 +1,119 @@
+import asyncio
+import io
+import os
+import threading
+import time
+from concurrent.futures import BrokenExecutor
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from app.executors import BoundedExecutor, ExecutorSaturated, EXECUTOR_TASKS, EXECUTOR_IN_FLIGHT
+from app.services.images import process_avatar_variants
+
+
+def _png(size=(1200, 800), mode="RGBA") -> bytes:
+    buffer = io.BytesIO()
+    Image.new(mode, size, (10, 20, 30, 128) if mode == "RGBA" else (10, 20, 30)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class TestBoundedExecutor:
+    """Test queue limits and metrics of the executor layer"""
+
+    def test_rejects_when_queue_is_full(self):
+        executor = BoundedExecutor("test-full", max_workers=1, max_queue=1)
+        release = threading.Event()
+
+        async def scenario():
+            first = asyncio.ensure_future(executor.run(release.wait))
+            second = asyncio.ensure_future(executor.run(release.wait))
+            await asyncio.sleep(0.05)
+            assert EXECUTOR_IN_FLIGHT.get(executor="test-full") == 2
+            with pytest.raises(ExecutorSaturated):
+                await executor.run(release.wait)
+            release.set()
+            return await asyncio.gather(first, second)
+
+        try:
+            assert asyncio.run(scenario()) == [True, True]
+        finally:
+            executor.shutdown()
+        assert EXECUTOR_TASKS.get(executor="test-full", outcome="rejected") == 1
+        assert EXECUTOR_TASKS.get(executor="test-full", outcome="ok") == 2
+        assert EXECUTOR_IN_FLIGHT.get(executor="test-full") == 0
+
+    def test_errors_propagate_and_free_the_slot(self):
+        executor = BoundedExecutor("test-error", max_workers=1, max_queue=0)
+
+        async def scenario():
+            with pytest.raises(ZeroDivisionError):
+                await executor.run(lambda: 1 / 0)
+            return await executor.run(lambda: 42)
+
+        try:
+            assert asyncio.run(scenario()) == 42
+        finally:
+            executor.shutdown()
+        assert EXECUTOR_TASKS.get(executor="test-error", outcome="error") == 1
+
+    def test_process_pool_runs_image_work(self):
+        executor = BoundedExecutor("test-image", max_workers=1, max_queue=1, processes=True)
+        try:
+            variants = asyncio.run(executor.run(process_avatar_variants, _png(), 10_000_000))
+        finally:
+            executor.shutdown()
+        image = Image.open(io.BytesIO(variants["jpeg"][500]))
+        assert max(image.size) == 500
+        assert image.mode == "RGB"
+
+
+class TestBlockingCall:
+    """Test call(), used by the pipeline's worker threads"""
+
+    def test_waits_for_a_slot_instead_of_rejecting(self):
+        executor = BoundedExecutor("test-call-wait", max_workers=1, max_queue=0)
+        results = []
+        try:
+            threads = [threading.Thread(target=lambda: results.append(executor.call(time.sleep, 0.05)))
+                       for _ in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            executor.shutdown()
+        assert results == [None, None, None]
+        assert EXECUTOR_TASKS.get(executor="test-call-wait", outcome="rejected") == 0
+
+    def test_timeout_recycles_the_process_pool(self):
+        executor = BoundedExecutor("test-call-timeout", max_workers=1, max_queue=0, processes=True)
+        try:
+            with pytest.raises(TimeoutError):
+                executor.call(time.sleep, 60, timeout=3)
+            started = time.monotonic()
+            assert executor.call(max, 1, 2, timeout=30) == 2
+            assert time.monotonic() - started < 30
+        finally:
+            executor.shutdown()
+        assert EXECUTOR_TASKS.get(executor="test-call-timeout", outcome="error") == 1
+
+    def test_a_crashed_process_is_replaced(self):
+        executor = BoundedExecutor("test-call-crash", max_workers=1, max_queue=0, processes=True)
+        try:
+            with pytest.raises(BrokenExecutor):
+                executor.call(os._exit, 1)
+            assert executor.call(max, 3, 4) == 4
+        finally:
+            executor.shutdown()
+
+
+class TestSaturatedEndpoints:
+    """Test that a full executor turns into 503 instead of a queued request"""
+
+    def test_upload_url_returns_503(self, client):
+        with patch("app.api.submissions.s3_executor.run", side_effect=ExecutorSaturated("s3 executor is busy")):
+            response = client.post("/api/get-upload-url", json={"filename": "paper.pdf"})
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
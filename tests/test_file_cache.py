@@ -0,0 +1,186 @@
+import asyncio
+import threading
+import time
+from email.utils import formatdate
+from unittest.mock import patch
+
+import pytest
+
+from app.api.files import RangeNotSatisfiable, parse_range
+from app.services.file_cache import DiskFileCache, file_cache_bytes_saved_total, file_cache_requests_total
+from tests.test_upload_pipeline import BUCKET, s3  # noqa: F401 (fixture)
+
+KEY = "0f8e4c2a-1b3d-4e5f-8a9b-0c1d2e3f4a5b_paper.pdf"
+BODY = bytes(range(256)) * 40  # 10240 bytes
+
+
+def _put(s3, key, body=BODY):
+    s3.s3_client.put_object(Bucket=BUCKET, Key=key, Body=body)
+
+
+def _read(cached):
+    with cached.file:
+        return cached.file.read()
+
+
+class TestDiskFileCache:
+    """Test the LRU, single-flight fetches and rebuilding the index"""
+
+    def test_miss_then_hit(self, s3, tmp_path):
+        _put(s3, KEY)
+        cache = DiskFileCache(s3, str(tmp_path), max_bytes=1 << 20)
+        first = cache.open(KEY)
+        assert not first.from_cache and _read(first) == BODY
+        with patch.object(s3, "download_to", side_effect=AssertionError("fetched twice")):
+            second = cache.open(KEY)
+        assert second.from_cache and _read(second) == BODY
+        assert second.last_modified == pytest.approx(
+            s3.s3_client.head_object(Bucket=BUCKET, Key=KEY)["LastModified"].timestamp())
+        assert cache.open("missing.pdf") is None
+
+    def test_least_recently_used_is_evicted(self, s3, tmp_path):
+        keys = [f"k{i}" for i in range(3)]
+        for key in keys:
+            _put(s3, key)
+        cache = DiskFileCache(s3, str(tmp_path), max_bytes=2 * len(BODY))
+        _read(cache.open("k0"))
+        _read(cache.open("k1"))
+        _read(cache.open("k0"))  # k1 is now the oldest
+        _read(cache.open("k2"))
+        assert cache.total_bytes == 2 * len(BODY)
+        assert cache.open("k0").from_cache and not cache.open("k1").from_cache
+
+        # A new process picks up what is on disk
+        restarted = DiskFileCache(s3, str(tmp_path), max_bytes=2 * len(BODY))
+        assert restarted.open("k1").from_cache and restarted.total_bytes == 2 * len(BODY)
+
+    def test_objects_larger_than_the_cache_are_not_kept(self, s3, tmp_path):
+        _put(s3, KEY)
+        cache = DiskFileCache(s3, str(tmp_path), max_bytes=len(BODY) - 1)
+        assert _read(cache.open(KEY)) == BODY
+        assert cache.total_bytes == 0 and list(tmp_path.iterdir()) == []
+
+    def test_concurrent_misses_fetch_once(self, s3, tmp_path):
+        _put(s3, KEY)
+        cache = DiskFileCache(s3, str(tmp_path), max_bytes=1 << 20)
+        original, calls = s3.download_to, []
+
+        def slow_download(*args, **kwargs):
+            calls.append(1)
+            time.sleep(0.2)
+            return original(*args, **kwargs)
+
+        results = []
+        with patch.object(s3, "download_to", side_effect=slow_download):
+            threads = [threading.Thread(target=lambda: results.append(_read(cache.open(KEY)))) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        assert len(calls) == 1
+        assert results == [BODY] * 8
+
+    def test_concurrent_misses_of_an_oversized_object_fetch_once(self, s3, tmp_path):
+        _put(s3, KEY)
+        cache = DiskFileCache(s3, str(tmp_path), max_bytes=len(BODY) - 1)
+        original, calls = s3.download_to, []
+
+        def slow_download(*args, **kwargs):
+            calls.append(1)
+            time.sleep(0.2)
+            return original(*args, **kwargs)
+
+        with patch.object(s3, "download_to", side_effect=slow_download):
+            results = []
+            leader = threading.Thread(target=lambda: results.append(_read(cache.open(KEY))))
+            leader.start()
+            time.sleep(0.05)
+            # Waiters that don't block get a Future and await it on the event loop
+            futures = [cache.open(KEY, wait=False) for _ in range(4)]
+            leader.join()
+
+        async def join_all():
+            return [_read(await cache.joined(future)) for future in futures]
+
+        assert len(calls) == 1
+        assert results + asyncio.run(join_all()) == [BODY] * 5
+        assert cache.total_bytes == 0 and list(tmp_path.iterdir()) == []
+
+
+class TestParseRange:
+    """Test Range header parsing"""
+
+    @pytest.mark.parametrize("header,expected", [
+        (None, None),
+        ("bytes=0-99", (0, 99)),
+        ("bytes=100-", (100, 999)),
+        ("bytes=-100", (900, 999)),
+        ("bytes=-5000", (0, 999)),
+        ("bytes=990-5000", (990, 999)),
+        ("bytes=0-1,5-6", None),
+        ("items=0-1", None),
+        ("bytes=-", None),
+    ])
+    def test_ranges(self, header, expected):
+        assert parse_range(header, 1000) == expected
+
+    @pytest.mark.parametrize("header", ["bytes=1000-", "bytes=5-2", "bytes=-0"])
+    def test_unsatisfiable(self, header):
+        with pytest.raises(RangeNotSatisfiable):
+            parse_range(header, 1000)
+
+
+class TestFilesEndpoint:
+    """Test /api/files/{key}"""
+
+    @pytest.fixture
+    def cache(self, s3, tmp_path):
+        _put(s3, KEY)
+        cache = DiskFileCache(s3, str(tmp_path), max_bytes=1 << 20)
+        with patch("app.api.files.file_cache", cache), patch("app.api.files.settings.file_cache_enabled", True):
+            yield cache
+
+    def test_full_download(self, client, cache):
+        misses = file_cache_requests_total.get(result="miss")
+        response = client.get(f"/api/files/{KEY}")
+        assert response.status_code == 200
+        assert response.content == BODY
+        assert response.headers["content-type"] == "application/pdf"
+        assert response.headers["accept-ranges"] == "bytes"
+        assert file_cache_requests_total.get(result="miss") == misses + 1
+
+    def test_range_is_served_from_the_cache(self, client, cache):
+        client.get(f"/api/files/{KEY}")
+        saved = file_cache_bytes_saved_total.get()
+        response = client.get(f"/api/files/{KEY}", headers={"Range": "bytes=100-199"})
+        assert response.status_code == 206
+        assert response.content == BODY[100:200]
+        assert response.headers["content-range"] == f"bytes 100-199/{len(BODY)}"
+        assert file_cache_bytes_saved_total.get() == saved + 100
+
+        response = client.get(f"/api/files/{KEY}", headers={"Range": f"bytes={len(BODY)}-"})
+        assert response.status_code == 416
+
+    def test_if_modified_since(self, client, cache):
+        last_modified = client.get(f"/api/files/{KEY}").headers["last-modified"]
+        assert client.get(f"/api/files/{KEY}", headers={"If-Modified-Since": last_modified}).status_code == 304
+        earlier = formatdate(0, usegmt=True)
+        assert client.get(f"/api/files/{KEY}", headers={"If-Modified-Since": earlier}).status_code == 200
+
+    def test_stale_if_range_gets_the_whole_file(self, client, cache):
+        response = client.get(f"/api/files/{KEY}", headers={"Range": "bytes=0-9", "If-Range": formatdate(0, usegmt=True)})
+        assert response.status_code == 200 and response.content == BODY
+
+    def test_head(self, client, cache):
+        response = client.head(f"/api/files/{KEY}")
+        assert response.status_code == 200
+        assert response.headers["content-length"] == str(len(BODY))
+
+    @pytest.mark.parametrize("key", ["archive/paper_review/2025-01.jsonl.gz", "missing.pdf",
+                                     "9a8b7c6d-5e4f-4a3b-2c1d-0e9f8a7b6c5d_missing.pdf"])
+    def test_unknown_keys(self, client, cache, key):
+        assert client.get(f"/api/files/{key}").status_code == 404
+
+    def test_disabled(self, client, cache):
+        with patch("app.api.files.settings.file_cache_enabled", False):
+            assert client.get(f"/api/files/{KEY}").status_code == 404
@@ -0,0 +1,64 @@
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.http_metrics import HTTPMetricsMiddleware, http_request_seconds, http_requests_in_flight, http_requests_total
+
+
+@pytest.fixture
+def metrics_client():
+    app = FastAPI()
+    app.add_middleware(HTTPMetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        assert http_requests_in_flight.get() >= 1
+        return {"id": item_id}
+
+    @app.get("/broken")
+    async def broken():
+        raise RuntimeError("boom")
+
+    return TestClient(app, raise_server_exceptions=False)
+
+
+class TestHTTPMetricsMiddleware:
+    """Test request counters, in-flight gauge and latency per route template"""
+
+    def test_counts_by_route_template_and_status(self, metrics_client):
+        ok = http_requests_total.get(method="GET", route="/items/{item_id}", status=200)
+        invalid = http_requests_total.get(method="GET", route="/items/{item_id}", status=422)
+        observed = http_request_seconds.get(method="GET", route="/items/{item_id}")
+        for path in ("/items/1", "/items/2", "/items/x"):
+            metrics_client.get(path)
+        assert http_requests_total.get(method="GET", route="/items/{item_id}", status=200) == ok + 2
+        assert http_requests_total.get(method="GET", route="/items/{item_id}", status=422) == invalid + 1
+        assert http_request_seconds.get(method="GET", route="/items/{item_id}") == observed + 3
+        assert http_requests_in_flight.get() == 0
+
+    def test_unmatched_errors_and_methods(self, metrics_client):
+        unmatched = http_requests_total.get(method="GET", route="unmatched", status=404)
+        failed = http_requests_total.get(method="GET", route="/broken", status=500)
+        other = http_requests_total.get(method="other", route="/broken", status=405)
+        metrics_client.get("/no/such/path")
+        metrics_client.get("/broken")
+        metrics_client.request("BREW", "/broken")
+        assert http_requests_total.get(method="GET", route="unmatched", status=404) == unmatched + 1
+        assert http_requests_total.get(method="GET", route="/broken", status=500) == failed + 1
+        assert http_requests_total.get(method="other", route="/broken", status=405) == other + 1
+        assert http_requests_in_flight.get() == 0
+
+    def test_disabled(self, metrics_client):
+        before = http_requests_total.get(method="GET", route="/items/{item_id}", status=200)
+        with patch("app.http_metrics.settings.http_metrics", False):
+            metrics_client.get("/items/1")
+        assert http_requests_total.get(method="GET", route="/items/{item_id}", status=200) == before
+
+    def test_app_exports_http_and_pool_metrics(self, client):
+        client.get("/")
+        body = client.get("/metrics").text
+        assert 'aixiv_http_requests_total{method="GET",route="/",status="200"}' in body
+        assert "aixiv_http_request_seconds_bucket" in body
+        assert 'aixiv_db_pool_connections{state="checked_out"} 0' in body
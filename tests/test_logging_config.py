@@ -0,0 +1,93 @@
+import json
+import logging
+import queue
+from unittest.mock import patch
+
+import pytest
+
+from app.logging_config import (
+    DroppingQueueHandler, EventSampler, JSONFormatter, log_records_total, parse_sample_rates, setup_logging,
+    stop_logging,
+)
+from app.tracing import start_trace, use_trace
+
+logger = logging.getLogger("tests.logging")
+
+
+@pytest.fixture
+def log_dir(tmp_path):
+    """setup_logging into tmp_path, with the root logger restored afterwards"""
+    root = logging.getLogger()
+    level, handlers = root.level, list(root.handlers)
+    yield tmp_path
+    stop_logging()
+    root.setLevel(level)
+    root.handlers[:] = handlers
+
+
+def _lines(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+class TestQueueLogging:
+    """Test the queue pipeline, JSON output and rotation"""
+
+    def test_dict_messages_become_json_fields(self, log_dir):
+        setup_logging(str(log_dir), stream=False)
+        trace = start_trace()
+        with use_trace(trace):
+            logger.info({"event": "upload", "size": 3})
+        logger.warning("plain %s", "text", extra={"user": "u1"})
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            logger.exception("failed")
+        stop_logging()
+
+        first, second, third = _lines(log_dir / "app.log")
+        assert (first["event"], first["size"], first["trace_id"]) == ("upload", 3, trace.trace_id)
+        assert (second["message"], second["user"], second["level"]) == ("plain text", "u1", "WARNING")
+        assert "trace_id" not in second
+        assert "ZeroDivisionError" in third["exc_info"]
+
+    def test_rotation(self, log_dir):
+        with patch("app.logging_config.settings.log_max_bytes", 2000), \
+                patch("app.logging_config.settings.log_backup_count", 2):
+            setup_logging(str(log_dir), stream=False)
+            for i in range(100):
+                logger.info({"event": "filler", "i": i, "pad": "x" * 50})
+            stop_logging()
+        assert sorted(p.name for p in log_dir.iterdir()) == ["app.log", "app.log.1", "app.log.2"]
+        assert all(p.stat().st_size <= 2000 for p in log_dir.iterdir())
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = DroppingQueueHandler(queue.Queue(1))
+        dropped = log_records_total.get(outcome="dropped")
+        for _ in range(3):
+            handler.handle(logging.makeLogRecord({"msg": "x", "levelno": logging.INFO}))
+        assert handler.queue.qsize() == 1
+        assert log_records_total.get(outcome="dropped") == dropped + 2
+
+
+class TestSampling:
+    """Test per-event sampling"""
+
+    def test_parse_sample_rates(self):
+        assert parse_sample_rates("submit-review:request=0.1, get-review:request=2,bad,=0.5,x=y") == {
+            "submit-review:request": 0.1, "get-review:request": 1.0}
+
+    def test_only_configured_info_events_are_sampled(self):
+        sampler = EventSampler({"get-review:request": 0.25})
+
+        def record(msg, level=logging.INFO):
+            return logging.makeLogRecord({"msg": msg, "levelno": level})
+
+        with patch("app.logging_config.random.random", return_value=0.5):
+            assert not sampler.filter(record({"event": "get-review:request"}))
+            assert sampler.filter(record({"event": "get-review:request"}, logging.ERROR))
+            assert sampler.filter(record({"event": "submit-review:request"}))
+            assert sampler.filter(record("get-review:request"))
+        with patch("app.logging_config.random.random", return_value=0.1):
+            kept = record({"event": "get-review:request"})
+            assert sampler.filter(kept)
+        assert json.loads(JSONFormatter().format(kept))["sample_rate"] == 0.25
@@ -0,0 +1,33 @@
+from app.metrics import MetricsRegistry
+
+
+class TestHistogram:
+    """Test bucket placement and the exposition format"""
+
+    def test_observations_are_cumulative(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("test_seconds", "Test latency", ("route",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value, route="/a")
+
+        lines = registry.render().splitlines()
+        assert "# TYPE test_seconds histogram" in lines
+        assert 'test_seconds_bucket{route="/a",le="0.1"} 2' in lines
+        assert 'test_seconds_bucket{route="/a",le="1.0"} 3' in lines
+        assert 'test_seconds_bucket{route="/a",le="+Inf"} 4' in lines
+        assert 'test_seconds_count{route="/a"} 4' in lines
+        assert histogram.get(route="/a") == 4
+        assert histogram.get_sum(route="/a") == 3.65
+
+
+class TestHooks:
+    """Test scrape-time hooks"""
+
+    def test_hooks_run_on_render(self):
+        registry = MetricsRegistry()
+        gauge = registry.gauge("test_queue_depth", "Test gauge")
+        depth = iter((3, 5))
+        registry.register_hook(lambda: gauge.set(next(depth)))
+        registry.register_hook(lambda: 1 / 0)
+        assert "test_queue_depth 3" in registry.render().splitlines()
+        assert "test_queue_depth 5" in registry.render().splitlines()
@@ -0,0 +1,150 @@
+from datetime import timedelta
+from unittest.mock import Mock, patch
+
+import boto3
+import pytest
+import requests
+from botocore.exceptions import ClientError
+from moto import mock_aws
+
+from app.services.s3_service import s3_service, MIB, MULTIPART_MAX_PARTS
+from app.services.upload_cleanup import (
+    LIFECYCLE_RULE_ID,
+    abort_stale_multipart_uploads,
+    configure_multipart_lifecycle,
+)
+
+PART_SIZE = 5 * MIB  # S3's minimum for every part but the last
+
+
+@pytest.fixture
+def s3():
+    """s3_service backed by an in-memory moto bucket"""
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1",
+                              aws_access_key_id="testing", aws_secret_access_key="testing")
+        client.create_bucket(Bucket="test-bucket")
+        original_client, original_bucket = s3_service._s3_client, s3_service.bucket_name
+        s3_service.s3_client = client
+        s3_service.bucket_name = "test-bucket"
+        try:
+            yield client
+        finally:
+            s3_service.s3_client = original_client
+            s3_service.bucket_name = original_bucket
+
+
+def _put_parts(client, upload, chunks):
+    """PUT each chunk to its pre-signed part URL, as a browser would"""
+    response = client.post("/api/multipart-upload/part-urls", json={
+        "file_key": upload["file_key"], "upload_id": upload["upload_id"],
+        "part_numbers": list(range(1, len(chunks) + 1)),
+    })
+    assert response.status_code == 200
+    parts = []
+    for part, chunk in zip(response.json()["parts"], chunks):
+        put = requests.put(part["upload_url"], data=chunk)
+        assert put.status_code == 200
+        parts.append({"part_number": part["part_number"], "etag": put.headers["ETag"]})
+    return parts
+
+
+class TestMultipartUploadFlow:
+    """Test initiate / sign / complete / abort against a moto bucket"""
+
+    def test_full_upload(self, client, s3):
+        response = client.post("/api/multipart-upload/initiate", json={"filename": "big paper.pdf"})
+        assert response.status_code == 200
+        upload = response.json()
+        assert upload["file_key"].endswith("_big_paper.pdf")
+        assert upload["content_type"] == "application/pdf"
+
+        chunks = [b"a" * PART_SIZE, b"b" * PART_SIZE, b"tail"]
+        parts = _put_parts(client, upload, chunks)
+
+        # Parts may be completed in any order
+        response = client.post("/api/multipart-upload/complete", json={
+            "file_key": upload["file_key"], "upload_id": upload["upload_id"], "parts": parts[::-1],
+        })
+        assert response.status_code == 200
+        assert response.json()["s3_url"] == upload["s3_url"]
+
+        obj = s3.get_object(Bucket="test-bucket", Key=upload["file_key"])
+        assert obj["ContentLength"] == 2 * PART_SIZE + 4
+        assert obj["ContentType"] == "application/pdf"
+
+    def test_resume_lists_uploaded_parts(self, client, s3):
+        upload = client.post("/api/multipart-upload/initiate", json={"filename": "paper.tex"}).json()
+        _put_parts(client, upload, [b"x" * PART_SIZE])
+
+        response = client.post("/api/multipart-upload/list-parts", json={
+            "file_key": upload["file_key"], "upload_id": upload["upload_id"],
+        })
+        assert response.status_code == 200
+        assert [(p["part_number"], p["size"]) for p in response.json()] == [(1, PART_SIZE)]
+
+    def test_abort_discards_parts(self, client, s3):
+        upload = client.post("/api/multipart-upload/initiate", json={"filename": "paper.pdf"}).json()
+        ref = {"file_key": upload["file_key"], "upload_id": upload["upload_id"]}
+
+        assert client.post("/api/multipart-upload/abort", json=ref).json()["aborted"] is True
+        assert s3.list_multipart_uploads(Bucket="test-bucket").get("Uploads", []) == []
+        # Aborting twice is harmless; the upload is gone for resuming clients
+        assert client.post("/api/multipart-upload/abort", json=ref).json()["aborted"] is False
+        assert client.post("/api/multipart-upload/list-parts", json=ref).status_code == 404
+
+    def test_completing_unknown_upload_is_client_error(self, client):
+        error = ClientError({"Error": {"Code": "NoSuchUpload", "Message": "gone"}}, "CompleteMultipartUpload")
+        with patch.object(s3_service, "_s3_client", Mock(**{"complete_multipart_upload.side_effect": error})):
+            response = client.post("/api/multipart-upload/complete", json={
+                "file_key": "k", "upload_id": "u", "parts": [{"part_number": 1, "etag": '"abc"'}],
+            })
+        assert response.status_code == 400
+
+
+class TestMultipartValidation:
+    """Test request validation before anything reaches S3"""
+
+    def test_rejects_non_paper_files(self, client, s3):
+        response = client.post("/api/multipart-upload/initiate", json={"filename": "notes.txt"})
+        assert response.status_code == 400
+        assert "Only PDF and LaTeX files" in response.json()["detail"]
+
+    def test_part_size_grows_for_huge_files(self):
+        file_size = 500 * 1024 * MIB
+        part_size = s3_service._multipart_part_size(file_size)
+        assert part_size % MIB == 0
+        assert file_size / part_size <= MULTIPART_MAX_PARTS
+
+    @pytest.mark.parametrize("part_numbers", [[], [0], [MULTIPART_MAX_PARTS + 1], [1, 1], list(range(1, 1000))])
+    def test_rejects_bad_part_numbers(self, part_numbers):
+        with pytest.raises(ValueError):
+            s3_service.generate_part_upload_urls("key", "upload", part_numbers)
+
+
+class TestMultipartCleanup:
+    """Test the lifecycle rule and the stale-upload sweep"""
+
+    def test_lifecycle_rule_keeps_other_rules(self, s3):
+        s3.put_bucket_lifecycle_configuration(Bucket="test-bucket", LifecycleConfiguration={"Rules": [
+            {"ID": "expire-tmp", "Status": "Enabled", "Filter": {"Prefix": "tmp/"}, "Expiration": {"Days": 7}},
+        ]})
+        configure_multipart_lifecycle(s3_service, 2)
+        configure_multipart_lifecycle(s3_service, 3)
+
+        rules = {r["ID"]: r for r in s3.get_bucket_lifecycle_configuration(Bucket="test-bucket")["Rules"]}
+        assert set(rules) == {"expire-tmp", LIFECYCLE_RULE_ID}
+        assert rules[LIFECYCLE_RULE_ID]["AbortIncompleteMultipartUpload"] == {"DaysAfterInitiation": 3}
+
+    def test_sweep_aborts_only_stale_uploads(self, s3):
+        s3_service.create_multipart_upload("old.pdf")
+        initiated = s3.list_multipart_uploads(Bucket="test-bucket")["Uploads"][0]["Initiated"]
+        later = initiated + timedelta(days=2)
+
+        assert abort_stale_multipart_uploads(s3_service, timedelta(days=3), now=later) == []
+        stale = abort_stale_multipart_uploads(s3_service, timedelta(days=1), dry_run=True, now=later)
+        assert len(stale) == 1
+        assert len(s3.list_multipart_uploads(Bucket="test-bucket")["Uploads"]) == 1
+
+        abort_stale_multipart_uploads(s3_service, timedelta(days=1), now=later)
+        assert s3.list_multipart_uploads(Bucket="test-bucket").get("Uploads", []) == []
@@ -0,0 +1,104 @@
+import json
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.services.s3_service import key_kind
+from app.services.upload_cleanup import _url_forms, collect_orphaned_objects
+from tests.test_upload_pipeline import BUCKET, _url, s3  # noqa: F401 (fixture)
+
+PAPER = "0f8e4c2a-1b3d-4e5f-8a9b-0c1d2e3f4a5b_paper.pdf"
+ORPHAN = "9a8b7c6d-5e4f-4a3b-2c1d-0e9f8a7b6c5d_draft.pdf"
+LATER = datetime.now(timezone.utc) + timedelta(days=8)
+
+
+class TestOrphanKeys:
+    """Test which keys the collector manages and how references are spelled"""
+
+    @pytest.mark.parametrize("key,kind", [
+        (PAPER, "paper"),
+        ("avatars/user-1/abc/32.webp", "avatar"),
+        ("avatars/legacy.jpg", "avatar"),
+        ("thumbnails/submissions/42.jpg", "thumbnail"),
+        ("reviews/2025/01.jsonl.gz", None),
+        ("thumbnails/other/42.jpg", None),
+        ("paper.pdf", None),
+    ])
+    def test_key_kind(self, key, kind):
+        assert key_kind(key) == kind
+
+    def test_url_forms(self):
+        service = MagicMock(bucket_name=BUCKET)
+        urls = _url_forms(service, "0f8e_my paper.pdf")
+        assert f"https://{BUCKET}.s3.amazonaws.com/0f8e_my paper.pdf" in urls
+        assert any(url.endswith("/0f8e_my%20paper.pdf") for url in urls)
+
+
+@pytest.mark.database
+@pytest.mark.usefixtures("clean_postgres")
+class TestOrphanCollector:
+    """End to end against a moto bucket and PostgreSQL"""
+
+    def _submit(self, postgres_engine, s3, url):
+        from app.schemas import SubmissionCreate
+        with patch("app.crud.s3_service", s3), Session(postgres_engine) as db:
+            return crud.create_submission(db, SubmissionCreate(
+                title="Kept", agent_authors=["Agent"], corresponding_author="Agent", category=["cs.AI"],
+                keywords=["kw"], license="CC-BY-4.0", s3_url=url, uploaded_by="user-1", doc_type="paper",
+            ))
+
+    @pytest.fixture
+    def bucket(self, postgres_engine, s3):
+        submission = self._submit(postgres_engine, s3, _url(PAPER))
+        with postgres_engine.begin() as conn:
+            conn.execute(text("""
+                INSERT INTO user_profiles (user_id, name, avatar_url, avatar_variants)
+                VALUES ('user-1', 'User', :url, CAST(:variants AS jsonb))
+            """), {"url": _url("avatars/user-1/new/500.jpeg"), "variants": json.dumps(
+                {"jpeg": {"500": _url("avatars/user-1/new/500.jpeg")},
+                 "webp": {"32": _url("avatars/user-1/new/32.webp")}})})
+        kept = [PAPER, "avatars/user-1/new/500.jpeg", "avatars/user-1/new/32.webp",
+                f"thumbnails/submissions/{submission.id}.jpg", "reviews/archive.jsonl.gz"]
+        orphans = [ORPHAN, "avatars/user-1/old/32.webp", f"thumbnails/submissions/{submission.id + 1}.jpg"]
+        for key in kept + orphans:
+            s3.s3_client.put_object(Bucket=BUCKET, Key=key, Body=b"x" * 10)
+        return kept, orphans
+
+    def _keys(self, s3):
+        return {o["Key"] for o in s3.s3_client.list_objects_v2(Bucket=BUCKET).get("Contents", [])}
+
+    def test_unreferenced_objects_are_deleted_page_by_page(self, postgres_engine, s3, bucket):
+        kept, orphans = bucket
+        stats = collect_orphaned_objects(postgres_engine, s3, timedelta(days=7), now=LATER, page_size=2)
+        assert self._keys(s3) == set(kept)
+        assert stats["scanned"] == len(kept) + len(orphans)
+        assert (stats["orphaned"], stats["deleted"], stats["failed"]) == (3, 3, 0)
+        assert (stats["unmanaged"], stats["orphaned_bytes"]) == (1, 30)
+
+    def test_dry_run_and_grace_period(self, postgres_engine, s3, bucket):
+        kept, orphans = bucket
+        stats = collect_orphaned_objects(postgres_engine, s3, timedelta(days=7), dry_run=True, now=LATER)
+        assert stats["orphaned"] == 3 and stats["deleted"] == 0
+        # Fresh uploads may still be on their way to becoming a submission
+        stats = collect_orphaned_objects(postgres_engine, s3, timedelta(days=7))
+        assert stats["recent"] == len(kept) + len(orphans) - 1 and stats["orphaned"] == 0
+        assert self._keys(s3) == set(kept + orphans)
+
+    def test_any_spelling_of_a_paper_url_keeps_the_paper(self, postgres_engine, s3):
+        other = "5c4b3a29-1807-4f6e-9d5c-4b3a29180766_other.pdf"
+        legacy = "7e6d5c4b-3a29-4180-8f6e-5d4c3b2a1908_legacy.pdf"
+        self._submit(postgres_engine, s3, f"http://{BUCKET}.s3.eu-west-1.amazonaws.com/{other}?versionId=1")
+        # A row written before s3_key existed is resolved from its URL
+        submission = self._submit(postgres_engine, s3, f"https://s3.eu-west-1.amazonaws.com/{BUCKET}/{legacy}")
+        with postgres_engine.begin() as conn:
+            conn.execute(text("UPDATE submissions SET s3_key = NULL WHERE id = :id"), {"id": submission.id})
+        for key in (other, legacy, ORPHAN):
+            s3.s3_client.put_object(Bucket=BUCKET, Key=key, Body=b"x")
+
+        stats = collect_orphaned_objects(postgres_engine, s3, timedelta(days=7), now=LATER)
+        assert (stats["referenced"], stats["deleted"]) == (2, 1)
+        assert self._keys(s3) == {other, legacy}
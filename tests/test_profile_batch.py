@@ -0,0 +1,105 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.database import get_db
+from app.main import app
+from app.schemas import ProfileSummary
+from app.services.profile_cache import ProfileCache, profile_cache
+
+
+def _summary(user_id, name="Name"):
+    return ProfileSummary(user_id=user_id, name=name)
+
+
+@pytest.fixture(autouse=True)
+def _empty_cache():
+    profile_cache.clear()
+    yield
+    profile_cache.clear()
+
+
+class TestProfileCache:
+    """Test expiry, eviction and invalidation of cached profile summaries"""
+
+    def test_hits_misses_and_expiry(self):
+        cache = ProfileCache(ttl=60, max_entries=10)
+        with patch("app.services.profile_cache.time.monotonic", return_value=100.0):
+            cache.put_many({"a": _summary("a"), "b": None}, cache.generation())
+            assert cache.get_many(["a", "b", "c"]) == ({"a": _summary("a"), "b": None}, ["c"])
+        with patch("app.services.profile_cache.time.monotonic", return_value=161.0):
+            assert cache.get_many(["a"]) == ({}, ["a"])
+
+    def test_invalidation_wins_over_a_concurrent_read(self):
+        cache = ProfileCache(ttl=60, max_entries=10)
+        cache.put_many({"a": _summary("a", "Old")}, cache.generation())
+        generation = cache.generation()  # a batch starts reading "Old"
+        cache.invalidate("a")  # the profile is updated meanwhile
+        cache.put_many({"a": _summary("a", "Old")}, generation)
+        assert cache.get_many(["a"]) == ({}, ["a"])
+        cache.put_many({"a": _summary("a", "New")}, cache.generation())
+        assert cache.get_many(["a"])[0] == {"a": _summary("a", "New")}
+
+    def test_least_recently_used_is_dropped(self):
+        cache = ProfileCache(ttl=60, max_entries=2)
+        cache.put_many({"a": None, "b": None}, cache.generation())
+        cache.get_many(["a"])
+        cache.put_many({"c": None}, cache.generation())
+        assert cache.get_many(["a", "b", "c"])[1] == ["b"]
+
+
+class TestProfilesBatchEndpoint:
+    """Test /api/profiles/batch"""
+
+    @pytest.fixture
+    def db(self):
+        db = MagicMock()
+        db.connection.return_value.execute.return_value = [
+            SimpleNamespace(user_id="u2", name="Two", affiliation="Lab", avatar_url="https://a/500.jpeg",
+                            avatar_variants={"webp": {"64": "https://a/64.webp", "32": "https://a/32.webp"}}),
+            SimpleNamespace(user_id="u1", name="One", affiliation=None, avatar_url=None, avatar_variants=None),
+        ]
+        app.dependency_overrides[get_db] = lambda: db
+        yield db
+        app.dependency_overrides.pop(get_db, None)
+
+    def test_one_query_in_request_order(self, client, db):
+        response = client.get("/api/profiles/batch", params={"ids": "u1,u2,u3,u1"})
+        assert response.status_code == 200
+        assert response.json() == [
+            {"user_id": "u1", "name": "One", "affiliation": None, "avatar_url": None, "avatar_srcset": None},
+            {"user_id": "u2", "name": "Two", "affiliation": "Lab", "avatar_url": "https://a/500.jpeg",
+             "avatar_srcset": {"webp": "https://a/32.webp 32w, https://a/64.webp 64w"}},
+        ]
+        execute = db.connection.return_value.execute
+        assert execute.call_count == 1
+        assert execute.call_args[0][1] == {"user_ids": ["u1", "u2", "u3"]}
+
+        # Repeated ids work too, and everything (including the unknown u3) is now cached
+        response = client.get("/api/profiles/batch?ids=u3&ids=u2")
+        assert [p["user_id"] for p in response.json()] == ["u2"]
+        assert execute.call_count == 1
+
+    def test_limits(self, client, db):
+        assert client.get("/api/profiles/batch", params={"ids": ","}).status_code == 400
+        ids = ",".join(f"u{i}" for i in range(101))
+        assert client.get("/api/profiles/batch", params={"ids": ids}).status_code == 400
+
+
+@pytest.mark.database
+@pytest.mark.usefixtures("clean_postgres")
+class TestProfileSummariesWithPostgres:
+    """Test the IN query and invalidation on profile updates"""
+
+    def test_update_invalidates(self, postgres_engine):
+        with Session(postgres_engine) as db:
+            crud.create_or_update_profile(db, {"user_id": "u1", "name": "One", "affiliation": "Lab"})
+            assert crud.get_profile_summaries(db, ["u1", "u2"]) == {
+                "u1": ProfileSummary(user_id="u1", name="One", affiliation="Lab")}
+            crud.create_or_update_profile(db, {"user_id": "u1", "name": "Uno"})
+            crud.create_or_update_profile(db, {"user_id": "u2", "name": "Two"})
+            summaries = crud.get_profile_summaries(db, ["u1", "u2"])
+        assert {user_id: s.name for user_id, s in summaries.items()} == {"u1": "Uno", "u2": "Two"}
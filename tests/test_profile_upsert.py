@@ -0,0 +1,112 @@
+import io
+import threading
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.auth import get_current_user
+from app.database import get_db
+from app.main import app
+from app.services.profile_import import read_profiles
+
+
+class TestReadProfiles:
+    """Test parsing bulk import files"""
+
+    def test_jsonl(self):
+        data = io.StringIO('{"user_id": "u1", "name": "One", "extra": 1}\n\n{"user_id": "u2"}\n')
+        assert list(read_profiles(data, "jsonl")) == [{"user_id": "u1", "name": "One", "extra": 1}]
+
+    def test_csv_blank_cells_are_none(self):
+        data = io.StringIO("user_id,name,affiliation\nu1,One,\n,Nobody,Lab\n")
+        assert list(read_profiles(data, "csv")) == [{"user_id": "u1", "name": "One", "affiliation": None}]
+
+
+@pytest.mark.database
+@pytest.mark.usefixtures("clean_postgres")
+class TestProfileUpsert:
+    """Test INSERT ... ON CONFLICT profile writes against PostgreSQL"""
+
+    def _statements(self, engine):
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        return statements
+
+    def _profile(self, engine, user_id):
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT * FROM user_profiles WHERE user_id = :u"), {"u": user_id}).first()
+
+    def test_insert_then_partial_update(self, postgres_engine):
+        statements = self._statements(postgres_engine)
+        with Session(postgres_engine) as db:
+            created = crud.create_or_update_profile(db, {"user_id": "u1", "name": "One", "affiliation": "Lab",
+                                                         "avatar_url": "https://a/1.jpeg",
+                                                         "avatar_variants": {"webp": {"32": "https://a/32.webp"}}})
+            assert created.name == "One" and created.id is not None
+            assert [s for s in statements if not s.startswith("BEGIN")] == [statements[-1]]
+
+            updated = crud.create_or_update_profile(db, {"user_id": "u1", "name": "Uno", "affiliation": None,
+                                                         "avatar_url": "https://a/1.jpeg"})
+        assert (updated.id, updated.name, updated.affiliation) == (created.id, "Uno", "Lab")
+        # Same avatar: variants are kept
+        assert updated.avatar_variants == {"webp": {"32": "https://a/32.webp"}}
+        assert updated.updated_at >= created.updated_at and updated.created_at == created.created_at
+
+        with Session(postgres_engine) as db:
+            crud.create_or_update_profile(db, {"user_id": "u1", "name": "Uno", "avatar_url": "https://b/2.jpeg"})
+        assert self._profile(postgres_engine, "u1").avatar_variants is None
+
+    def test_concurrent_first_writes(self, postgres_engine):
+        barrier, errors = threading.Barrier(4), []
+
+        def write(n):
+            try:
+                with Session(postgres_engine) as db:
+                    barrier.wait()
+                    crud.create_or_update_profile(db, {"user_id": "racer", "name": f"Name {n}"})
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=write, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        with postgres_engine.connect() as conn:
+            assert conn.execute(text("SELECT count(*) FROM user_profiles WHERE user_id = 'racer'")).scalar() == 1
+
+    def test_bulk_upsert(self, postgres_engine):
+        with Session(postgres_engine) as db:
+            crud.create_or_update_profile(db, {"user_id": "u0", "name": "Zero", "bio": "kept"})
+        profiles = [{"user_id": f"u{i}", "name": f"User {i}", "email": f"u{i}@example.org"} for i in range(2500)]
+        # In another chunk than the first u1: upserted again, keeping its email
+        profiles.append({"user_id": "u1", "name": "User 1", "affiliation": "Lab"})
+
+        statements = self._statements(postgres_engine)
+        with Session(postgres_engine) as db:
+            assert crud.bulk_upsert_profiles(db, profiles, chunk_size=2000) == 2501
+        assert len([s for s in statements if s.startswith("INSERT")]) == 2
+        with postgres_engine.connect() as conn:
+            assert conn.execute(text("SELECT count(*) FROM user_profiles")).scalar() == 2500
+        zero = self._profile(postgres_engine, "u0")
+        assert (zero.name, zero.bio, zero.email) == ("User 0", "kept", "u0@example.org")
+        one = self._profile(postgres_engine, "u1")
+        assert (one.email, one.affiliation) == ("u1@example.org", "Lab")
+
+    def test_update_endpoint(self, client, postgres_engine):
+        def db():
+            with Session(postgres_engine) as session:
+                yield session
+
+        app.dependency_overrides[get_db] = db
+        app.dependency_overrides[get_current_user] = lambda: {"user_id": "u1"}
+        try:
+            response = client.put("/api/profile/update", json={"user_id": "u1", "name": "One", "github": "octo"})
+        finally:
+            app.dependency_overrides.pop(get_db, None)
+            app.dependency_overrides.pop(get_current_user, None)
+        assert response.status_code == 200
+        assert response.json()["github_url"] == "https://github.com/octo"
@@ -0,0 +1,204 @@
+"""
+EXPLAIN-based plan regression tests for the crud queries.
+
+Runs the migrations against a scratch Postgres, seeds realistic volumes, runs
+each crud function while capturing its SELECT statements, EXPLAINs them with
+the real parameters and fails on sequential scans over large tables or when a
+query stops using the index recorded in EXPECTED_INDEXES.
+
+The database named by PLAN_TEST_DATABASE_URL is wiped (schema public is
+dropped and recreated), so never point it at real data:
+    PLAN_TEST_DATABASE_URL=postgresql://postgres@localhost:5432/aixiv_plans pytest -m database
+PLAN_TEST_SCALE multiplies the seeded row counts (default 1).
+"""
+import os
+import re
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.schemas import SubmissionVersionCreate
+
+PLAN_TEST_DATABASE_URL = os.getenv("PLAN_TEST_DATABASE_URL")
+SCALE = float(os.getenv("PLAN_TEST_SCALE", "1"))
+
+pytestmark = [
+    pytest.mark.database,
+    pytest.mark.skipif(not PLAN_TEST_DATABASE_URL, reason="PLAN_TEST_DATABASE_URL not set"),
+]
+
+# Tables smaller than this may be sequentially scanned; the planner is right to
+# prefer that
+MIN_ROWS_FOR_INDEX = 1000
+
+AIXIV_ID = "aixiv.250301.000042"
+USER_ID = "user-00042"
+
+# query name -> pattern every index used by the plan must match. Where several
+# indexes lead with the same column the planner may pick any of them.
+EXPECTED_INDEXES = {
+    "generate_aixiv_id": r"^ix_submissions_aixiv_id",
+    "get_submission": r"^(submissions_pkey|ix_submissions_id)$",
+    "get_submissions_by_user": r"^ix_submissions_uploaded_by$",
+    "check_if_exist": r"^ix_submissions_aixiv_id",
+    "create_submission_version": r"^ix_submissions_aixiv_id_created_at$",
+    "get_profile_by_user_id": r"^ix_user_profiles_user_id$",
+    "get_reviews": r"aixiv_id",
+    "count_reviews": r"aixiv_id_version_doc_type_ip",
+}
+
+
+@pytest.fixture(scope="module")
+def engine():
+    from alembic import command
+    from alembic.config import Config
+    from app.config import settings
+    from app.startup import ALEMBIC_INI, PROJECT_ROOT
+
+    engine = create_engine(PLAN_TEST_DATABASE_URL)
+    with engine.begin() as conn:
+        conn.execute(text("DROP SCHEMA public CASCADE"))
+        conn.execute(text("CREATE SCHEMA public"))
+
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("script_location", os.path.join(PROJECT_ROOT, "alembic"))
+    with patch.object(settings, "database_url", PLAN_TEST_DATABASE_URL):
+        command.upgrade(config, "head")
+
+    _seed(engine)
+    yield engine
+    engine.dispose()
+
+
+def _seed(engine):
+    submissions = int(20000 * SCALE)
+    profiles = int(5000 * SCALE)
+    reviews = int(200000 * SCALE)
+    with engine.begin() as conn:
+        # Up to three versions per paper, spread over the last year
+        conn.execute(text("""
+            INSERT INTO submissions (title, agent_authors, corresponding_author, category, keywords, license,
+                                     abstract, s3_url, uploaded_by, aixiv_id, version, doc_type, status,
+                                     views, downloads, comments, citations, created_at)
+            SELECT 'Paper ' || g, ARRAY['Agent ' || (g % 97)], 'Agent', ARRAY['cs.AI'], ARRAY['kw'], 'CC-BY-4.0',
+                   repeat('abstract ', 40), 'https://example.com/' || g || '.pdf',
+                   'user-' || lpad((g % :profiles)::text, 5, '0'),
+                   'aixiv.' || to_char(now() - (g % 365) * interval '1 day', 'YYMMDD') || '.' || lpad((g / 3)::text, 6, '0'),
+                   (1 + g % 3) || '.0', CASE WHEN g % 4 = 0 THEN 'proposal' ELSE 'paper' END, 'Under Review',
+                   0, 0, 0, 0, now() - (g % 365) * interval '1 day'
+            FROM generate_series(1, :submissions) g
+        """), {"submissions": submissions, "profiles": profiles})
+        conn.execute(text("""
+            INSERT INTO submissions (title, agent_authors, corresponding_author, category, keywords, license,
+                                     s3_url, uploaded_by, aixiv_id, version, doc_type, status,
+                                     views, downloads, comments, citations)
+            VALUES ('Target', ARRAY['Agent'], 'Agent', ARRAY['cs.AI'], ARRAY['kw'], 'CC-BY-4.0',
+                    'https://example.com/t.pdf', :user_id, :aixiv_id, '1.0', 'paper', 'Under Review', 0, 0, 0, 0)
+        """), {"user_id": USER_ID, "aixiv_id": AIXIV_ID})
+        conn.execute(text("""
+            INSERT INTO user_profiles (user_id, name, affiliation)
+            SELECT 'user-' || lpad(g::text, 5, '0'), 'User ' || g, 'Lab ' || (g % 50)
+            FROM generate_series(0, :profiles) g
+        """), {"profiles": profiles})
+        conn.execute(text("""
+            INSERT INTO paper_review (aixiv_id, version, review_results, agent_type, doc_type, create_time, ip)
+            SELECT 'aixiv.250301.' || lpad((g % (:reviews / 10))::text, 6, '0'), (1 + g % 3) || '.0',
+                   '{"score": 5}'::jsonb, g % 3, g % 2, now() - (g % 300) * interval '1 day',
+                   '10.0.' || (g % 250) || '.' || (g % 200)
+            FROM generate_series(1, :reviews) g
+        """), {"reviews": reviews})
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("ANALYZE"))
+
+
+def _capture(engine, fn):
+    """Run fn(session) and return the SELECT statements it executed with their parameters"""
+    captured = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        session = Session(bind=connection, join_transaction_mode="create_savepoint")
+        event.listen(connection, "before_cursor_execute", _record)
+        try:
+            fn(session)
+        finally:
+            event.remove(connection, "before_cursor_execute", _record)
+            session.close()
+            transaction.rollback()
+    return captured
+
+
+def _plan_nodes(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def _explain(engine, statement, parameters):
+    with engine.connect() as conn:
+        plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+        nodes = list(_plan_nodes(plan[0]["Plan"]))
+        relations = {n["Relation Name"] for n in nodes if "Relation Name" in n}
+        sizes = dict(conn.execute(
+            text("SELECT relname, reltuples FROM pg_class WHERE relname = ANY(:names)"),
+            {"names": list(relations)},
+        ).all())
+    return nodes, sizes
+
+
+CRUD_QUERIES = {
+    "generate_aixiv_id": lambda db: crud.generate_aixiv_id(db),
+    "get_submission": lambda db: crud.get_submission(db, 4242),
+    "get_submissions_by_user": lambda db: crud.get_submissions_by_user(db, USER_ID),
+    "check_if_exist": lambda db: crud.check_if_exist(db, AIXIV_ID, "1.0", "paper"),
+    "create_submission_version": lambda db: crud.create_submission_version(
+        db,
+        SubmissionVersionCreate(
+            title="Target v2", agent_authors=["Agent"], corresponding_author="Agent", category=["cs.AI"],
+            keywords=["kw"], license="CC-BY-4.0", s3_url="https://example.com/t2.pdf", doc_type="paper",
+            uploaded_by=USER_ID,
+        ),
+        AIXIV_ID,
+    ),
+    "get_profile_by_user_id": lambda db: crud.get_profile_by_user_id(db, USER_ID),
+    "get_reviews": lambda db: crud.get_reviews(db, "aixiv.250301.000042", version="1.0"),
+    "count_reviews": lambda db: crud.count_reviews(
+        db, "aixiv.250301.000042", datetime.utcnow() - timedelta(hours=1), datetime.utcnow(),
+        "1.0", "10.0.42.42", 1,
+    ),
+}
+
+
+@pytest.mark.parametrize("name", sorted(CRUD_QUERIES))
+def test_query_plan(engine, name):
+    statements = _capture(engine, CRUD_QUERIES[name])
+    assert statements, f"{name} executed no SELECT"
+
+    # Only the first SELECT is the query under test (later ones are refreshes)
+    nodes, sizes = _explain(engine, *statements[0])
+
+    seq_scans = [
+        n["Relation Name"] for n in nodes
+        if n["Node Type"] == "Seq Scan" and sizes.get(n["Relation Name"], 0) >= MIN_ROWS_FOR_INDEX
+    ]
+    assert not seq_scans, f"{name} sequentially scans {seq_scans}"
+
+    indexes = {n["Index Name"] for n in nodes if "Index Name" in n}
+    assert indexes, f"{name} uses no index"
+    unexpected = [i for i in indexes if not re.search(EXPECTED_INDEXES[name], i)]
+    assert not unexpected, f"{name} plan changed: uses {sorted(unexpected)}, expected /{EXPECTED_INDEXES[name]}/"
+
+
+def test_public_listing_is_bounded(engine):
+    """get_submissions has no filter; a seq scan is fine as long as LIMIT stops it early"""
+    statements = _capture(engine, lambda db: crud.get_submissions(db, skip=0, limit=100))
+    nodes, _ = _explain(engine, *statements[0])
+    assert nodes[0]["Node Type"] == "Limit"
@@ -0,0 +1,93 @@
+from datetime import date
+from unittest.mock import MagicMock, Mock
+
+import pytest
+
+from app.services import review_retention
+from app.services.review_retention import (
+    ReviewPartition,
+    archive_partition,
+    partitions_to_archive,
+    retention_cutoff,
+    run_retention,
+)
+
+
+def _partition(year, month, attached=True):
+    return ReviewPartition(f"paper_review_{year}_{month:02d}", date(year, month, 1), attached)
+
+
+class TestRetentionWindow:
+    """Test which monthly partitions fall outside the retention window"""
+
+    def test_cutoff_crosses_year_boundary(self):
+        assert retention_cutoff(12, today=date(2026, 3, 15)) == date(2025, 3, 1)
+        assert retention_cutoff(3, today=date(2026, 2, 1)) == date(2025, 11, 1)
+
+    def test_only_older_partitions_are_archived(self):
+        partitions = [_partition(2025, 1), _partition(2025, 2), _partition(2025, 3), _partition(2026, 3)]
+        expired = partitions_to_archive(partitions, 12, today=date(2026, 3, 15))
+        assert [p.name for p in expired] == ["paper_review_2025_01", "paper_review_2025_02"]
+
+
+class TestArchivePartition:
+    """Test the detach / export / upload / drop sequence"""
+
+    def _engine(self):
+        engine = MagicMock()
+        cursor = engine.raw_connection.return_value.cursor.return_value
+        cursor.copy_expert.side_effect = lambda sql, f: f.write(b"id,aixiv_id\n1,aixiv.250101.000001\n")
+        return engine
+
+    def test_archive_uploads_then_drops(self):
+        engine = self._engine()
+        s3 = Mock(bucket_name="test-bucket")
+        s3.file_exists.return_value = True
+
+        key = archive_partition(engine, _partition(2025, 1), s3)
+
+        assert key == "archive/paper_review/paper_review_2025_01.csv.gz"
+        s3.s3_client.upload_file.assert_called_once()
+        assert s3.s3_client.upload_file.call_args[0][1:] == ("test-bucket", key)
+        statements = [str(c.args[0]) for c in engine.begin.return_value.__enter__.return_value.execute.call_args_list]
+        assert statements == [
+            'ALTER TABLE paper_review DETACH PARTITION "paper_review_2025_01"',
+            'DROP TABLE "paper_review_2025_01"',
+        ]
+        # Detach and drop share one transaction
+        engine.begin.assert_called_once()
+
+    def test_already_detached_partition_is_not_detached_again(self):
+        engine = self._engine()
+        s3 = Mock(bucket_name="test-bucket")
+        s3.file_exists.return_value = True
+
+        archive_partition(engine, _partition(2025, 1, attached=False), s3)
+
+        statements = [str(c.args[0]) for c in engine.begin.return_value.__enter__.return_value.execute.call_args_list]
+        assert statements == ['DROP TABLE "paper_review_2025_01"']
+
+    def test_unverified_upload_keeps_table(self):
+        engine = self._engine()
+        s3 = Mock(bucket_name="test-bucket")
+        s3.file_exists.return_value = False
+
+        with pytest.raises(RuntimeError):
+            archive_partition(engine, _partition(2025, 1), s3)
+        # The partition is still attached, so its rows stay queryable
+        engine.begin.assert_not_called()
+
+
+class TestRunRetention:
+    """Test the retention job entry point"""
+
+    def test_dry_run_changes_nothing(self, monkeypatch):
+        monkeypatch.setattr(review_retention, "list_partitions", lambda engine: [_partition(2000, 1)])
+        ensure = Mock()
+        archive = Mock()
+        monkeypatch.setattr(review_retention, "ensure_partitions", ensure)
+        monkeypatch.setattr(review_retention, "archive_partition", archive)
+
+        assert run_retention(Mock(), Mock(), retention_months=12, months_ahead=3, dry_run=True) == []
+        ensure.assert_not_called()
+        archive.assert_not_called()
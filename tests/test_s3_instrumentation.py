@@ -0,0 +1,89 @@
+import boto3
+from botocore.config import Config
+import pytest
+from botocore.exceptions import ClientError, EndpointConnectionError
+from botocore.awsrequest import AWSResponse
+from moto import mock_aws
+
+from app.config import settings
+from app.metrics import registry
+from app.s3_instrumentation import (
+    instrument_s3_client,
+    s3_client_config,
+    s3_request_seconds,
+    s3_requests_total,
+    s3_retries_total,
+)
+
+
+class _EmptyBody:
+    def stream(self, **kwargs):
+        yield b""
+
+
+def _client(**overrides):
+    config = s3_client_config()
+    if overrides:
+        config = config.merge(Config(**overrides))
+    return boto3.client("s3", region_name="us-east-1", aws_access_key_id="testing",
+                        aws_secret_access_key="testing", config=config)
+
+
+class TestClientConfig:
+    """Test that Settings reach the botocore Config"""
+
+    def test_config_from_settings(self):
+        config = s3_client_config()
+        assert config.max_pool_connections == settings.s3_max_pool_connections
+        assert config.connect_timeout == settings.s3_connect_timeout
+        assert config.read_timeout == settings.s3_read_timeout
+        assert config.retries == {"mode": settings.s3_retry_mode, "total_max_attempts": settings.s3_max_attempts}
+        assert config.tcp_keepalive == settings.s3_tcp_keepalive
+
+    def test_pool_covers_executor_threads(self):
+        assert settings.s3_max_pool_connections >= settings.s3_executor_workers
+
+
+class TestOperationMetrics:
+    """Test the botocore event hooks against moto and stubbed failures"""
+
+    def test_successful_and_failed_calls(self):
+        with mock_aws():
+            client = _client()
+            instrument_s3_client(client)
+            instrument_s3_client(client)  # idempotent
+            client.create_bucket(Bucket="metrics-bucket")
+            before = s3_request_seconds.get(operation="PutObject")
+            client.put_object(Bucket="metrics-bucket", Key="a", Body=b"x")
+            with pytest.raises(ClientError):
+                client.head_object(Bucket="metrics-bucket", Key="missing")
+
+        assert s3_request_seconds.get(operation="PutObject") == before + 1
+        assert s3_requests_total.get(operation="PutObject", outcome="ok") >= 1
+        assert s3_requests_total.get(operation="HeadObject", outcome="404") >= 1
+        assert "aixiv_s3_request_seconds_bucket" in registry.render()
+
+    def test_retries_are_counted(self):
+        client = _client(retries={"mode": "standard", "total_max_attempts": 3})
+        instrument_s3_client(client)
+        statuses = iter([500, 204])
+        client.meta.events.register(
+            "before-send.s3", lambda request, **kwargs: AWSResponse(request.url, next(statuses), {}, _EmptyBody())
+        )
+
+        client.delete_object(Bucket="b-bucket", Key="k")
+        assert s3_retries_total.get(operation="DeleteObject") == 1
+        assert s3_requests_total.get(operation="DeleteObject", outcome="ok") == 1
+
+    def test_connection_errors_are_recorded(self):
+        client = _client(retries={"mode": "standard", "total_max_attempts": 2})
+        instrument_s3_client(client)
+
+        def refuse(**kwargs):
+            raise EndpointConnectionError(endpoint_url="https://s3.invalid")
+
+        client.meta.events.register("before-send.s3", refuse)
+        with pytest.raises(EndpointConnectionError):
+            client.list_objects_v2(Bucket="b-bucket")
+        assert s3_requests_total.get(operation="ListObjectsV2", outcome="EndpointConnectionError") == 1
+        assert s3_retries_total.get(operation="ListObjectsV2") == 1
@@ -0,0 +1,94 @@
+from unittest.mock import Mock, patch
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app import startup
+from app.startup import StartupTimer, check_schema_version, warm_up_pool, run_startup
+
+
+class TestImportSideEffects:
+    """Importing the app must not touch S3 or the database"""
+
+    def test_s3_client_is_lazy(self):
+        from app.services.s3_service import S3Service
+        service = S3Service()
+        assert service._s3_client is None
+
+    def test_import_does_not_create_tables(self):
+        import importlib
+        import app.main
+        with patch("app.models.Base.metadata.create_all") as mock_create_all:
+            importlib.reload(app.main)
+        mock_create_all.assert_not_called()
+
+
+class TestSchemaCheck:
+    """Test the Alembic head comparison used instead of create_all"""
+
+    def test_single_head_is_read_from_repo(self):
+        assert len(startup.get_alembic_heads()) == 1
+
+    def test_matching_revision(self):
+        head = next(iter(startup.get_alembic_heads()))
+        engine = create_engine("sqlite://")
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32))"))
+            conn.execute(text("INSERT INTO alembic_version VALUES (:head)"), {"head": head})
+        assert check_schema_version(engine) is True
+
+    def test_outdated_revision(self):
+        with patch.object(startup, "get_database_revisions", return_value={"abc123456789"}):
+            assert check_schema_version(Mock()) is False
+
+    def test_unreachable_database(self):
+        with patch.object(startup, "get_database_revisions", side_effect=Exception("connection refused")):
+            assert check_schema_version(Mock()) is False
+
+
+class TestStartupPhases:
+    """Test pool warm-up and the startup report"""
+
+    def _engine(self, pool_size):
+        """A mock engine recording the connections it hands out. Mock's own
+        call_count is not thread-safe, and warm_up_pool connects in parallel."""
+        engine, connections = Mock(), []
+
+        def connect():
+            connection = Mock()
+            connections.append(connection)
+            return connection
+
+        engine.pool.size.return_value = pool_size
+        engine.connect.side_effect = connect
+        return engine, connections
+
+    def test_warm_up_pool_returns_connections(self):
+        engine, connections = self._engine(pool_size=5)
+        assert warm_up_pool(engine, 3) == 3
+        assert len(connections) == 3
+        assert all(connection.close.call_count == 1 for connection in connections)
+
+    def test_warm_up_pool_is_capped_at_pool_size(self):
+        engine, connections = self._engine(pool_size=2)
+        assert warm_up_pool(engine, 10) == 2
+        assert len(connections) == 2
+
+    def test_warm_up_pool_tolerates_failures(self):
+        engine = Mock()
+        engine.pool.size.return_value = 5
+        engine.connect.side_effect = Exception("connection refused")
+        assert warm_up_pool(engine, 2) == 0
+
+    def test_run_startup_records_phases(self):
+        engine = Mock()
+        engine.pool.size.return_value = 5
+        with patch.object(startup, "check_schema_version", return_value=True):
+            timer = run_startup(engine, Mock(), StartupTimer(), pool_warmup=1)
+        assert {"schema_check", "pool_warmup", "s3_client"} <= set(timer.phases)
+        assert "ms" in timer.report()
+
+    def test_strict_schema_check_fails_startup(self):
+        with patch.object(startup, "check_schema_version", return_value=False):
+            with pytest.raises(RuntimeError):
+                run_startup(Mock(), Mock(), strict_schema=True)
@@ -0,0 +1,175 @@
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.executors import EXECUTOR_TASKS, text_executor
+from app.services.text_index import extract_text, index_submission_text, read_submission_text
+from app.services.upload_pipeline import ClaimedJob, pipeline_worker
+from tests.test_upload_pipeline import BUCKET, _url, s3  # noqa: F401 (fixture)
+
+
+def text_pdf(pages) -> bytes:
+    """A PDF with one line of Helvetica text per page"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for line in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({line}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    output = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    output += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return output
+
+
+def _hang(path, max_chars):
+    time.sleep(60)
+
+
+def _job(key, submission_id=7):
+    return ClaimedJob(id=1, submission_id=submission_id, kind="index_text", attempts=1, s3_url=_url(key))
+
+
+@pytest.fixture(autouse=True)
+def _shutdown_text_executor():
+    yield
+    text_executor.shutdown()
+
+
+class TestExtractText:
+    """Test text extraction from PDFs and LaTeX sources"""
+
+    def test_pages_are_extracted_in_order(self, tmp_path):
+        path = tmp_path / "paper.pdf"
+        path.write_bytes(text_pdf(["Transformers are graph networks", "Attention revisited"]))
+        extracted = extract_text(str(path), max_chars=10000)
+        assert "Transformers are graph networks" in extracted["body"]
+        assert extracted["body"].index("Transformers") < extracted["body"].index("Attention revisited")
+        assert (extracted["pages"], extracted["truncated"]) == (2, False)
+
+    def test_stops_at_the_character_cap(self, tmp_path):
+        path = tmp_path / "paper.pdf"
+        path.write_bytes(text_pdf([f"page number {i} of a long paper" for i in range(20)]))
+        extracted = extract_text(str(path), max_chars=50)
+        assert len(extracted["body"]) == 50
+        assert extracted["truncated"] is True
+        assert extracted["pages"] < 20
+
+    def test_pdf_from_s3_runs_in_the_process_pool(self, s3):
+        s3.s3_client.put_object(Bucket=BUCKET, Key="abc_paper.pdf", Body=text_pdf(["Diffusion for proteins"]))
+        extracted = read_submission_text(s3, _job("abc_paper.pdf"), max_chars=1000)
+        assert "Diffusion for proteins" in extracted["body"]
+
+    def test_latex_is_read_as_text(self, s3):
+        s3.s3_client.put_object(Bucket=BUCKET, Key="abc_main.tex", Body=b"\\section{Results}\x00 Agents win")
+        extracted = read_submission_text(s3, _job("abc_main.tex"), max_chars=1000)
+        assert extracted["body"] == "\\section{Results} Agents win"
+
+    def test_unreadable_pdf_indexes_no_body(self, s3):
+        s3.s3_client.put_object(Bucket=BUCKET, Key="abc_broken.pdf", Body=b"%PDF-1.4 not really")
+        assert read_submission_text(s3, _job("abc_broken.pdf"), max_chars=1000)["body"] == ""
+
+    def test_hung_extraction_is_killed_and_retried(self, s3):
+        s3.s3_client.put_object(Bucket=BUCKET, Key="abc_hang.pdf", Body=text_pdf(["never read"]))
+        errors = EXECUTOR_TASKS.get(executor="text", outcome="error")
+        with patch("app.services.text_index.extract_text", _hang), \
+                patch("app.services.text_index.settings.search_extract_timeout", 3):
+            with pytest.raises(TimeoutError):
+                read_submission_text(s3, _job("abc_hang.pdf"), max_chars=1000)
+        assert EXECUTOR_TASKS.get(executor="text", outcome="error") == errors + 1
+        # The hung process was killed with the old pool; a new one serves the next file
+        s3.s3_client.put_object(Bucket=BUCKET, Key="abc_paper.pdf", Body=text_pdf(["Diffusion for proteins"]))
+        assert "Diffusion" in read_submission_text(s3, _job("abc_paper.pdf"), max_chars=1000)["body"]
+
+    def test_handler_upserts_one_row(self):
+        engine = MagicMock()
+        with patch("app.services.text_index.read_submission_text",
+                   return_value={"body": "b", "truncated": False, "pages": 1}):
+            assert index_submission_text(engine, None, _job("x.pdf")) == {}
+        params = engine.begin.return_value.__enter__.return_value.execute.call_args[0][1]
+        assert params == {"submission_id": 7, "body": "b", "truncated": False, "pages": 1}
+
+
+class TestSearchEndpoint:
+    """Test /api/search parameter handling"""
+
+    def test_results_are_returned(self, client):
+        row = {"id": 1, "aixiv_id": "aixiv.1", "version": "1.0", "title": "T", "agent_authors": ["A"],
+               "created_at": "2026-01-01T00:00:00", "rank": 0.5, "snippet": "<b>graph</b> networks"}
+        with patch("app.api.submissions.search_submissions", return_value=[row]) as search:
+            response = client.get("/api/search", params={"q": "graph", "limit": 5})
+        assert response.status_code == 200
+        assert response.json()[0]["snippet"] == "<b>graph</b> networks"
+        assert search.call_args.kwargs == {"skip": 0, "limit": 5}
+
+    def test_empty_query_is_rejected(self, client):
+        assert client.get("/api/search", params={"q": ""}).status_code == 422
+
+
+@pytest.mark.database
+@pytest.mark.usefixtures("clean_postgres")
+class TestSearchWithPostgres:
+    """End to end: submit, index with a worker, search"""
+
+    def _submit(self, db, title, key, abstract=None):
+        from app.schemas import SubmissionCreate
+        return crud.create_submission(db, SubmissionCreate(
+            title=title, agent_authors=["Agent"], corresponding_author="Agent", category=["cs.AI"],
+            keywords=["kw"], license="CC-BY-4.0", s3_url=_url(key), uploaded_by="user-1", doc_type="paper",
+            abstract=abstract,
+        ))
+
+    def _index(self, engine, s3):
+        worker = pipeline_worker("index_text", engine, s3, concurrency=2)
+        try:
+            while worker.run_once():
+                pass
+        finally:
+            worker.stop()
+
+    def test_search_ranks_and_reindexes_new_versions(self, postgres_engine, s3):
+        from app.schemas import SubmissionVersionCreate
+        s3.s3_client.put_object(Bucket=BUCKET, Key="a.pdf", Body=text_pdf(["We study protein folding with diffusion"]))
+        s3.s3_client.put_object(Bucket=BUCKET, Key="b.pdf", Body=text_pdf(["A survey of reinforcement learning"]))
+        with Session(postgres_engine) as db:
+            first = self._submit(db, "Protein diffusion models", "a.pdf")
+            self._submit(db, "Agents", "b.pdf", abstract="Mentions protein once")
+            aixiv_id = first.aixiv_id
+        self._index(postgres_engine, s3)
+
+        with Session(postgres_engine) as db:
+            results = crud.search_submissions(db, "protein")
+            assert [r.title for r in results] == ["Protein diffusion models", "Agents"]
+            assert "<b>protein</b>" in results[0].snippet
+            assert crud.search_submissions(db, '"reinforcement learning" -protein') == []
+
+        # Only the new version is indexed again, and it replaces the old one in results
+        s3.s3_client.put_object(Bucket=BUCKET, Key="a2.pdf", Body=text_pdf(["Now with quantum annealing"]))
+        with Session(postgres_engine) as db:
+            crud.create_submission_version(db, SubmissionVersionCreate(
+                title="Protein diffusion models", agent_authors=["Agent"], corresponding_author="Agent",
+                category=["cs.AI"], keywords=["kw"], license="CC-BY-4.0", s3_url=_url("a2.pdf"),
+                uploaded_by="user-1", doc_type="paper",
+            ), aixiv_id=aixiv_id)
+        with patch("app.services.text_index.read_submission_text", wraps=read_submission_text) as read:
+            self._index(postgres_engine, s3)
+        assert read.call_count == 1
+
+        with Session(postgres_engine) as db:
+            results = crud.search_submissions(db, "annealing")
+            assert [(r.aixiv_id, r.version) for r in results] == [(aixiv_id, "1.1")]
+            assert [r.version for r in crud.search_submissions(db, "protein")] == ["1.1", "1.0"]
@@ -0,0 +1,187 @@
+import asyncio
+import json
+from unittest.mock import patch
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.db_instrumentation import QueryStatsMiddleware
+from app.executors import s3_executor
+from app.s3_instrumentation import instrument_s3_client
+from app.tracing import (
+    JSONFileExporter, NoopExporter, TracedRoute, TracingMiddleware, instrument_engine_tracing, load_exporter,
+    parse_traceparent, span, start_trace, traced, traceparent_header, use_trace,
+)
+from tests.test_upload_pipeline import s3  # noqa: F401 (fixture)
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT = f"00-{TRACE_ID}-00f067aa0ba902b7-01"
+
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+    def shutdown(self):
+        pass
+
+
+@traced
+def lookup(n):
+    return n * 2
+
+
+@pytest.fixture
+def exported():
+    exporter = ListExporter()
+    with patch("app.tracing.exporter", exporter):
+        yield exporter.spans
+
+
+@pytest.fixture
+def traced_client(s3):
+    instrument_s3_client(s3.s3_client)
+    app = FastAPI()
+    app.add_middleware(QueryStatsMiddleware)
+    app.add_middleware(TracingMiddleware)
+    router = APIRouter(route_class=TracedRoute)
+
+    @router.get("/things/{n}")
+    async def thing(n: int):
+        exists = await s3_executor.run(s3.file_exists, "missing.pdf")
+        return {"value": lookup(n), "exists": exists, "traceparent": traceparent_header()}
+
+    @router.get("/broken")
+    def broken():
+        raise RuntimeError("boom")
+
+    app.include_router(router)
+    return TestClient(app, raise_server_exceptions=False)
+
+
+class TestTraceparent:
+    """Test W3C traceparent parsing and sampling decisions"""
+
+    @pytest.mark.parametrize("header", [
+        None, "", "garbage", f"01-{TRACE_ID}-00f067aa0ba902b7-01",
+        f"00-{'0' * 32}-00f067aa0ba902b7-01", f"00-{TRACE_ID}-{'0' * 16}-01",
+    ])
+    def test_invalid_headers_start_a_new_trace(self, header):
+        assert parse_traceparent(header) is None
+        trace = start_trace(header, sample_rate=0)
+        assert len(trace.trace_id) == 32 and trace.trace_id != TRACE_ID and not trace.sampled
+
+    def test_parent_decision_is_followed(self):
+        assert parse_traceparent(PARENT.upper()) == (TRACE_ID, "00f067aa0ba902b7", True)
+        assert start_trace(PARENT, sample_rate=0).sampled
+        assert not start_trace(PARENT[:-2] + "00", sample_rate=1).sampled
+
+
+class TestRequestTracing:
+    """Test spans, propagation and Server-Timing through the middleware"""
+
+    def test_sampled_request(self, traced_client, exported):
+        response = traced_client.get("/things/4", headers={"traceparent": PARENT})
+        assert response.status_code == 200
+        assert response.headers["x-trace-id"] == TRACE_ID
+        # One header: the db entry from QueryStatsMiddleware, then the trace's
+        timing = response.headers["server-timing"]
+        assert timing.startswith("db;dur=") and "app;dur=" in timing
+        assert "handler;dur=" in timing and "crud;dur=" in timing and "s3;dur=" in timing
+
+        spans = {s.name: s for s in exported}
+        assert set(spans) == {"GET /things/{n}", "handler.thing", "crud.lookup", "executor.s3", "s3.HeadObject"}
+        root = spans["GET /things/{n}"]
+        assert root.parent_id == "00f067aa0ba902b7" and root.attributes["http.status_code"] == 200
+        assert spans["handler.thing"].parent_id == root.span_id
+        assert spans["crud.lookup"].parent_id == spans["handler.thing"].span_id
+        assert spans["s3.HeadObject"].parent_id == spans["executor.s3"].span_id
+        assert {s.trace_id for s in exported} == {TRACE_ID}
+        # Outgoing calls continue the trace from the current span
+        assert response.json()["traceparent"] == f"00-{TRACE_ID}-{spans['handler.thing'].span_id}-01"
+
+    def test_unsampled_request_still_has_timings(self, traced_client, exported):
+        with patch("app.tracing.settings.trace_sample_rate", 0):
+            response = traced_client.get("/things/4")
+        assert "crud;dur=" in response.headers["server-timing"]
+        assert len(response.headers["x-trace-id"]) == 32
+        assert exported == []
+
+    def test_failed_request(self, traced_client, exported):
+        response = traced_client.get("/broken", headers={"traceparent": PARENT})
+        assert response.status_code == 500
+        root = next(s for s in exported if s.name == "GET /broken")
+        assert root.attributes["http.status_code"] == 500
+        assert next(s for s in exported if s.name == "handler.broken").error == "RuntimeError: boom"
+
+    def test_disabled(self, traced_client, exported):
+        with patch("app.tracing.settings.tracing", False):
+            response = traced_client.get("/things/4", headers={"traceparent": PARENT})
+        assert "x-trace-id" not in response.headers and exported == []
+
+
+class TestSpans:
+    """Test span nesting, SQL spans and exporters outside HTTP"""
+
+    def test_sql_spans_without_parameters(self):
+        engine = create_engine("sqlite://")
+        instrument_engine_tracing(engine)
+        trace = start_trace(PARENT)
+        with use_trace(trace):
+            with span("crud.outer", "crud"), span("crud.inner", "crud"):
+                with engine.connect() as conn:
+                    conn.execute(text("SELECT :secret"), {"secret": "hunter2"})
+                    with pytest.raises(Exception):
+                        conn.execute(text("SELECT * FROM missing"))
+        engine.dispose()
+        sql = [s for s in trace.spans if s.category == "sql"]
+        assert [s.attributes["statement"] for s in sql] == ["SELECT ?", "SELECT * FROM missing"]
+        assert sql[1].error is not None
+        assert "hunter2" not in json.dumps([s.to_dict() for s in trace.spans])
+        # Nested spans of one category are timed once
+        outer = next(s for s in trace.spans if s.name == "crud.outer")
+        assert trace.timings["crud"] == pytest.approx(outer.duration)
+
+    def test_concurrent_spans_count_their_wall_clock_union(self):
+        async def upload(delay):
+            await asyncio.sleep(delay)
+            with span("s3.PutObject", "s3"):
+                await asyncio.sleep(0.1)
+
+        async def scenario():
+            # Three overlapping uploads from 0 to ~0.15s, then one alone for 0.1s
+            await asyncio.gather(upload(0), upload(0.025), upload(0.05))
+            await upload(0)
+
+        trace = start_trace(PARENT)
+        with use_trace(trace):
+            asyncio.run(scenario())
+        assert 0.24 <= trace.timings["s3"] < 0.35
+        assert "s3;dur=" in trace.server_timing(0.3)
+
+    def test_no_trace_no_spans(self):
+        assert lookup(3) == 6
+        with span("crud.anything", "crud") as handle:
+            assert handle is None
+        assert traceparent_header() is None
+
+    def test_json_exporter(self, tmp_path):
+        path = tmp_path / "traces" / "spans.jsonl"
+        exporter = JSONFileExporter(str(path))
+        trace = start_trace(PARENT)
+        with use_trace(trace), span("crud.x", "crud", rows=3):
+            pass
+        exporter.export(trace.spans)
+        exporter.shutdown()
+        [line] = path.read_text().splitlines()
+        assert json.loads(line)["attributes"] == {"rows": 3}
+
+    def test_load_exporter(self):
+        assert isinstance(load_exporter("json"), JSONFileExporter)
+        assert isinstance(load_exporter("none"), NoopExporter)
+        assert isinstance(load_exporter("app.tracing:JSONFileExporter"), JSONFileExporter)
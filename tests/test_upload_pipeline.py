@@ -0,0 +1,228 @@
+import hashlib
+import io
+import threading
+from unittest.mock import MagicMock, patch
+
+import boto3
+import pytest
+from moto import mock_aws
+from PIL import Image
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.executors import pdf_executor
+from app.services import upload_pipeline
+from app.services.s3_service import S3Service
+from app.services.upload_pipeline import (
+    ClaimedJob,
+    ObjectMissing,
+    PermanentJobError,
+    PipelineWorker,
+    claim_jobs,
+    fail_job,
+    process_upload,
+)
+
+BUCKET = "test-bucket"
+
+
+def _pdf(pages=3) -> bytes:
+    images = [Image.new("RGB", (612, 792), (255, 255 - 40 * i, 255)) for i in range(pages)]
+    output = io.BytesIO()
+    images[0].save(output, format="PDF", save_all=True, append_images=images[1:])
+    return output.getvalue()
+
+
+@pytest.fixture
+def s3():
+    """S3Service backed by an in-memory moto bucket"""
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1",
+                              aws_access_key_id="testing", aws_secret_access_key="testing")
+        client.create_bucket(Bucket=BUCKET)
+        service = S3Service()
+        service.s3_client = client
+        service.bucket_name = BUCKET
+        yield service
+
+
+def _job(s3_url, submission_id=7, attempts=1):
+    return ClaimedJob(id=1, submission_id=submission_id, kind="process_upload", attempts=attempts, s3_url=s3_url)
+
+
+def _url(key):
+    return f"https://{BUCKET}.s3.us-east-1.amazonaws.com/{key}"
+
+
+@pytest.fixture
+def _shutdown_pdf_executor():
+    yield
+    pdf_executor.shutdown()
+
+
+@pytest.mark.usefixtures("_shutdown_pdf_executor")
+class TestProcessUpload:
+    """Test the per-file processing step against a moto bucket"""
+
+    def test_pdf_metadata_and_thumbnail(self, s3):
+        data = _pdf(pages=3)
+        s3.s3_client.put_object(Bucket=BUCKET, Key="abc_paper.pdf", Body=data)
+
+        values = process_upload(s3, _job(_url("abc_paper.pdf")), thumbnail_width=200)
+
+        assert values["file_size"] == len(data)
+        assert values["file_sha256"] == hashlib.sha256(data).hexdigest()
+        assert values["page_count"] == 3
+        assert values["thumbnail_url"] == _url("thumbnails/submissions/7.jpg")
+        thumbnail = s3.s3_client.get_object(Bucket=BUCKET, Key="thumbnails/submissions/7.jpg")
+        assert thumbnail["ContentType"] == "image/jpeg"
+        assert Image.open(thumbnail["Body"]).width == 200
+
+    def test_latex_gets_size_and_checksum_only(self, s3):
+        s3.s3_client.put_object(Bucket=BUCKET, Key="abc_main.tex", Body=b"\\documentclass{article}")
+        values = process_upload(s3, _job(_url("abc_main.tex")), thumbnail_width=200)
+        assert values["file_size"] == 23
+        assert "page_count" not in values
+
+    def test_unreadable_pdf_still_records_checksum(self, s3):
+        s3.s3_client.put_object(Bucket=BUCKET, Key="abc_broken.pdf", Body=b"%PDF-1.4 not really")
+        values = process_upload(s3, _job(_url("abc_broken.pdf")), thumbnail_width=200)
+        assert values["file_sha256"] == hashlib.sha256(b"%PDF-1.4 not really").hexdigest()
+        assert "page_count" not in values
+
+    def test_pdf_is_read_outside_the_worker_thread(self, s3):
+        s3.s3_client.put_object(Bucket=BUCKET, Key="abc_paper.pdf", Body=_pdf(pages=1))
+        with patch.object(pdf_executor, "call", wraps=pdf_executor.call) as call:
+            process_upload(s3, _job(_url("abc_paper.pdf")), thumbnail_width=200)
+        assert call.call_args.args[0] is upload_pipeline.inspect_pdf
+
+    def test_missing_object_is_retryable(self, s3):
+        with pytest.raises(ObjectMissing):
+            process_upload(s3, _job(_url("not-there.pdf")), thumbnail_width=200)
+
+    def test_foreign_url_is_permanent(self, s3):
+        with pytest.raises(PermanentJobError):
+            process_upload(s3, _job("https://example.com/paper.pdf"), thumbnail_width=200)
+
+    def test_key_from_url(self, s3):
+        assert s3.key_from_url(_url("a%20b.pdf")) == "a b.pdf"
+        assert s3.key_from_url(f"https://{BUCKET}.s3.amazonaws.com/x.pdf") == "x.pdf"
+        assert s3.key_from_url(f"https://s3.us-east-1.amazonaws.com/{BUCKET}/dir/x.pdf") == "dir/x.pdf"
+        assert s3.key_from_url("https://other-bucket.s3.amazonaws.com/x.pdf") is None
+
+
+class TestRetries:
+    """Test the retry / give-up decision"""
+
+    def _values(self, engine):
+        return engine.begin.return_value.__enter__.return_value.execute.call_args[0][0].compile().params
+
+    def test_retry_until_max_attempts(self):
+        engine = MagicMock()
+        assert fail_job(engine, _job("u", attempts=2), ObjectMissing("x"), 5, 30) == "pending"
+        assert self._values(engine)["status"] == "pending"
+        assert fail_job(engine, _job("u", attempts=5), ObjectMissing("x"), 5, 30) == "failed"
+
+    def test_permanent_errors_are_not_retried(self):
+        assert fail_job(MagicMock(), _job("u", attempts=1), PermanentJobError("x"), 5, 30) == "failed"
+
+
+class TestWorker:
+    """Test bounded concurrency of a worker batch"""
+
+    def test_batch_runs_at_most_concurrency_jobs_at_once(self):
+        running, peak, lock = [0], [0], threading.Lock()
+        all_started = threading.Barrier(3, timeout=5)
+
+        def handler(s3, job):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            all_started.wait()
+            with lock:
+                running[0] -= 1
+            return {}
+
+        jobs = [_job("u", submission_id=i) for i in range(3)]
+        with patch.object(upload_pipeline, "claim_jobs", return_value=jobs) as claim, \
+                patch.object(upload_pipeline, "complete_job") as complete:
+            worker = PipelineWorker(MagicMock(), None, handler=handler, concurrency=3)
+            assert worker.run_once() == 3
+            worker.stop()
+        assert claim.call_args[0][2] == 3  # batch size is the concurrency
+        assert complete.call_count == 3
+        assert peak[0] == 3
+
+
+@pytest.mark.database
+@pytest.mark.usefixtures("clean_postgres")
+class TestPipelineWithPostgres:
+    """End to end: create_submission queues a job, a worker processes it"""
+
+    def _submission(self, engine, s3_url):
+        from app.schemas import SubmissionCreate
+        with Session(engine) as db:
+            submission = crud.create_submission(db, SubmissionCreate(
+                title="Pipeline", agent_authors=["Agent"], corresponding_author="Agent", category=["cs.AI"],
+                keywords=["kw"], license="CC-BY-4.0", s3_url=s3_url, uploaded_by="user-1", doc_type="paper",
+            ))
+            return submission.id
+
+    def test_job_lifecycle(self, postgres_engine, s3):
+        data = _pdf(pages=2)
+        s3.s3_client.put_object(Bucket=BUCKET, Key="e2e_paper.pdf", Body=data)
+        submission_id = self._submission(postgres_engine, _url("e2e_paper.pdf"))
+
+        # Enqueueing again is a no-op
+        with Session(postgres_engine) as db:
+            crud.enqueue_submission_jobs(db, submission_id)
+            db.commit()
+
+        worker = PipelineWorker(postgres_engine, s3, concurrency=2)
+        try:
+            assert worker.run_once() == 1
+            assert worker.run_once() == 0
+        finally:
+            worker.stop()
+
+        with postgres_engine.connect() as conn:
+            row = conn.execute(text(
+                "SELECT file_size, file_sha256, page_count, thumbnail_url, processed_at FROM submissions WHERE id = :id"
+            ), {"id": submission_id}).one()
+            jobs = conn.execute(text(
+                "SELECT status, attempts FROM submission_jobs WHERE submission_id = :id AND kind = 'process_upload'"
+            ), {"id": submission_id}).all()
+        assert row.file_size == len(data)
+        assert row.file_sha256 == hashlib.sha256(data).hexdigest()
+        assert row.page_count == 2
+        assert row.thumbnail_url.endswith(f"/thumbnails/submissions/{submission_id}.jpg")
+        assert row.processed_at is not None
+        assert [tuple(j) for j in jobs] == [("done", 1)]
+
+    def test_missing_object_is_retried_later_and_abandoned_jobs_are_reclaimed(self, postgres_engine, s3):
+        submission_id = self._submission(postgres_engine, _url("late_upload.pdf"))
+
+        worker = PipelineWorker(postgres_engine, s3, concurrency=1)
+        try:
+            assert worker.run_once() == 1
+        finally:
+            worker.stop()
+        with postgres_engine.begin() as conn:
+            job = conn.execute(text(
+                "SELECT status, attempts, run_after > now() AS delayed, last_error FROM submission_jobs "
+                "WHERE submission_id = :id AND kind = 'process_upload'"
+            ), {"id": submission_id}).one()
+            assert (job.status, job.attempts, job.delayed) == ("pending", 1, True)
+            assert job.last_error.startswith("ObjectMissing")
+
+            # Simulate a worker that died mid-job long ago
+            conn.execute(text(
+                "UPDATE submission_jobs SET status = 'running', locked_at = now() - interval '1 hour' "
+                "WHERE submission_id = :id AND kind = 'process_upload'"
+            ), {"id": submission_id})
+
+        claimed = claim_jobs(postgres_engine, "process_upload", 10, lease_seconds=600)
+        assert [(j.submission_id, j.attempts) for j in claimed] == [(submission_id, 2)]
+        # A claimed job is not handed out twice
+        assert claim_jobs(postgres_engine, "process_upload", 10, lease_seconds=600) == []